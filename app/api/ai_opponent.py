@@ -0,0 +1,154 @@
+"""
+The engine's side of matches against the AI (matches.ai_level set, the
+engine's side without a user).
+
+Its turns run as background tasks on the event loop: the engine call is
+an awaited HTTP request (or a search in the local process pool for the
+lowest levels), so other websockets keep being served while it thinks,
+and no DB connection is held meanwhile.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.ai_client import EngineError
+from app.core.ai_scheduler import AIScheduler, ai_scheduler
+from app.core.checkers_rules import (
+    compute_game_over,
+    compute_state_from_history,
+    opposite_role,
+    piece_captures,
+    role_to_color,
+    validate_and_apply_move,
+)
+from app.core.config import settings
+from app.core.ws_manager import connection_manager
+from app.db.match_moves import append_move, finish_match, move_message
+from app.db.models.match import Match
+from app.db.move_archive import load_moves
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_turns: Dict[int, asyncio.Task] = {}
+
+
+def ai_role(match: Match) -> Optional[str]:
+    """The role the engine plays in this match, if any."""
+    if match.ai_level is None:
+        return None
+    return "white" if match.whiteuser is None else "black"
+
+
+def level_budget(level: int) -> Tuple[int, float]:
+    """(depth, seconds) for an AI level, clamped to the configured ones."""
+    depths = settings.AI_LEVEL_DEPTHS
+    seconds = settings.AI_LEVEL_MOVE_SECONDS
+    i = min(max(level, 1), len(depths)) - 1
+    return depths[i], seconds[min(i, len(seconds) - 1)]
+
+
+def schedule_ai_turn(matchid: int) -> None:
+    """Start the engine's turn unless one is already running."""
+    task = _turns.get(matchid)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(play_ai_turn(matchid))
+    _turns[matchid] = task
+    task.add_done_callback(
+        lambda t: _turns.pop(matchid) if _turns.get(matchid) is t else None)
+
+
+async def play_ai_turn(
+    matchid: int,
+    client: AIScheduler = ai_scheduler,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> None:
+    db = session_factory()
+    try:
+        await _play(db, matchid, client)
+    except Exception:
+        db.rollback()
+        logger.exception("AI turn of match %s failed", matchid)
+    finally:
+        db.close()
+
+
+async def _play(db: Session, matchid: int, client: AIScheduler) -> None:
+    while True:
+        match = db.get(Match, matchid)
+        role = ai_role(match) if match else None
+        if role is None or match.status != "ongoing":
+            return
+
+        moves = load_moves(db, match)
+        board, next_role, forced_from, must_capture = \
+            compute_state_from_history(
+                [{"player": m.player, "move": m.move} for m in moves])
+        if next_role != role:
+            return
+        last_number = int(match.last_move_number)
+        color = role_to_color(role)
+
+        if forced_from is not None:
+            # a chain left open (e.g. restart between hops): finish it here
+            cap = piece_captures(board, *forced_from)[0]
+            hops = [{"from": cap["from"], "to": cap["to"]}]
+        else:
+            depth, seconds = level_budget(match.ai_level)
+            local = match.ai_level <= settings.AI_LOCAL_MAX_LEVEL
+            db.rollback()  # release the connection while the engine thinks
+            try:
+                reply = await client.best_move(
+                    board, color, depth, deadline=time.monotonic() + seconds,
+                    local=local)
+            except EngineError as e:
+                logger.warning("AI engine error in match %s: %r",
+                               matchid, e)
+                await connection_manager.broadcast(matchid, {
+                    "type": "error",
+                    "payload": {"detail": "AI opponent unavailable, "
+                                          "send any message to retry"}
+                })
+                return
+            hops = reply.moves
+
+        for i, hop in enumerate(hops):
+            board, was_cap, pos, _ = validate_and_apply_move(
+                board, color, hop, forced_from,
+                must_capture or forced_from is not None)
+            kinged_now = board[pos[0]][pos[1]].pop("_kinged_now", False)
+            forced_from = None
+            if was_cap and not kinged_now and piece_captures(board, *pos):
+                forced_from = pos
+            must_capture = forced_from is not None
+
+            try:
+                new_move = append_move(db, matchid, role,
+                                       dict(hop, was_capture=was_cap),
+                                       expected_last=last_number + i)
+            except ValueError:
+                db.rollback()
+                return  # resigned or moved on meanwhile
+
+            next_turn = role if forced_from else opposite_role(role)
+            await connection_manager.broadcast(matchid, move_message(
+                new_move, next_turn, forced_from is not None, forced_from))
+
+        if forced_from is not None:
+            continue
+
+        is_over, result, reason = compute_game_over(board,
+                                                    opposite_role(role))
+        if is_over:
+            match = db.get(Match, matchid)
+            finish_payload = finish_match(db, match, result, reason)
+            await connection_manager.broadcast(matchid, {
+                "type": "match_finished",
+                "payload": finish_payload
+            })
+            await connection_manager.close_match(matchid, code=1000)
+        return
@@ -1,11 +1,14 @@
+from typing import Callable
+
 from sqlalchemy import select
 from fastapi import Depends, HTTPException, status, Cookie, WebSocket
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 from app.db.session import SessionLocal
 from app.db.models.user import User
-from app.core.security import ALGO
+from app.core.security import ALGO, Principal
 
 
 def get_db():
@@ -16,53 +19,111 @@ def get_db():
         db.close()
 
 
-def get_current_user(
-    access_token: str | None = Cookie(default=None),
-    db: Session = Depends(get_db)
-) -> User:
-    if not access_token:
+def get_session_factory() -> Callable[[], Session]:
+    """
+    For websockets: they open a short-lived session per message instead
+    of holding one (and its pooled connection) for the socket's lifetime.
+    """
+    return SessionLocal
+
+
+def decode_access_token(token: str | None) -> dict:
+    if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
         )
 
     try:
-        payload = jwt.decode(access_token, settings.JWT_SECRET,
-                             algorithms=[ALGO])
-        email: str = payload.get("sub")
-        if not email:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGO])
+        if not payload.get("sub"):
             raise ValueError("no sub")
     except (JWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
+    return payload
+
+
+def user_to_cache(user: User) -> dict:
+    return {c.key: getattr(user, c.key) for c in User.__table__.columns}
 
-    user = db.query(User).filter(User.email == email).first()
+
+def cached_user(db: Session, token: str) -> User | None:
+    values = principal_cache.get(token)
+    if values is None:
+        return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    # attach to this request's session without a SELECT
+    return db.merge(user, load=False)
+
+
+def load_user(db: Session, token: str, payload: dict) -> User:
+    user = cached_user(db, token)
+    if user:
+        return user
+
+    user = db.execute(
+        select(User).where(User.email == payload["sub"])).scalars().first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    principal_cache.put(token, user_to_cache(user), payload.get("exp"))
     return user
 
 
+def principal_from_token(db: Session, token: str | None) -> Principal:
+    payload = decode_access_token(token)
+    if payload.get("uid") is not None:
+        return Principal(userid=int(payload["uid"]), email=payload["sub"],
+                         username=payload.get("username"))
+
+    # tokens issued before the uid claim existed
+    user = load_user(db, token, payload)
+    return Principal(userid=user.userid, email=user.email,
+                     username=user.username)
+
+
+def get_current_user(
+    access_token: str | None = Cookie(default=None),
+    db: Session = Depends(get_db)
+) -> User:
+    """Full users row, for endpoints that need profile data."""
+    payload = decode_access_token(access_token)
+    return load_user(db, access_token, payload)
+
+
+def get_current_principal(
+    access_token: str | None = Cookie(default=None),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """Caller identity straight from the token claims, no query."""
+    return principal_from_token(db, access_token)
+
+
 def get_current_user_ws(
     websocket: WebSocket,
-    db: Session = Depends(get_db),
+    sessions: Callable[[], Session] = Depends(get_session_factory),
 ) -> User:
     token = websocket.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401,
                             detail="Missing access token cookie")
 
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGO])
-        email = payload.get("sub")
-        if not email:
-            raise ValueError("no sub")
-    except (JWTError, ValueError):
-        raise HTTPException(status_code=401, detail="Invalid token")
+    payload = decode_access_token(token)
+    with sessions() as db:
+        return load_user(db, token, payload)
 
-    user = db.execute(
-        select(User).where(User.email == email)).scalars().first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+
+def get_current_principal_ws(
+    websocket: WebSocket,
+    sessions: Callable[[], Session] = Depends(get_session_factory),
+) -> Principal:
+    token = websocket.cookies.get("access_token")
+    if not token:
+        raise HTTPException(status_code=401,
+                            detail="Missing access token cookie")
+
+    with sessions() as db:
+        return principal_from_token(db, token)
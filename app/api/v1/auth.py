@@ -1,17 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Cookie
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_user, get_current_principal
 from app.core.security import (
     hash_password,
-    verify_password,
+    verify_and_update_password,
     ALGO,
+    Principal,
     create_access_token,
-    create_refresh_token
 )
 from app.core.config import settings
+from app.core.password_pool import password_pool, PasswordPoolSaturated
+from app.core.principal_cache import principal_cache
 from app.db.models.user import User
+from app.db.refresh_tokens import (
+    InvalidRefreshToken,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens,
+)
 from app.schemas.auth import (
     RegisterIn,
     LoginIn,
@@ -26,21 +36,43 @@ from app.schemas.auth import (
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def set_access_cookie(response: Response, user: User) -> None:
+    # userid/username claims let hot paths skip the users lookup
+    access_token = create_access_token(sub=user.email, userid=user.userid,
+                                       username=user.username)
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        httponly=True,
+        samesite="lax",
+        secure=False,
+        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
+# ---------- Password hashing ----------
+async def run_password_task(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except PasswordPoolSaturated:
+        raise HTTPException(status_code=503,
+                            detail="Authentication busy, retry shortly",
+                            headers={"Retry-After": "1"})
+
+
 # ---------- Register ----------
-@router.post("/register", response_model=UserOut, status_code=201)
-def register(body: RegisterIn, db: Session = Depends(get_db)):
-    if db.query(User).filter((User.username == body.username) |
-                             (User.email == body.email)).first():
-        raise HTTPException(status_code=400,
-                            detail="Usuario o email ya existe")
+def _user_exists(db: Session, username: str, email: str) -> bool:
+    return db.query(User).filter((User.username == username) |
+                                 (User.email == email)).first() is not None
+
 
-    print(body.password)
+def _create_user(db: Session, body: RegisterIn, password_hash: str) -> User:
     user = User(
         email=body.email,
         username=body.username,
         name=body.name,
         surname=body.surname,
-        password_hash=hash_password(body.password),
+        password_hash=password_hash,
         birthdate=body.birthdate,
         country=body.country,
     )
@@ -50,24 +82,46 @@ def register(body: RegisterIn, db: Session = Depends(get_db)):
     return user
 
 
+@router.post("/register", response_model=UserOut, status_code=201)
+async def register(body: RegisterIn, db: Session = Depends(get_db)):
+    # DB calls go to the shared threadpool, bcrypt to its own pool
+    if await run_in_threadpool(_user_exists, db, body.username, body.email):
+        raise HTTPException(status_code=400,
+                            detail="Usuario o email ya existe")
+
+    password_hash = await run_password_task(hash_password, body.password)
+    return await run_in_threadpool(_create_user, db, body, password_hash)
+
+
 # ---------- Login (access + refresh) ----------
+def _get_user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save_password_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    db.commit()
+    db.refresh(user)
+
+
 @router.post("/login", response_model=AuthUserResponse)
-def login(body: LoginIn, response: Response, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == body.email).first()
-    if not user or not verify_password(body.password, user.password_hash):
+async def login(body: LoginIn, response: Response,
+                db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_get_user_by_email, db, body.email)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = create_access_token(sub=user.email)
-    refresh_token = create_refresh_token(sub=user.email)
+    ok, new_hash = await run_password_task(verify_and_update_password,
+                                           body.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was stored
+        await run_in_threadpool(_save_password_hash, db, user, new_hash)
 
-    response.set_cookie(
-        key="access_token",
-        value=access_token,
-        httponly=True,
-        samesite="lax",
-        secure=False,
-        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-    )
+    refresh_token = await run_in_threadpool(issue_refresh_token, db, user)
+
+    set_access_cookie(response, user)
     response.set_cookie(
         key="refresh_token",
         value=refresh_token,
@@ -81,6 +135,19 @@ def login(body: LoginIn, response: Response, db: Session = Depends(get_db)):
 
 
 # ---------- Refresh ----------
+def decode_refresh_token(refresh_token: str) -> dict:
+    try:
+        payload = jwt.decode(refresh_token, settings.JWT_SECRET,
+                             algorithms=[ALGO])
+        if payload.get("type") != "refresh":
+            raise ValueError("not refresh")
+        if not payload.get("sub"):
+            raise ValueError("no sub")
+    except (JWTError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+
 @router.post("/refresh", response_model=MessageResponse)
 def refresh_token(
     response: Response,
@@ -90,29 +157,20 @@ def refresh_token(
     if not refresh_token:
         raise HTTPException(status_code=401, detail="No refresh token")
 
+    payload = decode_refresh_token(refresh_token)
     try:
-        payload = jwt.decode(refresh_token, settings.JWT_SECRET,
-                             algorithms=[ALGO])
-        if payload.get("type") != "refresh":
-            raise ValueError("not refresh")
-        email: str = payload.get("sub")
-        if not email:
-            raise ValueError("no sub")
-    except (JWTError, ValueError):
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+        user, new_refresh = rotate_refresh_token(db, refresh_token, payload)
+    except InvalidRefreshToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
 
-    new_access = create_access_token(sub=user.email)
+    set_access_cookie(response, user)
     response.set_cookie(
-        key="access_token",
-        value=new_access,
+        key="refresh_token",
+        value=new_refresh,
         httponly=True,
         samesite="lax",
         secure=False,
-        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        max_age=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
     )
 
     return {"detail": "access token refreshed"}
@@ -125,15 +183,39 @@ def me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout", response_model=MessageResponse,)
-def logout(response: Response):
+def logout(response: Response,
+           access_token: str | None = Cookie(default=None),
+           refresh_token: str | None = Cookie(default=None),
+           db: Session = Depends(get_db)):
+    if access_token:
+        principal_cache.invalidate_token(access_token)
+    if refresh_token:
+        try:
+            payload = decode_refresh_token(refresh_token)
+            revoke_refresh_token(db, refresh_token, payload)
+        except HTTPException:
+            pass
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
     return {"detail": "logged out"}
 
 
+@router.post("/logout_all", response_model=MessageResponse)
+def logout_all(response: Response,
+               db: Session = Depends(get_db),
+               current_user: Principal = Depends(get_current_principal)):
+    # ends every session of the user (all devices)
+    revoke_user_refresh_tokens(db, current_user.userid)
+    principal_cache.invalidate_user(current_user.userid)
+    response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token")
+    return {"detail": "logged out everywhere"}
+
+
 @router.put("/update", response_model=UserProfile)
 def update_me(
     body: UpdateUserIn,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -168,5 +250,8 @@ def update_me(
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
+    principal_cache.invalidate_user(current_user.userid)
+    # the username claim changed
+    set_access_cookie(response, current_user)
 
     return current_user
@@ -1,18 +1,44 @@
-from operator import or_
-from fastapi import APIRouter, Depends
+import hashlib
+from datetime import datetime
+from typing import Callable
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi import HTTPException
 from fastapi.temp_pydantic_v1_params import Query
 from requests import Session
-from sqlalchemy import func, select
-from app.api.deps import get_current_user, get_db
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import joinedload
+from app.api.deps import get_current_principal, get_db
 from app.db.models.match import Match
-from app.db.models.match_move import MatchMove
-from app.db.models.user import User
+from app.db.models.user_stats import UserStats
+from app.db.match_export import iter_match_archive, iter_ndjson
+from app.db.move_archive import count_moves, load_moves
+from app.db.position_index import search_position
+from app.db.opening_tree import opening_tree
+from app.db.checkpoints import must_capture, state_at
+from app.db.analysis import request_analysis
+from app.db.models.analysis_job import AnalysisJob
+from app.db.models.match_analysis import MatchAnalysis
+from app.core.checkers_rules import is_playable
+from app.core.zobrist import hash_position
+from app.core.config import settings
+from app.core.pdn import START_FEN, PdnError, PdnGame, format_game, game_plies
+from app.core.response_cache import CachedResponse, match_response_cache
+from app.core.security import Principal
 from app.schemas.match_history import (
+    AnalysisPositionOut,
+    MatchAnalysisOut,
     MatchSummaryOut,
     MatchDetailOut,
     MatchMoveOut,
-    MatchMovesPageOut
+    MatchMovesPageOut,
+    MatchPositionOut,
+    OpeningMoveOut,
+    OpeningPositionOut,
+    PlayerStatsOut,
+    PositionMatchOut,
+    PositionSearchIn,
+    PositionSearchOut,
 )
 
 router = APIRouter(prefix="/match_history", tags=["match_history"])
@@ -31,42 +57,129 @@ def get_opponent(match: Match, userid: int) -> int:
     return match.blackuser if userid == match.whiteuser else match.whiteuser
 
 
+# Finished matches never change: their responses get a strong ETag,
+# are marked immutable and are kept serialized in match_response_cache.
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def cache_key(request: Request) -> str:
+    query = "&".join(f"{k}={v}" for k, v in
+                     sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def finished_etag(match: Match, key: str) -> str:
+    version = f"{match.matchid}:{match.last_move_number}:" \
+        f"{match.finishedat}:{match.archived_at}:{key}"
+    return '"' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def send_cached(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": IMMUTABLE}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    headers.update(entry.headers)
+    return Response(entry.body, media_type=entry.media_type,
+                    headers=headers)
+
+
+def from_response_cache(request: Request, userid: int) -> Response | None:
+    entry = match_response_cache.get(cache_key(request))
+    if entry is None:
+        return None
+    if userid not in entry.participants:
+        raise HTTPException(status_code=403, detail="User not in match")
+    return send_cached(request, entry)
+
+
+def finished_response(
+    request: Request,
+    match: Match,
+    render: Callable[[], bytes],
+    media_type: str = "application/json",
+    headers: tuple = (),
+) -> Response:
+    """
+    Answer for a finished match: 304 straight from the matches row when
+    the client already has it, otherwise render once and cache.
+    """
+    key = cache_key(request)
+    etag = finished_etag(match, key)
+    if etag_matches(request, etag):
+        return Response(status_code=304,
+                        headers={"ETag": etag, "Cache-Control": IMMUTABLE})
+
+    entry = CachedResponse(
+        etag=etag,
+        body=render(),
+        media_type=media_type,
+        participants=(match.whiteuser, match.blackuser),
+        headers=tuple(headers),
+    )
+    match_response_cache.put(key, entry)
+    return send_cached(request, entry)
+
+
 @router.get("/history", response_model=list[MatchSummaryOut])
 def list_my_matches(
+    response: Response,
     status: str | None = Query(default="finished",
                                description="finished|playing|"
                                "waiting|aborted|all"),
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    before_matchid: int | None = Query(
+        default=None, ge=1,
+        description="Keyset cursor: X-Next-Before-Matchid of the "
+        "previous page"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     userid = current_user.userid
 
-    filters = [or_(Match.whiteuser == userid, Match.blackuser == userid)]
+    filters = []
     if status and status != "all":
         filters.append(Match.status == status)
+    if before_matchid is not None:
+        filters.append(Match.matchid < before_matchid)
 
-    moves_count_sq = (
-        select(MatchMove.matchid,
-               func.count(MatchMove.id).label("moves_count"))
-        .group_by(MatchMove.matchid)
+    # One index range scan per side ((whiteuser, matchid) and
+    # (blackuser, matchid)) instead of OR-ing them, merged below.
+    sides = [
+        select(Match.matchid)
+        .where(side == userid, *filters)
+        .order_by(Match.matchid.desc())
+        .limit(limit + offset)
+        .subquery()
+        for side in (Match.whiteuser, Match.blackuser)
+    ]
+    merged = union_all(*(select(side.c.matchid) for side in sides)).subquery()
+    page = (
+        select(merged.c.matchid)
+        .order_by(merged.c.matchid.desc())
+        .limit(limit)
+        .offset(offset)
         .subquery()
     )
 
     stmt = (
-        select(Match, func.coalesce(moves_count_sq.c.moves_count, 0))
-        .outerjoin(moves_count_sq, moves_count_sq.c.matchid == Match.matchid)
-        .where(*filters)
+        select(Match)
+        .join(page, page.c.matchid == Match.matchid)
         .order_by(Match.matchid.desc())
-        .limit(limit)
-        .offset(offset)
     )
 
-    rows = db.execute(stmt).all()
+    matches = db.execute(stmt).scalars().all()
 
     out: list[MatchSummaryOut] = []
-    for match, moves_count in rows:
+    for match in matches:
         my_role = get_my_role(match, userid)
         opponent = get_opponent(match, userid)
 
@@ -82,56 +195,368 @@ def list_my_matches(
                 ended_at=getattr(match, "ended_at", None),
                 my_role=my_role,
                 opponent_userid=opponent,
-                moves_count=int(moves_count or 0),
+                moves_count=int(match.moves_count or 0),
             )
         )
 
+    if len(out) == limit:
+        response.headers["X-Next-Before-Matchid"] = str(out[-1].matchid)
     return out
 
 
+@router.get("/stats", response_model=PlayerStatsOut)
+def get_player_stats(
+    userid: int | None = Query(default=None,
+                               description="Defaults to the caller"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    userid = userid or current_user.userid
+    stats = db.get(UserStats, userid)
+    if not stats or not stats.games:
+        return PlayerStatsOut(userid=userid)
+
+    return PlayerStatsOut(
+        userid=userid,
+        games=stats.games,
+        wins=stats.wins,
+        losses=stats.losses,
+        draws=stats.draws,
+        by_reason=stats.by_reason or {},
+        current_streak=stats.current_streak,
+        best_streak=stats.best_streak,
+        avg_moves=stats.total_moves / stats.games,
+        avg_seconds=stats.total_seconds / stats.games,
+    )
+
+
+@router.get("/export")
+def export_my_matches(
+    since: datetime | None = Query(
+        default=None,
+        description="Only matches finished at or after this time"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    The caller's finished matches with their moves, one JSON object per
+    line (NDJSON), streamed in matchid order.
+    """
+    # the generator opens its own connection: the request session is
+    # closed before the body has finished streaming
+    games = iter_match_archive(db.get_bind(), current_user.userid, since)
+    return StreamingResponse(
+        iter_ndjson(games),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition":
+                 'attachment; filename="matches.ndjson"'},
+    )
+
+
+@router.get("/openings", response_model=OpeningPositionOut)
+def get_opening_stats(
+    line: str = Query(default="",
+                      description="Moves from the start position, comma "
+                      "separated, squares as in the PDN export "
+                      "(e.g. 22-18,11-15)"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """Moves played from the position reached by `line`, with outcomes."""
+    moves = [m.strip() for m in line.split(",") if m.strip()]
+    if len(moves) > settings.OPENING_TREE_MAX_TURNS:
+        raise HTTPException(status_code=422, detail="Line too long")
+    try:
+        _, _, board, next_turn = game_plies(
+            PdnGame(tags={"FEN": START_FEN}, movetext=" ".join(moves)))
+    except PdnError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    poshash = hash_position(board, next_turn)
+    stats = opening_tree.lookup(db, poshash)
+    return OpeningPositionOut(
+        line=moves,
+        poshash=poshash,
+        next_turn=next_turn,
+        moves=[
+            OpeningMoveOut(move=move, games=games, white_wins=white,
+                           black_wins=black, draws=draws)
+            for move, (games, white, black, draws) in sorted(
+                stats.items(), key=lambda kv: -kv[1][0])
+        ],
+    )
+
+
+def check_board(board: list) -> None:
+    ok = len(board) == 8 and all(len(row) == 8 for row in board)
+    if ok:
+        for r, row in enumerate(board):
+            for c, piece in enumerate(row):
+                if piece is None:
+                    continue
+                if (not is_playable(r, c)
+                        or piece.get("color") not in ("RED", "BLACK")):
+                    ok = False
+    if not ok:
+        raise HTTPException(status_code=422, detail="Invalid board")
+
+
+@router.post("/positions/search", response_model=PositionSearchOut)
+def search_matches_by_position(
+    body: PositionSearchIn,
+    limit: int = Query(default=20, ge=1, le=100),
+    after_matchid: int | None = Query(
+        default=None, ge=0,
+        description="Keyset cursor: next_after_matchid of the previous "
+        "page"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """Finished matches that reached the given position."""
+    check_board(body.board)
+    poshash = hash_position(body.board, body.next_turn)
+
+    rows = search_position(db, poshash, limit, after_matchid)
+    items = [
+        PositionMatchOut(
+            matchid=match.matchid,
+            move_number=move_number,
+            whiteuser=match.whiteuser,
+            blackuser=match.blackuser,
+            result=match.result,
+            finishedat=match.finishedat,
+        )
+        for match, move_number in rows
+    ]
+    return PositionSearchOut(
+        poshash=poshash,
+        items=items,
+        next_after_matchid=items[-1].matchid if len(items) == limit
+        else None,
+    )
+
+
 @router.get("/{matchid}", response_model=MatchDetailOut)
 def get_match_detail(
     matchid: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
+    cached = from_response_cache(request, current_user.userid)
+    if cached:
+        return cached
+
     match = db.get(Match, matchid)
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
 
     assert_user_in_match(match, current_user.userid)
-    return match
+    if match.status != "finished":
+        return match
+
+    return finished_response(
+        request, match,
+        lambda: MatchDetailOut.model_validate(match).model_dump_json()
+        .encode())
 
 
 @router.get("/{matchid}/moves", response_model=MatchMovesPageOut)
 def get_match_moves(
     matchid: int,
+    request: Request,
     limit: int = Query(default=200, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
+    after_move_number: int | None = Query(
+        default=None, ge=0,
+        description="Keyset cursor: next_after_move_number of the "
+        "previous page"),
+    include_total: bool = Query(default=True),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
+    cached = from_response_cache(request, current_user.userid)
+    if cached:
+        return cached
+
     match = db.get(Match, matchid)
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
 
     assert_user_in_match(match, current_user.userid)
 
-    total = db.execute(
-        select(func.count(MatchMove.id)).where(MatchMove.matchid == matchid)
-    ).scalar_one()
+    def page() -> MatchMovesPageOut:
+        return moves_page(db, match, limit, offset, after_move_number,
+                          include_total)
 
-    stmt = (
-        select(MatchMove)
-        .where(MatchMove.matchid == matchid)
-        .order_by(MatchMove.move_number.asc())
-        .limit(limit)
-        .offset(offset)
-    )
-    moves = db.execute(stmt).scalars().all()
+    if match.status != "finished":
+        return page()
+    return finished_response(
+        request, match, lambda: page().model_dump_json().encode())
+
+
+def moves_page(
+    db: Session,
+    match: Match,
+    limit: int,
+    offset: int,
+    after_move_number: int | None,
+    include_total: bool,
+) -> MatchMovesPageOut:
+    total = count_moves(db, match) if include_total else None
+    moves = load_moves(db, match, after_move_number, limit, offset)
+
+    next_after = None
+    if len(moves) == limit:
+        next_after = moves[-1].move_number
 
     return MatchMovesPageOut(
-        matchid=matchid,
-        total=int(total),
+        matchid=match.matchid,
+        total=int(total) if total is not None else None,
+        next_after_move_number=next_after,
         items=[MatchMoveOut.model_validate(m) for m in moves],
     )
+
+
+@router.get("/{matchid}/position", response_model=MatchPositionOut)
+def get_match_position(
+    matchid: int,
+    request: Request,
+    move_number: int = Query(ge=0, description="0 = initial position"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """Board after `move_number` moves (nearest checkpoint + replay)."""
+    cached = from_response_cache(request, current_user.userid)
+    if cached:
+        return cached
+
+    match = db.get(Match, matchid)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    assert_user_in_match(match, current_user.userid)
+    if move_number > int(match.last_move_number or 0):
+        raise HTTPException(status_code=404, detail="Move not found")
+
+    def render() -> MatchPositionOut:
+        state = state_at(db, match, move_number)
+        board, next_turn, forced_from = state
+        return MatchPositionOut(
+            matchid=matchid,
+            move_number=move_number,
+            board=board,
+            next_turn=next_turn,
+            forced_from=list(forced_from) if forced_from else None,
+            must_capture=must_capture(state),
+        )
+
+    if match.status != "finished":
+        return render()
+    return finished_response(
+        request, match, lambda: render().model_dump_json().encode())
+
+
+def analysis_out(db: Session, job: AnalysisJob) -> MatchAnalysisOut:
+    rows = db.execute(
+        select(MatchAnalysis)
+        .where(MatchAnalysis.matchid == job.matchid)
+        .order_by(MatchAnalysis.move_number.asc())
+    ).scalars().all()
+    return MatchAnalysisOut(
+        matchid=job.matchid,
+        status=job.status,
+        depth=job.depth,
+        positions_total=job.positions_total,
+        positions_done=job.positions_done,
+        error=job.error,
+        items=[AnalysisPositionOut.model_validate(r) for r in rows],
+    )
+
+
+@router.post("/{matchid}/analysis", response_model=MatchAnalysisOut,
+             status_code=202)
+def request_match_analysis(
+    matchid: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Queue an engine evaluation of every position of a finished match.
+    Asking again returns the existing job; a failed one is retried.
+    """
+    match = db.get(Match, matchid)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    assert_user_in_match(match, current_user.userid)
+    if match.status != "finished":
+        raise HTTPException(status_code=409, detail="Match not finished")
+
+    job = request_analysis(db, match, settings.AI_ANALYSIS_DEPTH)
+    return analysis_out(db, job)
+
+
+@router.get("/{matchid}/analysis", response_model=MatchAnalysisOut)
+def get_match_analysis(
+    matchid: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """Progress of the analysis and the positions evaluated so far."""
+    match = db.get(Match, matchid)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    assert_user_in_match(match, current_user.userid)
+    job = db.get(AnalysisJob, matchid)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis not requested")
+    return analysis_out(db, job)
+
+
+@router.get("/{matchid}/pdn", response_class=PlainTextResponse)
+def get_match_pdn(
+    matchid: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    cached = from_response_cache(request, current_user.userid)
+    if cached:
+        return cached
+
+    # both players' names go in the tags: one query, not three
+    match = db.get(Match, matchid, options=[joinedload(Match.white),
+                                            joinedload(Match.black)])
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    assert_user_in_match(match, current_user.userid)
+
+    headers = {"Content-Disposition":
+               f'attachment; filename="match-{matchid}.pdn"'}
+    if match.status == "finished":
+        return finished_response(
+            request, match, lambda: match_pdn(db, match).encode(),
+            media_type="application/x-pdn", headers=tuple(headers.items()))
+    return PlainTextResponse(match_pdn(db, match),
+                             media_type="application/x-pdn",
+                             headers=headers)
+
+
+def match_pdn(db: Session, match: Match) -> str:
+    matchid = match.matchid
+    moves = load_moves(db, match)
+
+    tags = {"Event": f"Match {matchid}"}
+    if match.startedat:
+        tags["Date"] = match.startedat.strftime("%Y.%m.%d")
+    if match.white:
+        tags["White"] = match.white.username
+    if match.black:
+        tags["Black"] = match.black.username
+
+    result = match.result if match.status == "finished" else None
+    return format_game(tags, ({"player": m.player, "move": m.move}
+                              for m in moves), result)
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_principal
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func, or_
-from app.schemas.match import FindMatchResponse
+from app.schemas.match import AIMatchRequest, FindMatchResponse
 from app.db.models.match import Match
-from app.db.models.user import User
+from app.db.match_events import on_match_finished
+from app.core.config import settings
+from app.core.security import Principal
 from random import random
 
 router = APIRouter(prefix="/matchmaking", tags=["matchmaking"])
@@ -13,7 +15,7 @@ router = APIRouter(prefix="/matchmaking", tags=["matchmaking"])
 @router.post("/find", response_model=FindMatchResponse)
 def find_or_create_match(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     from sqlalchemy import delete, text
 
@@ -36,13 +38,16 @@ def find_or_create_match(
 
     WAIT_MINUTES = 1
 
+    if db.get_bind().dialect.name == "sqlite":
+        cutoff = func.datetime("now", f"-{WAIT_MINUTES} minutes")
+    else:
+        cutoff = func.date_sub(func.now(),
+                               text(f"INTERVAL {WAIT_MINUTES} MINUTE"))
+
     db.execute(
         delete(Match).where(
             Match.status == "waiting",
-            Match.startedat < func.date_sub(
-                func.now(),
-                text(f"INTERVAL {WAIT_MINUTES} MINUTE")
-            )
+            Match.startedat < cutoff
         )
     )
     db.commit()
@@ -122,11 +127,67 @@ def find_or_create_match(
                              waiting=True)
 
 
+@router.post("/ai", response_model=FindMatchResponse)
+def create_ai_match(
+    body: AIMatchRequest,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Start a match against the engine. It moves from the match websocket,
+    so connect to it as for any match.
+    """
+    from fastapi import HTTPException
+    from sqlalchemy import delete
+
+    if not 1 <= body.level <= len(settings.AI_LEVEL_DEPTHS):
+        raise HTTPException(status_code=400, detail="Unknown AI level")
+
+    ongoing = db.execute(
+        select(Match.matchid)
+        .where(
+            Match.status == "ongoing",
+            or_(Match.whiteuser == current_user.userid,
+                Match.blackuser == current_user.userid)
+        )
+        .limit(1)
+    ).first()
+    if ongoing:
+        raise HTTPException(status_code=409,
+                            detail="Already playing a match")
+
+    # stop waiting for a human opponent
+    db.execute(
+        delete(Match).where(
+            Match.status == "waiting",
+            or_(Match.whiteuser == current_user.userid,
+                Match.blackuser == current_user.userid)
+        )
+    )
+
+    my_role = body.color or ("white" if random() < 0.5 else "black")
+    new_match = Match(
+        startedat=func.now(),
+        status="ongoing",
+        ai_level=body.level
+    )
+    if my_role == "white":
+        new_match.whiteuser = current_user.userid
+    else:
+        new_match.blackuser = current_user.userid
+
+    db.add(new_match)
+    db.commit()
+    db.refresh(new_match)
+
+    return FindMatchResponse(match=new_match, role=my_role, waiting=False)
+
+
 @router.post("/{matchid}/resign")
 def resign_match(
     matchid: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     stmt = (
         select(Match)
@@ -154,6 +215,7 @@ def resign_match(
     match.reason = "resign"
     match.status = "finished"
     match.finishedat = func.now()
+    on_match_finished(db, match)
 
     db.commit()
     db.refresh(match)
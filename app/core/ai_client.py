@@ -0,0 +1,253 @@
+"""
+Async client for the TDLOG_AI engine (POST /ai/move).
+
+The engine always plays "my" side moving towards higher rows, on a grid
+of codes 0 empty, 1 my man, 2 my king, 3 opponent man, 4 opponent king,
+and answers with a path of [col, row] points. BLACK already moves down
+our board; for RED the board is rotated by 180 degrees on the way in and
+the path rotated back on the way out.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.checkers_rules import Board, piece_captures
+from app.core.checkers_search import LocalSearch, local_search
+from app.core.checkers_rules import all_captures_for_color
+from app.core.checkers_rules import validate_and_apply_move
+from app.core.config import settings
+from app.core.engine_cache import CachedReply, EngineReplyCache
+from app.core.engine_cache import engine_reply_cache
+from app.core.zobrist import hash_position
+
+
+class EngineError(Exception):
+    pass
+
+
+class EngineUnavailable(EngineError):
+    """No answer within the deadline (after retries)."""
+
+
+class EngineMoveError(EngineError):
+    """The engine answered with something that is not a legal move."""
+
+
+@dataclass(frozen=True)
+class EngineReply:
+    score: Optional[float]
+    # websocket move payloads, one per hop: {"from": [r, c], "to": [r, c]}
+    moves: List[Dict[str, Any]]
+
+
+def _rotate(r: int, c: int, color: str) -> Tuple[int, int]:
+    return (7 - r, 7 - c) if color == "RED" else (r, c)
+
+
+def encode_grid(board: Board, color: str) -> List[List[int]]:
+    """Board -> engine grid, from the point of view of `color`."""
+    grid = [[0] * 8 for _ in range(8)]
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if not piece:
+                continue
+            code = 1 if piece["color"] == color else 3
+            if piece.get("king"):
+                code += 1
+            gr, gc = _rotate(r, c, color)
+            grid[gr][gc] = code
+    return grid
+
+
+def decode_path(path: List[List[int]], color: str) -> List[Tuple[int, int]]:
+    """Engine [col, row] points -> our (row, col) squares."""
+    try:
+        return [_rotate(int(row), int(col), color) for col, row in path]
+    except (TypeError, ValueError):
+        raise EngineMoveError(f"Malformed path {path!r}")
+
+
+def path_to_moves(board: Board, color: str,
+                  path: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """
+    Split a path into the hops the websocket stores, checking each one
+    with the server rules. The engine promotes at the end of a capture
+    sequence; our rules end the turn on promotion, so hops past it are
+    dropped.
+    """
+    if len(path) < 2:
+        raise EngineMoveError("Engine returned no move")
+
+    moves = []
+    forced_from = None
+    last = len(path) - 2
+    for i, (frm, to) in enumerate(zip(path, path[1:])):
+        move = {"from": list(frm), "to": list(to)}
+        must_capture = bool(all_captures_for_color(board, color))
+        try:
+            board, was_cap, pos, _ = validate_and_apply_move(
+                board, color, move, forced_from,
+                must_capture or forced_from is not None)
+        except ValueError as e:
+            raise EngineMoveError(f"Illegal engine move {move}: {e}")
+        moves.append(move)
+        if board[pos[0]][pos[1]].pop("_kinged_now", False):
+            break
+        if not was_cap:
+            if i != last:
+                raise EngineMoveError("Engine path continues after a step")
+            break
+        forced_from = pos
+    else:
+        if piece_captures(board, *forced_from):
+            raise EngineMoveError(
+                "Engine left a capture sequence unfinished")
+    return moves
+
+
+class EngineClient:
+    """
+    One pooled httpx.AsyncClient per process (keep-alive connections to
+    the engine). Each call has an overall deadline; connection errors,
+    timeouts and 5xx answers are retried within it. Replies go through
+    the cache, if any. With a fallback, an unavailable engine is replaced
+    by the local search for whatever time is left.
+    """
+
+    def __init__(self, base_url: str, timeout: float, retries: int,
+                 max_connections: int,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache: Optional[EngineReplyCache] = None,
+                 fallback: Optional[LocalSearch] = None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.transport = transport
+        self.cache = cache
+        self.fallback = fallback
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.failures = 0
+        self.fallbacks = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def best_move(self, board: Board, color: str, depth: int,
+                        deadline: Optional[float] = None,
+                        local: bool = False,
+                        use_fallback: bool = True) -> EngineReply:
+        """
+        Ask for `color`'s move. `deadline` is a time.monotonic() value
+        (default: now + timeout). `local` skips the engine; without
+        `use_fallback` an unavailable engine raises EngineUnavailable.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        if local:
+            return await self._local(board, color, depth, deadline)
+        try:
+            return await self._engine(board, color, depth, deadline)
+        except EngineUnavailable:
+            if self.fallback is None or not use_fallback:
+                raise
+            self.fallbacks += 1
+            return await self._local(board, color, depth, deadline)
+
+    async def _local(self, board: Board, color: str, depth: int,
+                     deadline: float) -> EngineReply:
+        if self.fallback is None:
+            raise EngineUnavailable("No local search configured")
+        # search() still returns a legal move when no time is left
+        seconds = max(0.0, deadline - time.monotonic())
+        score, path = await self.fallback.run(board, color, depth, seconds)
+        return EngineReply(score=score,
+                           moves=path_to_moves(board, color, path))
+
+    async def _engine(self, board: Board, color: str, depth: int,
+                      deadline: float) -> EngineReply:
+        role = "white" if color == "RED" else "black"
+        key = (hash_position(board, role), role, depth)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    return EngineReply(cached.score, path_to_moves(
+                        board, color, list(cached.path)))
+                except EngineMoveError:
+                    self.cache.discard(key)
+
+        started = time.monotonic()
+        data = await self._request(
+            {"grid": encode_grid(board, color), "depth": depth}, deadline)
+        path = decode_path(data.get("path") or [], color)
+        reply = EngineReply(score=data.get("score"),
+                            moves=path_to_moves(board, color, path))
+        if self.cache is not None:
+            self.cache.put(key, CachedReply(data.get("score"), tuple(path),
+                                            time.monotonic() - started))
+        return reply
+
+    async def _request(self, body: Dict[str, Any],
+                       deadline: float) -> Dict[str, Any]:
+        last_error: Exception = EngineUnavailable("deadline exceeded")
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.requests += 1
+            try:
+                resp = await asyncio.wait_for(
+                    self.client.post("/ai/move", json=body,
+                                     timeout=remaining),
+                    remaining)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                last_error = e
+            else:
+                if resp.status_code < 500:
+                    if resp.status_code != 200:
+                        self.failures += 1
+                        raise EngineError(
+                            f"Engine returned {resp.status_code}: "
+                            f"{resp.text[:200]}")
+                    return resp.json()
+                last_error = EngineError(f"Engine returned "
+                                         f"{resp.status_code}")
+            await asyncio.sleep(min(0.05 * 2 ** attempt,
+                                    max(0.0, deadline - time.monotonic())))
+
+        self.failures += 1
+        raise EngineUnavailable(str(last_error) or repr(last_error))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "failures": self.failures,
+                "fallbacks": self.fallbacks}
+
+
+engine_client = EngineClient(
+    base_url=settings.AI_ENGINE_URL,
+    timeout=settings.AI_ENGINE_TIMEOUT_SECONDS,
+    retries=settings.AI_ENGINE_RETRIES,
+    max_connections=settings.AI_ENGINE_MAX_CONNECTIONS,
+    cache=engine_reply_cache,
+    fallback=local_search,
+)
@@ -0,0 +1,181 @@
+"""
+Admission control in front of the engine client.
+
+At most `concurrency` engine requests run at once. The others wait in a
+queue ordered by deadline (earliest first), so the game whose player
+moved longest ago, or whose level leaves the least time, goes next.
+Local searches run beside them, without taking a slot.
+Identical requests (same position, side and depth) share one engine call.
+A search at full depth only gets part of the remaining time; if it does
+not answer in time, the rest goes to a search at fallback_depth, and if
+the engine is still unavailable (or the queue did not get to the request
+in time), to the client's local search, which is kept a fallback_share
+of the time. The scheduler owns that chain: the client is asked not to
+fall back itself.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.ai_client import EngineClient, EngineReply, EngineUnavailable
+from app.core.ai_client import engine_client
+from app.core.checkers_rules import Board
+from app.core.config import settings
+from app.core.zobrist import hash_position
+
+
+class AIScheduler:
+    def __init__(self, client: EngineClient, concurrency: int,
+                 fallback_depth: int, fallback_share: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.concurrency = concurrency
+        self.fallback_depth = fallback_depth
+        self.fallback_share = fallback_share
+        self.clock = clock
+        self._active = 0
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._inflight: Dict[Tuple[int, str, int, bool],
+                             asyncio.Future] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+        self.local_fallbacks = 0
+        self.expired = 0
+        self.started = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def best_move(self, board: Board, color: str, depth: int,
+                        deadline: Optional[float] = None,
+                        priority: Optional[float] = None,
+                        local: bool = False) -> EngineReply:
+        """
+        Same contract as EngineClient.best_move. `priority` orders the
+        queue (lower first) and defaults to the deadline.
+        """
+        if deadline is None:
+            deadline = self.clock() + self.client.timeout
+        role = "white" if color == "RED" else "black"
+        key = (hash_position(board, role), role, depth, local)
+
+        self.requests += 1
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            return await asyncio.shield(shared)
+
+        task = asyncio.ensure_future(self._run(
+            board, color, depth, deadline,
+            deadline if priority is None else priority, local))
+        self._inflight[key] = task
+        task.add_done_callback(
+            lambda t: self._inflight.pop(key)
+            if self._inflight.get(key) is t else None)
+        return await asyncio.shield(task)
+
+    async def _run(self, board: Board, color: str, depth: int,
+                   deadline: float, priority: float,
+                   local: bool) -> EngineReply:
+        if local:
+            # in-process: does not take one of the engine's slots
+            return await self.client.best_move(board, color, depth,
+                                               deadline=deadline,
+                                               local=True)
+        # with a local search, its fallback_share of the time is kept for
+        # it, whichever of the engine steps below runs out
+        engine_deadline = deadline
+        if self.client.fallback is not None:
+            engine_deadline -= (deadline - self.clock()) * self.fallback_share
+        queued_at = self.clock()
+        try:
+            await self._acquire(priority, engine_deadline)
+        except EngineUnavailable:
+            if self.client.fallback is None:
+                raise
+        else:
+            waited = self.clock() - queued_at
+            self.started += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            try:
+                return await self._engine(board, color, depth,
+                                          engine_deadline)
+            except EngineUnavailable:
+                if self.client.fallback is None:
+                    raise
+            finally:
+                self._release()
+        self.local_fallbacks += 1
+        return await self.client.best_move(board, color, depth,
+                                           deadline=deadline, local=True)
+
+    async def _engine(self, board: Board, color: str, depth: int,
+                      deadline: float) -> EngineReply:
+        if depth > self.fallback_depth:
+            remaining = deadline - self.clock()
+            try:
+                return await self.client.best_move(
+                    board, color, depth, deadline=self.clock()
+                    + remaining * (1 - self.fallback_share),
+                    use_fallback=False)
+            except EngineUnavailable:
+                self.fallbacks += 1
+            depth = self.fallback_depth
+        return await self.client.best_move(board, color, depth,
+                                           deadline=deadline,
+                                           use_fallback=False)
+
+    async def _acquire(self, priority: float, deadline: float) -> None:
+        # live waiters only exist while every slot is taken
+        if self._active < self.concurrency:
+            self._active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter),
+                                   max(0.0, deadline - self.clock()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # handed a slot just too late
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired += 1
+                raise EngineUnavailable("deadline passed while queued")
+            raise
+
+    def _release(self) -> None:
+        # hand the slot over to the most urgent live waiter
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": sum(1 for *_, w in self._waiters if not w.done()),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "fallbacks": self.fallbacks,
+            "local_fallbacks": self.local_fallbacks,
+            "expired": self.expired,
+            "wait_seconds_avg": (self.wait_seconds_total / self.started
+                                 if self.started else 0.0),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+ai_scheduler = AIScheduler(
+    client=engine_client,
+    concurrency=settings.AI_SCHEDULER_CONCURRENCY,
+    fallback_depth=settings.AI_FALLBACK_DEPTH,
+    fallback_share=settings.AI_FALLBACK_SHARE,
+)
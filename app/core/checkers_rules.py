@@ -0,0 +1,298 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# piece: {"color": "RED"/"BLACK", "king": bool}
+Board = List[List[Optional[Dict[str, Any]]]]
+
+
+def role_to_color(role: str) -> str:
+    # frontend mapea white->RED, black->BLACK
+    return "RED" if role == "white" else "BLACK"
+
+
+def in_bounds(r: int, c: int) -> bool:
+    return 0 <= r < 8 and 0 <= c < 8
+
+
+def is_playable(r: int, c: int) -> bool:
+    return (r + c) % 2 == 1
+
+
+def forward_dir(color: str) -> int:
+    # RED (abajo) sube: -1 ; BLACK (arriba) baja: +1
+    return -1 if color == "RED" else +1
+
+
+def initial_board() -> Board:
+    b: Board = [[None for _ in range(8)] for _ in range(8)]
+    for r in range(8):
+        for c in range(8):
+            if not is_playable(r, c):
+                continue
+            if r < 3:
+                b[r][c] = {"color": "BLACK", "king": False}
+            elif r > 4:
+                b[r][c] = {"color": "RED", "king": False}
+    return b
+
+
+def dirs_for_piece(piece: Dict[str, Any]) -> List[Tuple[int, int]]:
+    if piece.get("king"):
+        return [(-1, -1), (-1, +1), (+1, -1), (+1, +1)]
+    dr = forward_dir(piece["color"])
+    return [(dr, -1), (dr, +1)]
+
+
+def piece_captures(board: Board, r: int, c: int) -> List[Dict[str, Any]]:
+    piece = board[r][c]
+    if not piece:
+        return []
+    out = []
+    for dr, dc in dirs_for_piece(piece):
+        r2, c2 = r + 2 * dr, c + 2 * dc
+        rm, cm = r + dr, c + dc
+        if not in_bounds(r2, c2) or not is_playable(r2, c2):
+            continue
+        if board[r2][c2] is not None:
+            continue
+        mid = board[rm][cm]
+        if mid and mid["color"] != piece["color"]:
+            out.append({"from": [r, c], "to": [r2, c2], "capture": [rm, cm]})
+    return out
+
+
+def all_captures_for_color(board: Board, color: str) -> List[Dict[str, Any]]:
+    caps = []
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p and p["color"] == color:
+                caps.extend(piece_captures(board, r, c))
+    return caps
+
+
+def validate_and_apply_move(
+    board: Board,
+    color: str,
+    move: Dict[str, Any],
+    forced_from: Optional[Tuple[int, int]],
+    must_capture: bool,
+) -> Tuple[Board, bool, Tuple[int, int], Optional[Tuple[int, int]]]:
+    """
+    Returns:
+      new_board, was_capture, new_pos, captured_pos
+    """
+    if not isinstance(move, dict):
+        raise ValueError("Move must be an object")
+
+    frm = move.get("from")
+    to = move.get("to")
+    if not (isinstance(frm, list)
+            and isinstance(to, list)
+            and len(frm) == 2
+            and len(to) == 2):
+        raise ValueError("Move must contain from/to as [row, col]")
+
+    fr, fc = int(frm[0]), int(frm[1])
+    tr, tc = int(to[0]), int(to[1])
+
+    if not in_bounds(fr, fc) or not in_bounds(tr, tc):
+        raise ValueError("Out of bounds")
+    if not is_playable(fr, fc) or not is_playable(tr, tc):
+        raise ValueError("Non-playable square")
+    if forced_from and (fr, fc) != forced_from:
+        raise ValueError(
+            f"Must continue capture chain from {list(forced_from)}")
+
+    piece = board[fr][fc]
+    if not piece:
+        raise ValueError("No piece at from")
+    if piece["color"] != color:
+        raise ValueError("Not your piece")
+    if board[tr][tc] is not None:
+        raise ValueError("Destination not empty")
+
+    dr = tr - fr
+    dc = tc - fc
+
+    # Step move
+    if abs(dr) == 1 and abs(dc) == 1:
+        if must_capture:
+            raise ValueError("Capture is mandatory")
+        # direction constraint for men
+        if not piece.get("king"):
+            if dr != forward_dir(color):
+                raise ValueError("Illegal direction for man")
+        # apply
+        new_board = [[(p.copy() if p else None) for p in row] for row in board]
+        new_board[fr][fc] = None
+        new_board[tr][tc] = piece.copy()
+        # crowning
+        if new_board[tr][tc]["color"] == "RED" and tr == 0:
+            new_board[tr][tc]["king"] = True
+        if new_board[tr][tc]["color"] == "BLACK" and tr == 7:
+            new_board[tr][tc]["king"] = True
+        return new_board, False, (tr, tc), None
+
+    # Capture move
+    if abs(dr) == 2 and abs(dc) == 2:
+        # direction constraint for men
+        if not piece.get("king"):
+            if dr != 2 * forward_dir(color):
+                raise ValueError("Illegal capture direction for man")
+
+        mr = fr + dr // 2
+        mc = fc + dc // 2
+        mid = board[mr][mc]
+        if not mid or mid["color"] == color:
+            raise ValueError("No opponent piece to capture")
+
+        new_board = [[(p.copy() if p else None) for p in row] for row in board]
+        new_board[fr][fc] = None
+        new_board[mr][mc] = None
+        new_board[tr][tc] = piece.copy()
+
+        # crowning (regla típica: si corona, el turno termina)
+        kinged_now = False
+        if (new_board[tr][tc]["color"] == "RED" and tr == 0 and
+                not new_board[tr][tc].get("king")):
+            new_board[tr][tc]["king"] = True
+            kinged_now = True
+        if (new_board[tr][tc]["color"] == "BLACK" and tr == 7 and
+                not new_board[tr][tc].get("king")):
+            new_board[tr][tc]["king"] = True
+            kinged_now = True
+
+        # (usar para cortar cadena)
+        new_board[tr][tc]["_kinged_now"] = kinged_now
+        return new_board, True, (tr, tc), (mr, mc)
+
+    raise ValueError("Illegal move geometry")
+
+
+def iter_states(
+    moves: Iterable[Dict[str, Any]],
+    board: Optional[Board] = None,
+    next_role: str = "white",
+    forced_from: Optional[Tuple[int, int]] = None,
+) -> Iterator[Tuple[Board, str, Optional[Tuple[int, int]]]]:
+    """
+    Simula las jugadas desde (board, next_role, forced_from), por defecto
+    el tablero inicial.
+    Devuelve tras cada jugada: board, next_role_to_play, forced_from
+    (forced_from no es None mientras una cadena de capturas sigue abierta)
+    """
+    if board is None:
+        board = initial_board()
+
+    for m in moves:
+        player = m["player"]
+        mv = m["move"]
+        color = role_to_color(player)
+
+        # el historial debería ser consistente; si no,
+        # igual lo simulamos “como está”
+        if player != next_role:
+            # en caso de inconsistencia, forzamos a
+            # lo que dice DB (evita explotar)
+            next_role = player
+            forced_from = None
+
+        must_cap = len(all_captures_for_color(board, color)) > 0
+
+        board, was_cap, new_pos, _ = validate_and_apply_move(
+            board=board,
+            color=color,
+            move=mv,
+            forced_from=forced_from,
+            must_capture=must_cap or (forced_from is not None),
+        )
+
+        # cortar cadena si se coronó en esta jugada (variante típica)
+        kinged_now = False
+        p = board[new_pos[0]][new_pos[1]]
+        if p and p.pop("_kinged_now", False):
+            kinged_now = True
+
+        if was_cap and not kinged_now:
+            more_caps = piece_captures(board, new_pos[0], new_pos[1])
+            if more_caps:
+                forced_from = new_pos
+                next_role = player   # MISMO jugador continúa
+                yield board, next_role, forced_from
+                continue
+
+        forced_from = None
+        next_role = "black" if player == "white" else "white"
+        yield board, next_role, forced_from
+
+
+def compute_state_from_history(
+    moves: List[Dict[str, Any]],
+) -> Tuple[Board, str, Optional[Tuple[int, int]], bool]:
+    """
+    Simula el juego desde tablero inicial.
+    Devuelve: board, next_role_to_play, forced_from, must_capture_for_next
+    """
+    board = initial_board()
+    next_role = "white"
+    forced_from: Optional[Tuple[int, int]] = None
+
+    for board, next_role, forced_from in iter_states(moves, board):
+        pass
+
+    # estado para el próximo jugador
+    next_color = role_to_color(next_role)
+    must_capture = len(all_captures_for_color(board, next_color)) > 0
+    return board, next_role, forced_from, must_capture
+
+
+def piece_steps(board: Board, r: int, c: int) -> List[Dict[str, Any]]:
+    piece = board[r][c]
+    if not piece:
+        return []
+    out = []
+    for dr, dc in dirs_for_piece(piece):
+        r1, c1 = r + dr, c + dc
+        if not in_bounds(r1, c1) or not is_playable(r1, c1):
+            continue
+        if board[r1][c1] is None:
+            out.append({"from": [r, c], "to": [r1, c1]})
+    return out
+
+
+def all_steps_for_color(board: Board, color: str) -> List[Dict[str, Any]]:
+    steps = []
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p and p["color"] == color:
+                steps.extend(piece_steps(board, r, c))
+    return steps
+
+
+def has_any_legal_move(board: Board, color: str) -> bool:
+    caps = all_captures_for_color(board, color)
+    if caps:
+        return True  # capture exists => at least one legal move
+    steps = all_steps_for_color(board, color)
+    return len(steps) > 0
+
+
+def opposite_role(role: str) -> str:
+    return "black" if role == "white" else "white"
+
+
+def compute_game_over(board: Board, next_role: str) -> Tuple[bool, str, str]:
+    """
+    Returns: (is_over, result, reason)
+    result in {'white','black','draw','none'}
+    reason in {'normal', ...}
+    """
+    next_color = role_to_color(next_role)
+
+    # If next player cannot move => they lose => other wins
+    if not has_any_legal_move(board, next_color):
+        winner = opposite_role(next_role)
+        return True, winner, "normal"
+
+    return False, "none", "none"
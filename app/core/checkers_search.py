@@ -0,0 +1,260 @@
+"""
+In-process move search, for when the TDLOG_AI engine is unavailable and
+for the lowest AI levels.
+
+Iterative deepening negamax with alpha-beta pruning, a transposition
+table and move ordering (previous best move first, then captures of
+more pieces), under a hard time budget: the last fully searched depth
+wins. Same rules as checkers_rules (men move and capture forwards,
+captures are mandatory, a capture chain ends on promotion).
+
+Positions are 32-tuples over the PDN squares (index = square - 1):
+1/2 RED man/king, -1/-2 BLACK man/king, 0 empty. Searches run in a
+process pool (LocalSearch), never on the event loop.
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.core.checkers_rules import Board
+from app.core.config import settings
+from app.core.pdn import coords_of, square_of
+
+Position = Tuple[int, ...]
+Turn = Tuple[Tuple[int, ...], Position]  # (squares visited, position after)
+
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+RED_MAN_DIRS = (0, 1)
+BLACK_MAN_DIRS = (2, 3)
+ALL_DIRS = (0, 1, 2, 3)
+
+
+def _neighbours():
+    index = {coords_of(s + 1): s for s in range(32)}
+    step = [[-1] * 4 for _ in range(32)]
+    jump = [[(-1, -1)] * 4 for _ in range(32)]
+    for s in range(32):
+        r, c = coords_of(s + 1)
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            step[s][d] = index.get((r + dr, c + dc), -1)
+            if (r + 2 * dr, c + 2 * dc) in index:
+                jump[s][d] = (index[(r + dr, c + dc)],
+                              index[(r + 2 * dr, c + 2 * dc)])
+    return step, jump
+
+
+STEP, JUMP = _neighbours()
+# promotion squares: row 0 for RED, row 7 for BLACK
+PROMOTES = {1: range(0, 4), -1: range(28, 32)}
+ROW = [coords_of(s + 1)[0] for s in range(32)]
+
+MAN, KING = 100, 160
+WIN = 100000
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def pack(board: Board) -> Position:
+    cells = [0] * 32
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece:
+                value = 2 if piece.get("king") else 1
+                cells[square_of(r, c) - 1] = (value if piece["color"] == "RED"
+                                              else -value)
+    return tuple(cells)
+
+
+def _dirs(piece: int) -> Tuple[int, ...]:
+    if abs(piece) == 2:
+        return ALL_DIRS
+    return RED_MAN_DIRS if piece > 0 else BLACK_MAN_DIRS
+
+
+def _captures(pos: List[int], s: int, piece: int, side: int
+              ) -> List[Tuple[List[int], List[int]]]:
+    out = []
+    for d in _dirs(piece):
+        over, land = JUMP[s][d]
+        if land < 0 or pos[land] != 0 or pos[over] * side >= 0:
+            continue
+        after = list(pos)
+        after[s] = after[over] = 0
+        if abs(piece) == 1 and land in PROMOTES[side]:
+            after[land] = 2 * side
+            out.append(([s, land], after))  # promotion ends the chain
+            continue
+        after[land] = piece
+        more = _captures(after, land, piece, side)
+        if more:
+            out.extend(([s] + path, final) for path, final in more)
+        else:
+            out.append(([s, land], after))
+    return out
+
+
+def legal_turns(pos: Position, side: int) -> List[Turn]:
+    """Every complete turn for side (1 RED, -1 BLACK)."""
+    turns: List[Turn] = []
+    for s in range(32):
+        piece = pos[s]
+        if piece * side > 0:
+            for path, after in _captures(list(pos), s, piece, side):
+                turns.append((tuple(path), tuple(after)))
+    if turns:
+        return turns
+    for s in range(32):
+        piece = pos[s]
+        if piece * side <= 0:
+            continue
+        for d in _dirs(piece):
+            to = STEP[s][d]
+            if to < 0 or pos[to] != 0:
+                continue
+            after = list(pos)
+            after[s] = 0
+            promoted = abs(piece) == 1 and to in PROMOTES[side]
+            after[to] = 2 * side if promoted else piece
+            turns.append(((s, to), tuple(after)))
+    return turns
+
+
+def evaluate(pos: Position, side: int) -> int:
+    """Material plus a small bonus for advanced men, from side's view."""
+    score = 0
+    for s, piece in enumerate(pos):
+        if piece == 1:
+            score += MAN + 2 * (7 - ROW[s])
+        elif piece == -1:
+            score -= MAN + 2 * ROW[s]
+        elif piece == 2:
+            score += KING
+        elif piece == -2:
+            score -= KING
+    return score * side
+
+
+class _Search:
+    def __init__(self, stop_at: float):
+        self.stop_at = stop_at
+        self.nodes = 0
+        # (pos, side) -> (depth, score, flag, best turn index)
+        self.table: Dict[Tuple[Position, int], Tuple[int, int, int, int]] = {}
+
+    def negamax(self, pos: Position, side: int, depth: int, alpha: int,
+                beta: int, ply: int) -> Tuple[int, int]:
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.monotonic() >= self.stop_at:
+            raise SearchTimeout()
+
+        turns = legal_turns(pos, side)
+        if not turns:
+            return -WIN + ply, -1
+        if depth == 0:
+            return evaluate(pos, side), -1
+
+        key = (pos, side)
+        entry = self.table.get(key)
+        order = list(range(len(turns)))
+        if entry is not None:
+            e_depth, e_score, flag, best = entry
+            if e_depth >= depth:
+                if flag == 0:
+                    return e_score, best
+                if flag < 0 and e_score <= alpha:
+                    return e_score, best
+                if flag > 0 and e_score >= beta:
+                    return e_score, best
+            if 0 <= best < len(turns):
+                order.remove(best)
+                order.insert(0, best)
+        if len(turns[0][0]) > 2:
+            # then longer capture chains first
+            first = order[0] if entry is not None else -1
+            order.sort(key=lambda i: (i != first, -len(turns[i][0])))
+
+        alpha_in = alpha
+        best_score, best = -WIN - 1, -1
+        for i in order:
+            score = -self.negamax(turns[i][1], -side, depth - 1, -beta,
+                                  -alpha, ply + 1)[0]
+            if score > best_score:
+                best_score, best = score, i
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        flag = -1 if best_score <= alpha_in else 1 if best_score >= beta \
+            else 0
+        self.table[key] = (depth, best_score, flag, best)
+        return best_score, best
+
+
+def search(pos: Position, side: int, max_depth: int, seconds: float
+           ) -> Tuple[Optional[int], List[Tuple[int, int]], int]:
+    """
+    Best turn for side -> (score, path as (row, col) squares, depth
+    reached). The path is empty if side has no move.
+    """
+    turns = legal_turns(pos, side)
+    if not turns:
+        return None, [], 0
+    if len(turns) == 1:
+        return None, [coords_of(s + 1) for s in turns[0][0]], 0
+
+    state = _Search(time.monotonic() + seconds)
+    score, best, reached = None, 0, 0
+    for depth in range(1, max(1, max_depth) + 1):
+        try:
+            score, best = state.negamax(pos, side, depth, -WIN - 1, WIN + 1,
+                                        0)
+        except SearchTimeout:
+            break
+        reached = depth
+        if abs(score) >= WIN - 1000:
+            break  # forced result found
+    return score, [coords_of(s + 1) for s in turns[best][0]], reached
+
+
+class LocalSearch:
+    """Runs searches in worker processes (CPU bound, so not in threads)."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, board: Board, color: str, depth: int,
+                  seconds: float
+                  ) -> Tuple[Optional[int], List[Tuple[int, int]]]:
+        """(score, path) for color, searching for at most `seconds`."""
+        started = time.monotonic()
+        score, path, _ = await asyncio.wrap_future(self.executor.submit(
+            search, pack(board), 1 if color == "RED" else -1, depth,
+            seconds))
+        self.searches += 1
+        self.search_seconds += time.monotonic() - started
+        return score, path
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, float]:
+        return {"workers": self.workers, "searches": self.searches,
+                "search_seconds": round(self.search_seconds, 3)}
+
+
+local_search = LocalSearch(workers=settings.AI_LOCAL_SEARCH_WORKERS)
@@ -9,13 +9,95 @@ class Settings(BaseSettings):
     MYSQL_HOST: str = "127.0.0.1"
     MYSQL_PORT: int = 3306
     MYSQL_DB: str = "checkers"
+    # Overrides the MySQL settings above (e.g. sqlite:///./local.db)
+    DATABASE_URL: str | None = None
+    # connection pool (ignored for sqlite). Connections are held per
+    # request / websocket message, not per connected socket; recycle
+    # below MySQL's wait_timeout
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
 
     JWT_SECRET: str = "change-me"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 300
+
+    # serialized finished-match responses kept in process
+    MATCH_RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    MATCH_RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # opening tree: turns counted per game, and the smallest positions
+    # kept in memory (all of them are persisted)
+    OPENING_TREE_MAX_TURNS: int = 20
+    OPENING_TREE_MIN_GAMES: int = 2
+    OPENING_TREE_REFRESH_SECONDS: int = 300
+
+    # finished matches store their state every N moves for replay
+    REPLAY_CHECKPOINT_INTERVAL: int = 20
+
+    # TDLOG_AI engine (POST /ai/move); the timeout covers all retries
+    AI_ENGINE_URL: str = "http://localhost:8080"
+    AI_ENGINE_TIMEOUT_SECONDS: float = 5.0
+    AI_ENGINE_RETRIES: int = 2
+    AI_ENGINE_MAX_CONNECTIONS: int = 8
+    # replies by (position, side, depth); the SQLite file keeps them
+    # across restarts (e.g. ./engine_cache.db), None = memory only
+    AI_REPLY_CACHE_MAX_ENTRIES: int = 50000
+    AI_REPLY_CACHE_PATH: str | None = None
+    # engine requests in flight at once (the rest queue by deadline); a
+    # search not done after (1 - share) of its time is redone at the
+    # fallback depth with what is left
+    AI_SCHEDULER_CONCURRENCY: int = 4
+    AI_FALLBACK_DEPTH: int = 2
+    AI_FALLBACK_SHARE: float = 0.3
+    # in-process search (checkers_search): used when the engine is
+    # unavailable and for AI levels up to AI_LOCAL_MAX_LEVEL
+    AI_LOCAL_SEARCH_WORKERS: int = 2
+    AI_LOCAL_MAX_LEVEL: int = 1
+    # post-game analysis (app.db.analysis): search per position, positions
+    # evaluated at once and per commit, and when a running job whose
+    # worker went quiet is taken over
+    AI_ANALYSIS_DEPTH: int = 6
+    AI_ANALYSIS_SECONDS: float = 5.0
+    AI_ANALYSIS_CONCURRENCY: int = 2
+    AI_ANALYSIS_BATCH_SIZE: int = 16
+    AI_ANALYSIS_POLL_SECONDS: float = 5.0
+    AI_ANALYSIS_STALE_SECONDS: int = 600
+    # per AI level (1, 2, ...): search depth and seconds to answer
+    AI_LEVEL_DEPTHS: list[int] = [2, 4, 6, 8]
+    AI_LEVEL_MOVE_SECONDS: list[float] = [1.0, 2.0, 3.0, 5.0]
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 8
+
+    RATE_LIMIT_ENABLED: bool = True
+    # "memory" (per process) or "redis" (shared between workers)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+
+    # statements slower than this are logged (app.db.slow_query logger)
+    DB_SLOW_QUERY_SECONDS: float = 0.2
+
+    # /metrics (Prometheus text format); histogram bucket bounds in seconds
+    METRICS_ENABLED: bool = True
+    METRICS_HTTP_BUCKETS: tuple[float, ...] = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    METRICS_WS_BUCKETS: tuple[float, ...] = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+    # SQL statements per request / websocket move
+    METRICS_DB_STATEMENT_BUCKETS: tuple[float, ...] = (
+        1, 2, 3, 4, 6, 8, 12, 20, 50)
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return (
             f"mysql+pymysql://{self.MYSQL_USER}:"
             f"{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:"
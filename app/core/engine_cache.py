@@ -0,0 +1,144 @@
+"""
+Cache of engine replies keyed by (position hash, side, depth).
+
+An in-memory LRU, optionally backed by a SQLite file so replies survive
+restarts and can be precomputed (app.scripts.warm_engine_cache). Paths
+are stored in our (row, col) coordinates and re-checked against the
+board on every hit, so a hash collision costs a miss, not a wrong move.
+"""
+import json
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# (poshash, role, depth)
+Key = Tuple[int, str, int]
+
+
+@dataclass(frozen=True)
+class CachedReply:
+    score: Optional[float]
+    path: Tuple[Tuple[int, int], ...]
+    # how long the engine took, i.e. what a hit saves
+    seconds: float
+
+
+class EngineReplyCache:
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[Key, CachedReply]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def get(self, key: Key) -> Optional[CachedReply]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self.path:
+                entry = self._load(key)
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.seconds
+            return entry
+
+    def put(self, key: Key, entry: CachedReply) -> None:
+        with self._lock:
+            self._remember(key, entry)
+            if self.path:
+                self._store(key, entry)
+
+    def discard(self, key: Key) -> None:
+        """Forget an entry that turned out not to fit its position."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.path:
+                self._conn().execute(
+                    "DELETE FROM engine_replies"
+                    " WHERE poshash = ? AND role = ? AND depth = ?", key)
+                self._conn().commit()
+
+    def clear(self) -> None:
+        """Empty the memory tier (the file is kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+    def _remember(self, key: Key, entry: CachedReply) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS engine_replies ("
+                " poshash INTEGER NOT NULL, role TEXT NOT NULL,"
+                " depth INTEGER NOT NULL, score REAL, path TEXT NOT NULL,"
+                " seconds REAL NOT NULL,"
+                " PRIMARY KEY (poshash, role, depth))")
+        return self._db
+
+    def _load(self, key: Key) -> Optional[CachedReply]:
+        row = self._conn().execute(
+            "SELECT score, path, seconds FROM engine_replies"
+            " WHERE poshash = ? AND role = ? AND depth = ?", key).fetchone()
+        if row is None:
+            return None
+        score, path, seconds = row
+        return CachedReply(score, tuple(tuple(p) for p in json.loads(path)),
+                           seconds)
+
+    def _store(self, key: Key, entry: CachedReply) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO engine_replies"
+            " (poshash, role, depth, score, path, seconds)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, entry.score, json.dumps(entry.path), entry.seconds))
+        conn.commit()
+
+
+engine_reply_cache = EngineReplyCache(
+    max_entries=settings.AI_REPLY_CACHE_MAX_ENTRIES,
+    path=settings.AI_REPLY_CACHE_PATH,
+)
@@ -0,0 +1,246 @@
+"""
+In-process metrics, rendered in the Prometheus text format by /metrics.
+
+Recording is a dict lookup plus a bisect over the bucket bounds, cheap
+enough for the websocket move loop; everything else (the stats() of the
+caches, pools and the AI engine, room sizes) is only read when scraped.
+"""
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from app.core.config import settings
+from app.db.session import QueryStats, query_scope
+
+PREFIX = "checkers_"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} "
+                         f"{_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # labels -> [count per bucket (not cumulative), sum, count]
+        self._series: Dict[Tuple[Any, ...], list] = {}
+        self._lock = Lock()  # observed from the threadpool too
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets),
+                                                 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2])
+                      for k, v in sorted(self._series.items())]
+        names = self.labels + ("le",)
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_labels(names, key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} "
+                         f"{_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} "
+                         f"{count}")
+        return lines
+
+
+class Gauge:
+    """A value computed when scraped."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = PREFIX + name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(self.read())}"]
+
+
+class StatsGauges:
+    """
+    The stats() dict of a component, one gauge per numeric entry
+    (nested dicts become a `key` label), e.g. principal_cache's hits as
+    checkers_principal_cache_hits.
+    """
+
+    def __init__(self, component: str, stats: Callable[[], Dict[str, Any]]):
+        self.prefix = PREFIX + component + "_"
+        self.stats = stats
+
+    def render(self) -> List[str]:
+        lines = []
+        for field, value in self.stats().items():
+            name = self.prefix + field
+            if isinstance(value, dict):
+                samples = [(_labels(("key",), (k,)), v)
+                           for k, v in sorted(value.items())]
+            else:
+                samples = [("", value)]
+            samples = [(labels, v) for labels, v in samples
+                       if isinstance(v, (int, float))
+                       and not isinstance(v, bool)]
+            if samples:
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{labels} {_number(v)}"
+                             for labels, v in samples)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # one broken source must not hide the rest
+                lines.append(f"# error rendering {metric!r}: {e!r}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_seconds", "HTTP request latency by route",
+    ("method", "route", "status"), settings.METRICS_HTTP_BUCKETS))
+
+ws_move_seconds = registry.register(Histogram(
+    "ws_move_seconds", "Websocket move processing time by phase",
+    ("phase",), settings.METRICS_WS_BUCKETS))
+
+db_statements = registry.register(Histogram(
+    "db_statements", "SQL statements per HTTP request / websocket move",
+    ("kind", "route"), settings.METRICS_DB_STATEMENT_BUCKETS))
+
+db_seconds = registry.register(Histogram(
+    "db_seconds", "Time in SQL statements per HTTP request / websocket move",
+    ("kind", "route"), settings.METRICS_WS_BUCKETS))
+
+ws_move_errors = registry.register(Counter(
+    "ws_move_errors_total", "Websocket move messages rejected, by type",
+    ("type",)))
+
+
+class PhaseTimer:
+    """
+    Times consecutive phases of one websocket move into ws_move_seconds,
+    and counts the SQL statements run inside count_queries().
+    """
+
+    __slots__ = ("started", "last", "queries")
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.queries = QueryStats()
+
+    @contextmanager
+    def count_queries(self) -> Iterator[None]:
+        # scoped, so that tasks started after the block (the AI turn)
+        # do not add their statements to this move
+        with query_scope() as queries:
+            self.queries = queries
+            yield
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        ws_move_seconds.observe(now - self.last, phase)
+        self.last = now
+
+    def total(self) -> None:
+        ws_move_seconds.observe(time.perf_counter() - self.started, "total")
+        db_statements.observe(self.queries.count, "ws", "move")
+        db_seconds.observe(self.queries.seconds, "ws", "move")
+
+
+class HTTPMetricsMiddleware:
+    """
+    Latency and SQL statements per route template (not raw path, to
+    bound the labels).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        with query_scope() as queries:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                path = getattr(scope.get("route"), "path", "unmatched")
+                http_request_seconds.observe(time.perf_counter() - started,
+                                             scope["method"], path, status[0])
+                db_statements.observe(queries.count, "http", path)
+                db_seconds.observe(queries.seconds, "http", path)
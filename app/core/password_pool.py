@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+
+class PasswordPoolSaturated(Exception):
+    pass
+
+
+class PasswordHashPool:
+    """
+    Dedicated executor for bcrypt work, so hashing never occupies the
+    shared threadpool that sync endpoints run on. At most
+    workers + queue_limit tasks are admitted; beyond that we fail fast.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="pwhash")
+        self._slots = BoundedSemaphore(workers + queue_limit)
+        self._lock = Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.work_seconds = 0.0
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolSaturated()
+
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+
+        future = self._executor.submit(self._timed, time.perf_counter(),
+                                       fn, *args)
+        # release on real completion, even if the awaiting request is gone
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _timed(self, queued_at: float, fn: Callable, *args: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            done = time.perf_counter()
+            with self._lock:
+                self.wait_seconds += started - queued_at
+                self.work_seconds += done - started
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds": self.wait_seconds,
+                "work_seconds": self.work_seconds,
+            }
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
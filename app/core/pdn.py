@@ -0,0 +1,287 @@
+"""
+Portable Draughts Notation (English checkers, GameType 21).
+
+Squares are numbered 1-32 on the playable squares, row by row from the
+top of our board (BLACK side), so white/RED starts on 21-32 and black
+on 1-12. Standard PDN games have Black moving first; since white always
+opens here, such games are read rotated by 180 degrees (square s ->
+33 - s, colours swapped) and our own exports carry a FEN tag saying
+White is to move.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.checkers_rules import (
+    Board,
+    all_captures_for_color,
+    has_any_legal_move,
+    initial_board,
+    piece_captures,
+    role_to_color,
+    validate_and_apply_move,
+)
+
+WHITE_MEN = list(range(21, 33))
+BLACK_MEN = list(range(1, 13))
+START_FEN = ("W:W" + ",".join(map(str, WHITE_MEN))
+             + ":B" + ",".join(map(str, BLACK_MEN)))
+
+RESULT_TO_PDN = {"white": "1-0", "black": "0-1", "draw": "1/2-1/2"}
+PDN_RESULTS = {"1-0", "0-1", "1/2-1/2", "2-0", "0-2", "1-1", "*"}
+
+TAG_RE = re.compile(r'^\s*\[(\w+)\s+"(.*)"\s*\]\s*$')
+MOVE_RE = re.compile(r"^\d+(?:[-x:]\d+)+$")
+MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+
+
+class PdnError(ValueError):
+    pass
+
+
+def square_of(r: int, c: int) -> int:
+    return r * 4 + c // 2 + 1
+
+
+def coords_of(square: int) -> Tuple[int, int]:
+    if not 1 <= square <= 32:
+        raise PdnError(f"No such square: {square}")
+    r, i = divmod(square - 1, 4)
+    return r, 2 * i + (1 if r % 2 == 0 else 0)
+
+
+@dataclass
+class PdnGame:
+    tags: Dict[str, str] = field(default_factory=dict)
+    movetext: str = ""
+
+
+def iter_games(lines: Iterable[str]) -> Iterator[PdnGame]:
+    """
+    Split a PDN stream into games. A game ends at a result token closing
+    a line (outside comments) or where the next tag section starts.
+    """
+    game = PdnGame()
+    text: List[str] = []
+    for line in lines:
+        if line.startswith("%"):
+            continue
+        m = TAG_RE.match(line)
+        if m:
+            if text and any(t.strip() for t in text):
+                game.movetext = "".join(text)
+                yield game
+                game, text = PdnGame(), []
+            game.tags[m.group(1)] = m.group(2)
+            continue
+
+        text.append(line)
+        words = line.split()
+        if words and words[-1] in PDN_RESULTS:
+            movetext = "".join(text)
+            if movetext.count("{") == movetext.count("}"):
+                game.movetext = movetext
+                yield game
+                game, text = PdnGame(), []
+    if game.tags or any(t.strip() for t in text):
+        game.movetext = "".join(text)
+        yield game
+
+
+def parse_movetext(movetext: str) -> Tuple[List[List[int]], Optional[str]]:
+    """Moves as lists of squares, plus the result token if present."""
+    text = re.sub(r"\{[^}]*\}", " ", movetext)
+    while True:
+        stripped = re.sub(r"\([^()]*\)", " ", text)
+        if stripped == text:
+            break
+        text = stripped
+
+    moves: List[List[int]] = []
+    for token in text.split():
+        if token in PDN_RESULTS:
+            return moves, token
+        token = MOVE_NUMBER_RE.sub("", token).rstrip("!?*+")
+        if not token or token.startswith("$"):
+            continue
+        if not MOVE_RE.match(token):
+            raise PdnError(f"Unexpected token {token!r}")
+        moves.append([int(s) for s in re.split(r"[-x:]", token)])
+    return moves, None
+
+
+def black_moves_first(tags: Dict[str, str]) -> bool:
+    fen = tags.get("FEN")
+    if not fen:
+        return True
+    try:
+        turn, *sides = [part.strip() for part in fen.strip().split(":")]
+        men = {side[0]: sorted(int(s) for s in side[1:].split(",") if s)
+               for side in sides}
+    except (ValueError, IndexError):
+        raise PdnError(f"Unreadable FEN {fen!r}")
+    if men.get("W") != WHITE_MEN or men.get("B") != BLACK_MEN:
+        raise PdnError("Only games from the initial position are supported")
+    if turn not in ("W", "B"):
+        raise PdnError(f"Unreadable FEN {fen!r}")
+    return turn == "B"
+
+
+def _capture_chains(board: Board, color: str, r: int, c: int
+                    ) -> List[List[Tuple[int, int]]]:
+    """Every complete capture sequence from (r, c), as landing squares."""
+    chains = []
+    for cap in piece_captures(board, r, c):
+        new_board, _, pos, _ = validate_and_apply_move(
+            board, color, cap, forced_from=None, must_capture=True)
+        kinged_now = new_board[pos[0]][pos[1]].pop("_kinged_now", False)
+        rest = [] if kinged_now else _capture_chains(new_board, color, *pos)
+        if rest:
+            chains.extend([pos] + chain for chain in rest)
+        else:
+            chains.append([pos])
+    return chains
+
+
+def _resolve(board: Board, color: str, squares: List[int]
+             ) -> List[Tuple[int, int]]:
+    """
+    Expand a PDN move (start, [intermediate...], end) into the board
+    positions it passes through. Short capture notation ("9x25") is
+    matched against the legal capture chains from the start square.
+    """
+    path = [coords_of(s) for s in squares]
+    (fr, fc), (tr, tc) = path[0], path[-1]
+    if len(path) == 2 and abs(tr - fr) == 1 and abs(tc - fc) == 1:
+        return path
+
+    for chain in _capture_chains(board, color, fr, fc):
+        if chain[-1] != path[-1]:
+            continue
+        it = iter(chain)
+        if all(p in it for p in path[1:]):
+            return [path[0]] + chain
+    raise PdnError(f"Illegal move {'x'.join(map(str, squares))}")
+
+
+def game_plies(game: PdnGame
+               ) -> Tuple[List[Dict[str, Any]], Optional[str], Board, str]:
+    """
+    Replay a game through the server rules.
+
+    Returns (plies, result, final_board, role_to_move); plies are
+    {"player", "move"} dicts in the stored match_moves format, one per
+    capture hop, and result is "white"/"black"/"draw" or None.
+    """
+    flip = black_moves_first(game.tags)
+    moves, result_token = parse_movetext(game.movetext)
+    board = initial_board()
+    role = "white"
+    plies: List[Dict[str, Any]] = []
+
+    for number, squares in enumerate(moves, start=1):
+        if flip:
+            squares = [33 - s for s in squares]
+        color = role_to_color(role)
+        try:
+            path = _resolve(board, color, squares)
+            forced_from = None
+            for frm, to in zip(path, path[1:]):
+                must_capture = bool(all_captures_for_color(board, color))
+                board, was_cap, pos, _ = validate_and_apply_move(
+                    board, color, {"from": list(frm), "to": list(to)},
+                    forced_from=forced_from,
+                    must_capture=must_capture or forced_from is not None,
+                )
+                kinged_now = board[pos[0]][pos[1]].pop("_kinged_now", False)
+                plies.append({"player": role, "move": {
+                    "from": list(frm), "to": list(to), "was_capture": was_cap,
+                }})
+                forced_from = pos if was_cap else None
+            if (forced_from and not kinged_now
+                    and piece_captures(board, *forced_from)):
+                raise PdnError("Capture sequence is not complete")
+        except ValueError as e:
+            raise PdnError(f"Move {number} ({squares}): {e}") from e
+        role = "black" if role == "white" else "white"
+
+    token = game.tags.get("Result") or result_token
+    return plies, _result_of(token, flip), board, role
+
+
+def _result_of(token: Optional[str], flip: bool) -> Optional[str]:
+    if not token or token == "*":
+        return None
+    try:
+        white, black = (float(x) if "/" not in x else 0.5
+                        for x in token.split("-"))
+    except ValueError:
+        raise PdnError(f"Unreadable result {token!r}")
+    if white == black:
+        return "draw"
+    winner = "white" if white > black else "black"
+    if flip:
+        winner = "black" if winner == "white" else "white"
+    return winner
+
+
+def finish_reason(result: Optional[str], board: Board, role: str) -> str:
+    """Best guess for matches.reason of an imported game."""
+    if result is None:
+        return "none"
+    if result == "draw":
+        return "agreement"
+    if role != result and not has_any_legal_move(board, role_to_color(role)):
+        return "normal"
+    return "resign"
+
+
+def _tokens(plies: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, str]]:
+    """Stored plies -> (player, PDN move), merging capture hops."""
+    player, squares, capture = None, [], False
+    for ply in plies:
+        move = ply["move"]
+        frm, to = move["from"], move["to"]
+        continues = (ply["player"] == player and capture
+                     and move.get("was_capture") and squares
+                     and square_of(*frm) == squares[-1])
+        if not continues:
+            if squares:
+                yield player, ("x" if capture else "-").join(
+                    map(str, squares))
+            player, squares = ply["player"], [square_of(*frm)]
+            capture = bool(move.get("was_capture"))
+        squares.append(square_of(*to))
+    if squares:
+        yield player, ("x" if capture else "-").join(map(str, squares))
+
+
+def format_game(tags: Dict[str, str], plies: Iterable[Dict[str, Any]],
+                result: Optional[str]) -> str:
+    """PDN text for one stored match (white opens, hence the FEN tag)."""
+    result_token = RESULT_TO_PDN.get(result or "", "*")
+    all_tags = {"Event": "?", "Site": "?", "Date": "????.??.??",
+                "Round": "-", "White": "?", "Black": "?", **tags,
+                "Result": result_token, "GameType": "21", "FEN": START_FEN}
+    head = "".join(f'[{k} "{v}"]\n' for k, v in all_tags.items())
+
+    words: List[str] = []
+    number = 0
+    for player, token in _tokens(plies):
+        if player == "white":
+            number += 1
+            words.append(f"{number}.")
+        elif not words:
+            words.append(f"{number or 1}...")
+        words.append(token)
+    words.append(result_token)
+
+    lines, line = [], ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > 79:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return head + "\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of the user row behind an access token, so
+    authenticated requests don't pay a users lookup each time.
+    Values are plain column dicts (never ORM objects bound to a session).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float,
+                 clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, values = entry
+            if expires_at <= self.clock():
+                self._drop(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return values
+
+    def put(self, token: str, values: Dict[str, Any],
+            token_exp: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = self.clock() + self.ttl_seconds
+        if token_exp is not None:
+            # never outlive the token itself
+            expires_at = min(expires_at, token_exp)
+        userid = values["userid"]
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (expires_at, values)
+            self._by_user.setdefault(userid, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+
+    def invalidate_user(self, userid: int) -> None:
+        with self._lock:
+            for token in list(self._by_user.get(userid, ())):
+                self._drop(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, token: str) -> None:
+        _, values = self._entries.pop(token)
+        tokens = self._by_user.get(values["userid"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[values["userid"]]
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
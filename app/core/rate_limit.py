@@ -0,0 +1,204 @@
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from jose import jwt, JWTError
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+from app.core.security import ALGO
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    rate: float          # tokens refilled per second
+    burst: int           # bucket capacity
+    scope: str = "ip"    # "ip" or "user" (falls back to ip if anonymous)
+
+
+DEFAULT_POLICIES: Dict[str, RateLimitPolicy] = {
+    "/api/v1/auth/login": RateLimitPolicy(rate=0.2, burst=10),
+    "/api/v1/auth/register": RateLimitPolicy(rate=0.05, burst=5),
+    "/api/v1/auth/refresh": RateLimitPolicy(rate=0.5, burst=10),
+    "/api/v1/matchmaking/find": RateLimitPolicy(rate=2, burst=10,
+                                                scope="user"),
+}
+
+
+class MemoryBackend:
+    """
+    Token buckets in a dict of key -> [tokens, last_seen]. Each hit is
+    O(1); idle buckets (already refilled, so equal to a fresh one) are
+    swept every sweep_interval seconds.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.buckets: Dict[str, List[float]] = {}
+        self._idle_after: Dict[str, float] = {}
+        self._next_sweep = clock() + sweep_interval
+
+    async def hit(self, key: str, policy: RateLimitPolicy
+                  ) -> Tuple[bool, float]:
+        now = self.clock()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(policy.burst), now]
+            self._idle_after[key] = policy.burst / policy.rate
+        else:
+            bucket[0] = min(policy.burst,
+                            bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / policy.rate
+
+    def sweep(self, now: float) -> None:
+        idle = [k for k, (_, last) in self.buckets.items()
+                if now - last >= self._idle_after[k]]
+        for k in idle:
+            del self.buckets[k]
+            del self._idle_after[k]
+        self._next_sweep = now + self.sweep_interval
+
+
+class RedisBackend:
+    """Shared buckets for multi-worker deployments (needs `redis`)."""
+
+    SCRIPT = """
+local b = redis.call('HMGET', KEYS[1], 't', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry)}
+"""
+
+    def __init__(self, url: str, prefix: str = "rl:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "RATE_LIMIT_BACKEND=redis needs the redis package "
+                "(pip install redis)") from e
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, policy: RateLimitPolicy
+                  ) -> Tuple[bool, float]:
+        allowed, retry = await self.script(
+            keys=[self.prefix + key],
+            args=[policy.rate, policy.burst, time.time()],
+        )
+        return bool(int(allowed)), float(retry)
+
+
+def build_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+
+class RateLimiter:
+    """
+    Per-route token buckets keyed by client IP or by the userid claim of
+    the access token. Checks never touch the DB.
+    """
+
+    def __init__(self, policies: Dict[str, RateLimitPolicy], backend=None):
+        self.policies = policies
+        self._backend = backend
+        self.allowed: Dict[str, int] = {path: 0 for path in policies}
+        self.rejected: Dict[str, int] = {path: 0 for path in policies}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = build_backend()
+        return self._backend
+
+    async def check(self, scope) -> Tuple[bool, float]:
+        path = scope["path"]
+        policy = self.policies.get(path)
+        if policy is None:
+            return True, 0.0
+
+        key = f"{path}|{self.client_key(scope, policy)}"
+        ok, retry_after = await self.backend.hit(key, policy)
+        if ok:
+            self.allowed[path] += 1
+        else:
+            self.rejected[path] += 1
+        return ok, retry_after
+
+    @staticmethod
+    def client_key(scope, policy: RateLimitPolicy) -> str:
+        conn = HTTPConnection(scope)
+        if policy.scope == "user":
+            token = conn.cookies.get("access_token")
+            if token:
+                try:
+                    payload = jwt.decode(token, settings.JWT_SECRET,
+                                         algorithms=[ALGO])
+                    uid = payload.get("uid") or payload.get("sub")
+                    if uid:
+                        return f"u:{uid}"
+                except JWTError:
+                    pass
+        return f"ip:{conn.client.host if conn.client else '-'}"
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"allowed": dict(self.allowed),
+                "rejected": dict(self.rejected)}
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        ok, retry_after = await self.limiter.check(scope)
+        if ok:
+            return await self.app(scope, receive, send)
+
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+rate_limiter = RateLimiter(DEFAULT_POLICIES)
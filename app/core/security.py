@@ -1,9 +1,12 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from uuid import uuid4
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                   bcrypt__rounds=settings.BCRYPT_ROUNDS)
 ALGO = "HS256"
 
 
@@ -15,11 +18,29 @@ def verify_password(raw: str, hashed: str) -> bool:
     return pwd.verify(raw, hashed)
 
 
-def create_access_token(sub: str) -> str:
+def verify_and_update_password(raw: str,
+                               hashed: str) -> tuple[bool, str | None]:
+    # new hash is returned when the stored one uses an outdated cost
+    return pwd.verify_and_update(raw, hashed)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller as read from the access token (no DB row)."""
+    userid: int
+    email: str
+    username: str | None = None
+
+
+def create_access_token(sub: str, userid: int | None = None,
+                        username: str | None = None) -> str:
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {"sub": sub, "iat": int(now.timestamp()),
                "exp": int(exp.timestamp())}
+    if userid is not None:
+        payload["uid"] = userid
+        payload["username"] = username
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=ALGO)
 
 
@@ -31,5 +52,7 @@ def create_refresh_token(sub: str) -> str:
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
         "type": "refresh",
+        # unique per token, so rotated tokens never collide in authtoken
+        "jti": uuid4().hex,
     }
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=ALGO)
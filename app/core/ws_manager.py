@@ -27,6 +27,9 @@ class ConnectionManager:
         for connection in room.values():
             await connection.send_json(message)
 
+    def socket_count(self) -> int:
+        return sum(len(room) for room in self.rooms.values())
+
     async def close_match(self, matchid: int, code: int = 1000):
         room = self.rooms.get(matchid, {})
         for uid, ws in list(room.items()):
@@ -0,0 +1,35 @@
+"""
+Zobrist hashing of checkers positions, for the position index.
+
+Keys are fixed (seeded), so hashes are stable across processes and can
+be stored. They are 63-bit so they fit a signed BIGINT.
+"""
+import random
+from typing import Any, Dict, List, Optional
+
+from app.core.checkers_rules import Board, is_playable
+
+_rng = random.Random(0x5EED_C4EC)
+# [square 0-31][RED man, RED king, BLACK man, BLACK king]
+PIECE_KEYS: List[List[int]] = [[_rng.getrandbits(63) for _ in range(4)]
+                               for _ in range(32)]
+BLACK_TO_MOVE = _rng.getrandbits(63)
+
+
+def piece_index(piece: Dict[str, Any]) -> int:
+    return (2 if piece["color"] == "BLACK" else 0) + \
+        (1 if piece.get("king") else 0)
+
+
+def hash_position(board: Board, next_role: str) -> int:
+    h = BLACK_TO_MOVE if next_role == "black" else 0
+    square = 0
+    for r in range(8):
+        for c in range(8):
+            if not is_playable(r, c):
+                continue
+            piece: Optional[Dict[str, Any]] = board[r][c]
+            if piece:
+                h ^= PIECE_KEYS[square][piece_index(piece)]
+            square += 1
+    return h
@@ -0,0 +1,204 @@
+"""
+Post-game analysis: an evaluation of every position of a finished match.
+
+Requesting an analysis queues one analysis_jobs row per match (asking
+again is a no-op). A background worker claims queued jobs, and running
+ones whose worker stopped updating them, then evaluates the positions
+still missing from match_analysis in batches through the AI scheduler,
+below any game's priority. Every batch is committed, so an interrupted
+job resumes where it stopped.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.ai_client import EngineError, EngineUnavailable
+from app.core.ai_scheduler import AIScheduler, ai_scheduler
+from app.core.checkers_rules import (
+    Board,
+    has_any_legal_move,
+    initial_board,
+    iter_states,
+    role_to_color,
+)
+from app.core.config import settings
+from app.core.pdn import square_of
+from app.db.models.analysis_job import AnalysisJob
+from app.db.models.match import Match
+from app.db.models.match_analysis import MatchAnalysis
+from app.db.move_archive import load_moves
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# analysis requests queue behind every game's (deadline-ordered) move
+PRIORITY_OFFSET = 3600.0
+
+
+def analysis_positions(plies: List[Dict[str, Any]]
+                       ) -> List[Tuple[int, Board, str]]:
+    """(move_number, board, side to move) wherever a turn starts."""
+    positions = []
+    states = [(initial_board(), "white", None)]
+    states.extend(iter_states(plies))
+    for n, (board, role, forced_from) in enumerate(states):
+        if forced_from is None and \
+                has_any_legal_move(board, role_to_color(role)):
+            positions.append((n, board, role))
+    return positions
+
+
+def move_text(moves: List[Dict[str, Any]]) -> Optional[str]:
+    """Hops of one turn -> "11-15" / "15x22x29" (server numbering)."""
+    if not moves:
+        return None
+    squares = [square_of(*moves[0]["from"])]
+    squares.extend(square_of(*m["to"]) for m in moves)
+    capture = abs(moves[0]["to"][0] - moves[0]["from"][0]) == 2
+    return ("x" if capture else "-").join(map(str, squares))
+
+
+def request_analysis(db: Session, match: Match, depth: int) -> AnalysisJob:
+    """Queue an analysis of a finished match, unless there is one."""
+    job = db.get(AnalysisJob, match.matchid)
+    if job is None:
+        try:
+            db.add(AnalysisJob(matchid=match.matchid, status="queued",
+                               depth=depth))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # requested concurrently
+        job = db.get(AnalysisJob, match.matchid)
+    elif job.status == "failed":
+        job.status = "queued"
+        job.error = None
+        job.updated_at = func.now()
+        db.commit()
+    db.refresh(job)
+    return job
+
+
+def _stale_cutoff(db: Session, seconds: int):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.datetime("now", f"-{seconds} seconds")
+    return func.date_sub(func.now(), text(f"INTERVAL {seconds} SECOND"))
+
+
+def claim_job(db: Session, stale_seconds: int) -> Optional[int]:
+    """Take the oldest claimable job; the conditional UPDATE arbitrates."""
+    claimable = or_(
+        AnalysisJob.status == "queued",
+        and_(AnalysisJob.status == "running",
+             AnalysisJob.updated_at < _stale_cutoff(db, stale_seconds)),
+    )
+    candidates = db.execute(
+        select(AnalysisJob.matchid)
+        .where(claimable)
+        .order_by(AnalysisJob.created_at.asc())
+        .limit(5)
+    ).scalars().all()
+    for matchid in candidates:
+        claimed = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.matchid == matchid, claimable)
+            .values(status="running", updated_at=func.now())
+        ).rowcount
+        db.commit()
+        if claimed:
+            return matchid
+    return None
+
+
+async def run_job(db: Session, matchid: int, engine: AIScheduler,
+                  batch_size: int, concurrency: int,
+                  seconds: float) -> None:
+    job = db.get(AnalysisJob, matchid)
+    match = db.get(Match, matchid)
+    positions = analysis_positions(
+        [{"player": m.player, "move": m.move}
+         for m in load_moves(db, match)])
+    done = set(db.execute(
+        select(MatchAnalysis.move_number)
+        .where(MatchAnalysis.matchid == matchid)
+    ).scalars())
+    todo = [p for p in positions if p[0] not in done]
+    job.positions_total = len(positions)
+    job.positions_done = len(positions) - len(todo)
+    depth = job.depth
+    db.commit()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def evaluate(move_number: int, board: Board,
+                       role: str) -> Dict[str, Any]:
+        async with semaphore:
+            deadline = time.monotonic() + seconds
+            reply = await engine.best_move(
+                board, role_to_color(role), depth, deadline=deadline,
+                priority=deadline + PRIORITY_OFFSET)
+        score = None
+        if reply.score is not None:
+            score = round(reply.score if role == "white" else -reply.score)
+        return {"matchid": matchid, "move_number": move_number,
+                "score": score, "best_move": move_text(reply.moves)}
+
+    for start in range(0, len(todo), batch_size):
+        rows = await asyncio.gather(*(evaluate(*p) for p in
+                                      todo[start:start + batch_size]))
+        db.execute(insert(MatchAnalysis.__table__), rows)
+        job.positions_done += len(rows)
+        job.updated_at = func.now()
+        db.commit()
+
+    job.status = "done"
+    job.updated_at = func.now()
+    db.commit()
+
+
+async def run_next_job(
+    engine: AIScheduler = ai_scheduler,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> bool:
+    """
+    Run one claimable job, if any. Returns whether to look for the next
+    one straight away (False: nothing to do, or the engine is busy).
+    """
+    db = session_factory()
+    try:
+        matchid = claim_job(db, settings.AI_ANALYSIS_STALE_SECONDS)
+        if matchid is None:
+            return False
+        try:
+            await run_job(db, matchid, engine,
+                          settings.AI_ANALYSIS_BATCH_SIZE,
+                          settings.AI_ANALYSIS_CONCURRENCY,
+                          settings.AI_ANALYSIS_SECONDS)
+        except (EngineError, ValueError) as e:
+            db.rollback()
+            job = db.get(AnalysisJob, matchid)
+            # engine busy or down: back to the queue, from where it was
+            transient = isinstance(e, EngineUnavailable)
+            job.status = "queued" if transient else "failed"
+            job.error = str(e)[:255]
+            job.updated_at = func.now()
+            db.commit()
+            return not transient
+        return True
+    finally:
+        db.close()
+
+
+async def run_analysis_jobs_forever(poll_seconds: float) -> None:
+    while True:
+        try:
+            ran = await run_next_job()
+        except Exception:
+            logger.exception("Analysis job failed")
+            ran = False
+        if not ran:
+            await asyncio.sleep(poll_seconds)
@@ -0,0 +1,132 @@
+"""
+Replay checkpoints: the game state of a finished match every
+REPLAY_CHECKPOINT_INTERVAL moves, so the board at any move is the
+nearest checkpoint plus at most that many moves of replay.
+
+A state is stored as 35 characters: one per playable square in PDN
+order ("." empty, "r"/"R" RED man/king, "b"/"B" BLACK man/king), the
+side to move ("w"/"b") and the square a capture chain must continue
+from ("00" if none), e.g. "bbbbbbbbbbbb........rrrrrrrrrrrrw00".
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.checkers_rules import (
+    Board,
+    all_captures_for_color,
+    initial_board,
+    is_playable,
+    iter_states,
+    role_to_color,
+)
+from app.core.config import settings
+from app.core.pdn import coords_of, square_of
+from app.db.models.match import Match
+from app.db.models.match_checkpoint import MatchCheckpoint
+from app.db.move_archive import load_moves
+
+logger = logging.getLogger(__name__)
+
+State = Tuple[Board, str, Optional[Tuple[int, int]]]
+
+PIECE_CHARS = {("RED", False): "r", ("RED", True): "R",
+               ("BLACK", False): "b", ("BLACK", True): "B"}
+CHAR_PIECES = {v: {"color": k[0], "king": k[1]}
+               for k, v in PIECE_CHARS.items()}
+
+
+def encode_state(board: Board, next_role: str,
+                 forced_from: Optional[Tuple[int, int]]) -> str:
+    cells = []
+    for r in range(8):
+        for c in range(8):
+            if is_playable(r, c):
+                piece = board[r][c]
+                cells.append(PIECE_CHARS[(piece["color"],
+                                          bool(piece.get("king")))]
+                             if piece else ".")
+    forced = square_of(*forced_from) if forced_from else 0
+    return "".join(cells) + next_role[0] + f"{forced:02d}"
+
+
+def decode_state(state: str) -> State:
+    board: Board = [[None for _ in range(8)] for _ in range(8)]
+    for square, ch in enumerate(state[:32], start=1):
+        if ch != ".":
+            r, c = coords_of(square)
+            board[r][c] = dict(CHAR_PIECES[ch])
+    next_role = "white" if state[32] == "w" else "black"
+    forced = int(state[33:35])
+    return board, next_role, coords_of(forced) if forced else None
+
+
+def _plies(moves) -> List[Dict[str, Any]]:
+    return [{"player": m.player, "move": m.move} for m in moves]
+
+
+def checkpoint_rows(matchid: int, moves, interval: int
+                    ) -> List[Dict[str, Any]]:
+    rows = []
+    for number, state in enumerate(iter_states(_plies(moves)), start=1):
+        if number % interval == 0:
+            rows.append({"matchid": matchid, "move_number": number,
+                         "state": encode_state(*state)})
+    return rows
+
+
+def store_checkpoints(db: Session, match: Match) -> int:
+    """(Re)write the checkpoints of a match, in the caller's transaction."""
+    db.execute(delete(MatchCheckpoint)
+               .where(MatchCheckpoint.matchid == match.matchid))
+    try:
+        rows = checkpoint_rows(match.matchid, load_moves(db, match),
+                               settings.REPLAY_CHECKPOINT_INTERVAL)
+    except ValueError as e:
+        logger.warning("No checkpoints for match %s: %s",
+                       match.matchid, e)
+        return 0
+    if rows:
+        db.execute(insert(MatchCheckpoint.__table__), rows)
+    return len(rows)
+
+
+def _nearest_checkpoint(db: Session, matchid: int, move_number: int):
+    return db.execute(
+        select(MatchCheckpoint.move_number, MatchCheckpoint.state)
+        .where(MatchCheckpoint.matchid == matchid,
+               MatchCheckpoint.move_number <= move_number)
+        .order_by(MatchCheckpoint.move_number.desc())
+        .limit(1)
+    ).first()
+
+
+def state_at(db: Session, match: Match, move_number: int) -> State:
+    """Game state after `move_number` moves (0 = initial position)."""
+    interval = settings.REPLAY_CHECKPOINT_INTERVAL
+    start: State = (initial_board(), "white", None)
+    done = 0
+
+    if move_number >= interval:
+        # none for matches finished before checkpoints existed (until
+        # app.scripts.index_positions runs): replay from the start
+        cp = _nearest_checkpoint(db, match.matchid, move_number)
+        if cp is not None:
+            done = cp.move_number
+            start = decode_state(cp.state)
+
+    state = start
+    tail = load_moves(db, match, after_move_number=done,
+                      limit=move_number - done)
+    for state in iter_states(_plies(tail), *start):
+        pass
+    return state
+
+
+def must_capture(state: State) -> bool:
+    board, next_role, forced_from = state
+    if forced_from is not None:
+        return True
+    return bool(all_captures_for_color(board, role_to_color(next_role)))
@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Session
+
+from app.db.models.match import Match
+from app.db.player_stats import record_match_stats
+from app.db.position_index import index_match
+from app.db.opening_tree import record_match_opening
+from app.db.checkpoints import store_checkpoints
+
+
+def on_match_finished(db: Session, match: Match) -> None:
+    """
+    Derived data to maintain when a match becomes finished. Call after
+    setting status/result/reason/finishedat and before the commit.
+    """
+    # finishedat is usually func.now(): flush so it is loaded as a value
+    db.flush()
+    db.refresh(match)
+    record_match_stats(db, match)
+    index_match(db, match)
+    record_match_opening(db, match)
+    store_checkpoints(db, match)
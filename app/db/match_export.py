@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Engine
+
+from app.db.models.match import Match
+from app.db.models.match_archive import MatchArchive
+from app.db.models.match_move import MatchMove
+from app.db.move_archive import decode_moves
+
+MATCH_COLUMNS = (
+    Match.matchid,
+    Match.whiteuser,
+    Match.blackuser,
+    Match.status,
+    Match.result,
+    Match.reason,
+    Match.startedat,
+    Match.finishedat,
+)
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _move_out(move) -> dict:
+    return {
+        "move_number": move.move_number,
+        "player": move.player,
+        "move": move.move,
+        "createdat": _iso(move.createdat),
+    }
+
+
+def _game_header(row) -> dict:
+    return {
+        "matchid": row.matchid,
+        "whiteuser": row.whiteuser,
+        "blackuser": row.blackuser,
+        "status": row.status,
+        "result": row.result,
+        "reason": row.reason,
+        "startedat": _iso(row.startedat),
+        "finishedat": _iso(row.finishedat),
+        "moves": [],
+    }
+
+
+def export_statement(userid: int | None, since: datetime | None = None):
+    filters = [Match.status == "finished"]
+    if userid is not None:
+        filters.append(
+            or_(Match.whiteuser == userid, Match.blackuser == userid))
+    if since is not None:
+        filters.append(Match.finishedat >= since)
+
+    return (
+        select(
+            *MATCH_COLUMNS,
+            MatchMove.move_number,
+            MatchMove.player,
+            MatchMove.move,
+            MatchMove.createdat,
+            MatchArchive.data,
+            MatchArchive.first_move_at,
+        )
+        .outerjoin(MatchMove, MatchMove.matchid == Match.matchid)
+        # compacted matches have no match_moves rows, only the archive
+        .outerjoin(MatchArchive, MatchArchive.matchid == Match.matchid)
+        .where(*filters)
+        .order_by(Match.matchid.asc(), MatchMove.move_number.asc())
+    )
+
+
+def iter_match_archive(bind: Engine, userid: int | None,
+                       since: datetime | None = None,
+                       batch_size: int = 1000) -> Iterator[dict]:
+    """
+    One dict per finished match of `userid` (of everyone if None), moves
+    included, in matchid order. Rows come from a single ordered join
+    read through a server-side cursor, so only the current game is held
+    in memory.
+    """
+    stmt = export_statement(userid, since)
+    game = None
+    with bind.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=batch_size).execute(stmt)
+        for row in result:
+            if game is None or game["matchid"] != row.matchid:
+                if game is not None:
+                    yield game
+                game = _game_header(row)
+                if row.data is not None:
+                    game["moves"] = [
+                        _move_out(m) for m in decode_moves(
+                            row.matchid, row.data, row.first_move_at)]
+            if row.move_number is not None:
+                game["moves"].append(_move_out(row))
+    if game is not None:
+        yield game
+
+
+def iter_ndjson(games: Iterator[dict]) -> Iterator[bytes]:
+    for game in games:
+        yield (json.dumps(game, separators=(",", ":")) + "\n").encode()
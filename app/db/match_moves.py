@@ -0,0 +1,95 @@
+"""
+Writing the moves of an ongoing match, shared by the match websocket and
+the AI opponent, and the messages broadcast about them.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.match_events import on_match_finished
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+
+
+def append_move(db: Session, matchid: int, role: str, move: Dict[str, Any],
+                expected_last: Optional[int] = None) -> MatchMove:
+    """
+    Store the next move of a match and commit. The match row is locked
+    and its counter gives the move number (no MAX(move_number) scan).
+    With expected_last, the move is refused if another move was stored
+    since the position it was computed from.
+
+    Raises ValueError if the match is not ongoing (or moved on), and
+    IntegrityError on a move_number clash.
+    """
+    with db.begin_nested():
+        locked_match = db.execute(
+            select(Match)
+            .where(Match.matchid == matchid)
+            .with_for_update()
+            # the caller may have loaded the match already: read the
+            # counter under the lock, not the identity map's copy
+            .execution_options(populate_existing=True)
+        ).scalar_one()
+
+        if locked_match.status != "ongoing":
+            raise ValueError("Match not ongoing")
+        last = int(locked_match.last_move_number)
+        if expected_last is not None and last != expected_last:
+            raise ValueError("Match moved on")
+
+        new_move = MatchMove(
+            matchid=matchid,
+            move_number=last + 1,
+            player=role,
+            move=move
+        )
+        db.add(new_move)
+
+        locked_match.moves_count = int(locked_match.moves_count) + 1
+        locked_match.last_move_number = last + 1
+        locked_match.last_move_at = func.now()
+
+    db.commit()
+    db.refresh(new_move)
+    return new_move
+
+
+def finish_match(db: Session, match: Match, result: str,
+                 reason: str) -> Dict[str, Any]:
+    """Finish and commit; returns the match_finished payload."""
+    match.status = "finished"
+    match.result = result
+    match.reason = reason
+    match.finishedat = func.now()
+    on_match_finished(db, match)
+    db.commit()
+    db.refresh(match)
+    return {
+        "matchid": match.matchid,
+        "status": match.status,
+        "result": match.result,
+        "reason": match.reason,
+        "finishedat": match.finishedat.isoformat()
+        if match.finishedat else None,
+    }
+
+
+def move_message(new_move: MatchMove, next_turn: str, must_continue: bool,
+                 forced_from: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+    return {
+        "type": "move",
+        "payload": {
+            "id": new_move.id,
+            "matchid": new_move.matchid,
+            "move_number": new_move.move_number,
+            "player": new_move.player,
+            "move": new_move.move,
+            "createdat": (new_move.createdat.isoformat()
+                          if new_move.createdat else None),
+            "next_turn": next_turn,
+            "must_continue": must_continue,
+            "forced_from": list(forced_from) if forced_from else None
+        }
+    }
@@ -0,0 +1,34 @@
+from sqlalchemy import BigInteger, Column, DateTime, Enum, ForeignKey, Index
+from sqlalchemy import Integer, String, func
+from app.db.session import Base
+
+
+analysis_status_enum = Enum(
+    "queued",
+    "running",
+    "done",
+    "failed",
+    name="analysis_status"
+)
+
+
+class AnalysisJob(Base):
+    """One post-game analysis per match (app.db.analysis)."""
+    __tablename__ = "analysis_jobs"
+
+    matchid = Column(BigInteger,
+                     ForeignKey("matches.matchid", ondelete="CASCADE",
+                                onupdate="CASCADE"),
+                     primary_key=True, autoincrement=False)
+    status = Column(analysis_status_enum, nullable=False, default="queued")
+    depth = Column(Integer, nullable=False)
+    positions_total = Column(Integer, nullable=False, default=0)
+    positions_done = Column(Integer, nullable=False, default=0)
+    error = Column(String(255))
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # refreshed after every batch; a running job left stale is resumed
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_analysis_jobs_status", "status", "updated_at"),
+    )
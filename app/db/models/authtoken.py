@@ -1,12 +1,12 @@
 from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, String, func
 from sqlalchemy import Index
-from app.db.session import Base
+from app.db.session import Base, BigIntPK
 
 
 class AuthToken(Base):
     __tablename__ = "authtoken"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
     userid = Column(BigInteger,
                     ForeignKey("users.userid", ondelete="CASCADE",
                                onupdate="CASCADE"), nullable=False, index=True)
@@ -1,6 +1,9 @@
 from sqlalchemy import Enum, Column, BigInteger, DateTime, ForeignKey, func
+from sqlalchemy import Integer, SmallInteger
+from sqlalchemy import Index
 from sqlalchemy.orm import relationship
-from app.db.session import Base
+from app.db.session import Base, BigIntPK
+from app.db.models.user import User  # noqa: F401 (relationship target)
 
 
 match_status_enum = Enum(
@@ -35,7 +38,7 @@ match_reason_enum = Enum(
 class Match(Base):
     __tablename__ = "matches"
 
-    matchid = Column(BigInteger, primary_key=True, autoincrement=True)
+    matchid = Column(BigIntPK, primary_key=True, autoincrement=True)
     startedat = Column(DateTime, nullable=False, server_default=func.now())
     finishedat = Column(DateTime)
     whiteuser = Column(BigInteger, ForeignKey("users.userid"))
@@ -44,5 +47,22 @@ class Match(Base):
     reason = Column(match_reason_enum, nullable=False, default="none")
     status = Column(match_status_enum, nullable=False, default="waiting")
 
+    # kept in sync with match_moves by the move insert transaction
+    moves_count = Column(Integer, nullable=False, default=0,
+                         server_default="0")
+    last_move_number = Column(Integer, nullable=False, default=0,
+                              server_default="0")
+    last_move_at = Column(DateTime)
+    # set once the moves live in match_archives instead of match_moves
+    archived_at = Column(DateTime)
+    # matches against the engine: its level, the engine's side has no user
+    ai_level = Column(SmallInteger)
+
     white = relationship("User", foreign_keys=[whiteuser])
     black = relationship("User", foreign_keys=[blackuser])
+
+    __table_args__ = (
+        # per-player history paging (keyset on matchid)
+        Index("idx_matches_white_matchid", "whiteuser", "matchid"),
+        Index("idx_matches_black_matchid", "blackuser", "matchid"),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String
+from app.db.session import Base
+
+
+class MatchAnalysis(Base):
+    """
+    Evaluation of the position after move_number moves (0 = start), from
+    white's point of view, and the best move found there.
+    """
+    __tablename__ = "match_analysis"
+
+    matchid = Column(BigInteger,
+                     ForeignKey("matches.matchid", ondelete="CASCADE",
+                                onupdate="CASCADE"),
+                     primary_key=True, autoincrement=False)
+    move_number = Column(Integer, primary_key=True, autoincrement=False)
+    score = Column(Integer)
+    best_move = Column(String(64))
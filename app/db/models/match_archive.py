@@ -0,0 +1,23 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+)
+from app.db.session import Base
+
+
+class MatchArchive(Base):
+    """Moves of a compacted finished match, packed by app.db.move_archive."""
+    __tablename__ = "match_archives"
+
+    matchid = Column(BigInteger,
+                     ForeignKey("matches.matchid", ondelete="CASCADE",
+                                onupdate="CASCADE"), primary_key=True)
+    format = Column(SmallInteger, nullable=False, default=1)
+    moves_count = Column(Integer, nullable=False)
+    first_move_at = Column(DateTime)
+    data = Column(LargeBinary, nullable=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String
+from app.db.session import Base
+
+
+class MatchCheckpoint(Base):
+    """Game state after move_number, encoded by app.db.checkpoints."""
+    __tablename__ = "match_checkpoints"
+
+    matchid = Column(BigInteger,
+                     ForeignKey("matches.matchid", ondelete="CASCADE",
+                                onupdate="CASCADE"),
+                     primary_key=True, autoincrement=False)
+    move_number = Column(Integer, primary_key=True, autoincrement=False)
+    state = Column(String(35), nullable=False)
@@ -1,4 +1,4 @@
-from app.db.session import Base
+from app.db.session import Base, BigIntPK
 from sqlalchemy.orm import relationship
 from sqlalchemy import (
     Enum,
@@ -25,7 +25,7 @@ match_move_player_enum = Enum(
 class MatchMove(Base):
     __tablename__ = "match_moves"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
     matchid = Column(BigInteger, ForeignKey("matches.matchid"), nullable=False)
     move_number = Column(BigInteger, nullable=False)
     player = Column(match_move_player_enum, nullable=False)
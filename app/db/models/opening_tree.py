@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+from app.db.session import Base
+
+
+class OpeningMove(Base):
+    """
+    Opening tree edge: a move played from a position (Zobrist hash, side
+    to move included) in the first turns of finished matches, with the
+    outcomes of those matches.
+    """
+    __tablename__ = "opening_tree"
+
+    poshash = Column(BigInteger, primary_key=True, autoincrement=False)
+    # "22-18" or "15x22x31", squares as in the PDN export
+    move = Column(String(40), primary_key=True)
+    games = Column(Integer, nullable=False, default=0)
+    white_wins = Column(Integer, nullable=False, default=0)
+    black_wins = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer
+from app.db.session import Base
+
+
+class PositionIndex(Base):
+    """
+    One row per position reached at the end of a turn in a finished
+    match. The primary key doubles as the covering index for lookups
+    by position hash.
+    """
+    __tablename__ = "position_index"
+
+    poshash = Column(BigInteger, primary_key=True, autoincrement=False)
+    matchid = Column(BigInteger,
+                     ForeignKey("matches.matchid", ondelete="CASCADE",
+                                onupdate="CASCADE"),
+                     primary_key=True, autoincrement=False)
+    move_number = Column(Integer, primary_key=True, autoincrement=False)
+
+    __table_args__ = (
+        # reindexing / deleting one match
+        Index("idx_position_index_matchid", "matchid"),
+    )
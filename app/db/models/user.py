@@ -1,11 +1,11 @@
-from sqlalchemy import BigInteger, Column, Date, DateTime, String, func
-from app.db.session import Base
+from sqlalchemy import Column, Date, DateTime, String, func
+from app.db.session import Base, BigIntPK
 
 
 class User(Base):
     __tablename__ = "users"
 
-    userid = Column(BigInteger, primary_key=True, autoincrement=True)
+    userid = Column(BigIntPK, primary_key=True, autoincrement=True)
     email = Column(String(255), nullable=False, unique=True, index=True)
     username = Column(String(50), nullable=False, unique=True, index=True)
     name = Column(String(100))
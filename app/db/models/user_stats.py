@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, JSON
+from app.db.session import Base
+
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    userid = Column(BigInteger,
+                    ForeignKey("users.userid", ondelete="CASCADE",
+                               onupdate="CASCADE"), primary_key=True)
+    games = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    # {"resign": {"win": 3, "loss": 1, "draw": 0}, ...}
+    by_reason = Column(JSON, nullable=False, default=dict)
+    # > 0 consecutive wins, < 0 consecutive losses, 0 after a draw
+    current_streak = Column(Integer, nullable=False, default=0)
+    best_streak = Column(Integer, nullable=False, default=0)
+    total_moves = Column(BigInteger, nullable=False, default=0)
+    total_seconds = Column(BigInteger, nullable=False, default=0)
+    last_matchid = Column(BigInteger)
@@ -0,0 +1,169 @@
+"""
+Compact storage for the moves of finished matches.
+
+A compacted match keeps a single match_archives row instead of one
+match_moves row per half-move. Format 1 is a version byte followed by,
+per move:
+
+    byte 0   from square index (0-31) | black << 5 | was_capture << 6
+    byte 1   to square index (0-31)
+    varint   milliseconds since the previous move (first: since
+             first_move_at)
+
+i.e. 3-4 bytes per half-move. Square indices are the PDN squares minus
+one. Readers should go through load_moves/count_moves, which pick the
+right source from matches.archived_at.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.pdn import coords_of, square_of
+from app.db.models.match import Match
+from app.db.models.match_archive import MatchArchive
+from app.db.models.match_move import MatchMove
+
+FORMAT = 1
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+@dataclass
+class ArchivedMove:
+    """Stands in for a MatchMove row (same attributes, no id)."""
+    matchid: int
+    move_number: int
+    player: str
+    move: Dict[str, Any]
+    createdat: Optional[datetime]
+    id: Optional[int] = None
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_moves(moves: Iterable[Tuple[str, Dict[str, Any], datetime]]
+                 ) -> Tuple[bytes, Optional[datetime], int]:
+    """(player, move, createdat) in move order -> (blob, first_at, count)."""
+    out = bytearray([FORMAT])
+    first_at = prev_at = None
+    count = 0
+    for player, move, created in moves:
+        try:
+            frm = square_of(*move["from"]) - 1
+            to = square_of(*move["to"]) - 1
+        except (KeyError, TypeError, ValueError):
+            raise ArchiveError(f"Unexpected move {move!r}")
+        if not (0 <= frm < 32 and 0 <= to < 32):
+            raise ArchiveError(f"Unexpected move {move!r}")
+
+        if first_at is None:
+            first_at = prev_at = created
+        delta = 0
+        if created is not None and prev_at is not None:
+            delta = max(0, round((created - prev_at).total_seconds() * 1000))
+            prev_at = created
+
+        out.append(frm | (player == "black") << 5
+                   | bool(move.get("was_capture")) << 6)
+        out.append(to)
+        out += _varint(delta)
+        count += 1
+    return bytes(out), first_at, count
+
+
+def decode_moves(matchid: int, data: bytes,
+                 first_at: Optional[datetime]) -> List[ArchivedMove]:
+    if not data or data[0] != FORMAT:
+        raise ArchiveError(f"Unknown archive format for match {matchid}")
+
+    moves: List[ArchivedMove] = []
+    at = first_at
+    i = 1
+    while i < len(data):
+        head, to = data[i], data[i + 1]
+        i += 2
+        delta = shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        if at is not None:
+            at = at + timedelta(milliseconds=delta)
+
+        moves.append(ArchivedMove(
+            matchid=matchid,
+            move_number=len(moves) + 1,
+            player="black" if head & 0x20 else "white",
+            move={"from": list(coords_of((head & 0x1F) + 1)),
+                  "to": list(coords_of(to + 1)),
+                  "was_capture": bool(head & 0x40)},
+            createdat=at,
+        ))
+    return moves
+
+
+def archived_moves(db: Session, match: Match) -> List[ArchivedMove]:
+    archive = db.get(MatchArchive, match.matchid)
+    if archive is None:
+        return []
+    return decode_moves(match.matchid, archive.data, archive.first_move_at)
+
+
+def count_moves(db: Session, match: Match) -> int:
+    if match.archived_at is not None:
+        return int(match.moves_count or 0)
+    return db.execute(
+        select(func.count(MatchMove.id))
+        .where(MatchMove.matchid == match.matchid)
+    ).scalar_one()
+
+
+def load_moves(
+    db: Session,
+    match: Match,
+    after_move_number: Optional[int] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Any]:
+    """
+    Moves of a match in move order, MatchMove rows or ArchivedMove
+    objects depending on whether it has been compacted.
+    """
+    if match.archived_at is not None:
+        moves = archived_moves(db, match)
+        if after_move_number is not None:
+            moves = moves[after_move_number:]
+        end = offset + limit if limit is not None else None
+        return moves[offset:end]
+
+    # (matchid, move_number) is unique, so this is an index range scan
+    filters = [MatchMove.matchid == match.matchid]
+    if after_move_number is not None:
+        filters.append(MatchMove.move_number > after_move_number)
+    stmt = (
+        select(MatchMove)
+        .where(*filters)
+        .order_by(MatchMove.move_number.asc())
+        .offset(offset)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return list(db.execute(stmt).scalars().all())
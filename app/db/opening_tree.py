@@ -0,0 +1,256 @@
+import heapq
+import logging
+import re
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.checkers_rules import Board, initial_board, iter_states
+from app.core.config import settings
+from app.core.pdn import coords_of, square_of
+from app.core.zobrist import hash_position
+from app.db.models.match import Match
+from app.db.models.opening_tree import OpeningMove
+from app.db.move_archive import load_moves
+
+logger = logging.getLogger(__name__)
+
+# column index in the [games, white_wins, black_wins, draws] counters
+RESULT_INDEX = {"white": 1, "black": 2, "draw": 3}
+
+Counts = Dict[Tuple[int, str], List[int]]
+
+# Session.info key: counts recorded in the session's open transaction
+PENDING_COUNTS = "opening_tree_counts"
+
+
+def iter_turns(plies: List[Dict[str, Any]], max_turns: int
+               ) -> Iterator[Tuple[int, str]]:
+    """
+    (hash of the position before the turn, move) for the first max_turns
+    complete turns; capture hops are merged into one move.
+    """
+    before = hash_position(initial_board(), "white")
+    squares: List[int] = []
+    capture = False
+    turns = 0
+    for ply, (board, next_role, forced_from) in zip(plies,
+                                                    iter_states(plies)):
+        move = ply["move"]
+        if not squares:
+            squares = [square_of(*move["from"])]
+            capture = bool(move.get("was_capture"))
+        squares.append(square_of(*move["to"]))
+        if forced_from is not None:
+            continue
+
+        yield before, ("x" if capture else "-").join(map(str, squares))
+        turns += 1
+        if turns >= max_turns:
+            return
+        before = hash_position(board, next_role)
+        squares = []
+
+
+def add_game(counts: Counts, plies: List[Dict[str, Any]], result: str,
+             max_turns: int) -> None:
+    """Fold one game into counts (a repeated position counts once)."""
+    outcome = RESULT_INDEX.get(result)
+    if outcome is None:
+        return
+    for key in dict.fromkeys(iter_turns(plies, max_turns)):
+        row = counts.setdefault(key, [0, 0, 0, 0])
+        row[0] += 1
+        row[outcome] += 1
+
+
+def upsert_counts(db: Session, counts: Counts) -> None:
+    """Add counts to the stored tree (insert or increment)."""
+    if not counts:
+        return
+    table = OpeningMove.__table__
+    rows = [
+        {"poshash": h, "move": m, "games": c[0], "white_wins": c[1],
+         "black_wins": c[2], "draws": c[3]}
+        for (h, m), c in counts.items()
+    ]
+    columns = ("games", "white_wins", "black_wins", "draws")
+
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {c: table.c[c] + stmt.inserted[c] for c in columns})
+    else:
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["poshash", "move"],
+            set_={c: table.c[c] + stmt.excluded[c] for c in columns})
+    db.execute(stmt, rows)
+
+
+def record_match_opening(db: Session, match: Match) -> None:
+    """
+    Add a just finished match to the tree, in the caller's transaction;
+    the in-memory copy is updated if and when that transaction commits.
+    """
+    plies = [{"player": m.player, "move": m.move}
+             for m in load_moves(db, match)]
+    counts: Counts = {}
+    try:
+        add_game(counts, plies, match.result,
+                 settings.OPENING_TREE_MAX_TURNS)
+    except ValueError as e:
+        logger.warning("Match %s left out of the opening tree: %s",
+                       match.matchid, e)
+        return
+    upsert_counts(db, counts)
+    # the shared in-memory tree only sees the game once it is committed
+    db.info.setdefault(PENDING_COUNTS, []).append(counts)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_counts(session: Session) -> None:
+    for counts in session.info.pop(PENDING_COUNTS, ()):
+        opening_tree.apply(counts)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_counts(session: Session) -> None:
+    session.info.pop(PENDING_COUNTS, None)
+
+
+class OpeningTree:
+    """
+    In-memory copy of the positions of opening_tree played in at least
+    min_games matches, reloaded every refresh_seconds so that matches
+    finished by other workers show up.
+    """
+
+    def __init__(self, min_games: int, refresh_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.min_games = min_games
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._positions: Dict[int, Dict[str, List[int]]] = {}
+        self._loaded_at: float | None = None
+        self._lock = Lock()
+
+    def lookup(self, db: Session, poshash: int) -> Dict[str, List[int]]:
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self.reload(db)
+        elif self.clock() - self._loaded_at >= self.refresh_seconds:
+            # one request refreshes, the others keep the current copy
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.reload(db)
+                finally:
+                    self._lock.release()
+        return {m: list(c) for m, c in
+                self._positions.get(poshash, {}).items()}
+
+    def reload(self, db: Session, batch_size: int = 10000) -> None:
+        positions: Dict[int, Dict[str, List[int]]] = {}
+        result = db.execute(
+            select(OpeningMove.poshash, OpeningMove.move, OpeningMove.games,
+                   OpeningMove.white_wins, OpeningMove.black_wins,
+                   OpeningMove.draws)
+            .where(OpeningMove.games >= self.min_games)
+            .execution_options(yield_per=batch_size)
+        )
+        for h, m, games, white, black, draws in result:
+            positions.setdefault(h, {})[m] = [games, white, black, draws]
+        self._positions = positions
+        self._loaded_at = self.clock()
+
+    def apply(self, counts: Counts) -> None:
+        """
+        Add freshly recorded games to moves already in memory; new moves
+        appear with the next reload.
+        """
+        for (h, m), c in counts.items():
+            row = self._positions.get(h, {}).get(m)
+            if row is not None:
+                for i, n in enumerate(c):
+                    row[i] += n
+
+    def clear(self) -> None:
+        self._positions = {}
+        self._loaded_at = None
+
+
+def rebuild_rows(games: Iterable[Tuple[List[Dict[str, Any]], str]],
+                 db: Session, max_turns: int,
+                 flush_every: int = 200000) -> int:
+    """
+    Stream games into the (emptied) tree, flushing partial counts
+    whenever flush_every distinct moves have accumulated.
+    """
+    counts: Counts = {}
+    seen = 0
+    for plies, result in games:
+        try:
+            add_game(counts, plies, result, max_turns)
+        except ValueError:
+            continue
+        seen += 1
+        if len(counts) >= flush_every:
+            upsert_counts(db, counts)
+            counts = {}
+    upsert_counts(db, counts)
+    return seen
+
+
+def play_turn(board: Board, role: str, move: str) -> Tuple[Board, str]:
+    """Apply a tree move ("11-15", "22x15x8") -> (board, next role)."""
+    squares = [coords_of(int(s)) for s in re.split(r"[-x]", move)]
+    plies = [{"player": role, "move": {"from": list(a), "to": list(b)}}
+             for a, b in zip(squares, squares[1:])]
+    for board, role, _ in iter_states(plies, board, role):
+        pass
+    return board, role
+
+
+def common_positions(db: Session, limit: int, min_games: int
+                     ) -> Iterator[Tuple[Board, str, int]]:
+    """
+    The positions reached most often in the tree, most played first:
+    (board, side to move, games).
+    """
+    counter = 0
+    heap: List[Tuple[int, int, Board, str]] = [
+        (0, counter, initial_board(), "white")]
+    seen = set()
+    while heap and len(seen) < limit:
+        neg_games, _, board, role = heapq.heappop(heap)
+        h = hash_position(board, role)
+        if h in seen:
+            continue
+        seen.add(h)
+        yield board, role, -neg_games
+
+        for move, games in db.execute(
+            select(OpeningMove.move, OpeningMove.games)
+            .where(OpeningMove.poshash == h,
+                   OpeningMove.games >= min_games)
+        ):
+            try:
+                child, next_role = play_turn(board, role, move)
+            except ValueError:
+                continue
+            counter += 1
+            heapq.heappush(heap, (-games, counter, child, next_role))
+
+
+opening_tree = OpeningTree(
+    min_games=settings.OPENING_TREE_MIN_GAMES,
+    refresh_seconds=settings.OPENING_TREE_REFRESH_SECONDS,
+)
@@ -0,0 +1,67 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models.match import Match
+from app.db.models.user_stats import UserStats
+
+
+def outcome_for(match: Match, userid: int) -> str:
+    if match.result == "draw":
+        return "draw"
+    role = "white" if match.whiteuser == userid else "black"
+    return "win" if match.result == role else "loss"
+
+
+def game_seconds(match: Match) -> int:
+    if not match.finishedat or not match.startedat:
+        return 0
+    return max(0, int((match.finishedat - match.startedat).total_seconds()))
+
+
+def apply_result(stats: UserStats, match: Match, outcome: str) -> None:
+    """Fold one finished match into a stats row (no DB access)."""
+    stats.games = (stats.games or 0) + 1
+    if outcome == "win":
+        stats.wins = (stats.wins or 0) + 1
+        streak = stats.current_streak or 0
+        stats.current_streak = streak + 1 if streak > 0 else 1
+    elif outcome == "loss":
+        stats.losses = (stats.losses or 0) + 1
+        streak = stats.current_streak or 0
+        stats.current_streak = streak - 1 if streak < 0 else -1
+    else:
+        stats.draws = (stats.draws or 0) + 1
+        stats.current_streak = 0
+    stats.best_streak = max(stats.best_streak or 0, stats.current_streak)
+
+    # reassign so the JSON column is flagged as modified
+    by_reason = {k: dict(v) for k, v in (stats.by_reason or {}).items()}
+    counts = by_reason.setdefault(match.reason or "none",
+                                  {"win": 0, "loss": 0, "draw": 0})
+    counts[outcome] += 1
+    stats.by_reason = by_reason
+
+    stats.total_moves = (stats.total_moves or 0) + (match.moves_count or 0)
+    stats.total_seconds = (stats.total_seconds or 0) + game_seconds(match)
+    stats.last_matchid = match.matchid
+
+
+def record_match_stats(db: Session, match: Match) -> None:
+    """
+    Update both players' rows for a match that just finished. Runs in the
+    transaction that finishes the match, so it commits (or not) with it.
+    """
+    for userid in (match.whiteuser, match.blackuser):
+        if userid is None:
+            continue
+        stats = db.execute(
+            select(UserStats)
+            .where(UserStats.userid == userid)
+            .with_for_update()
+        ).scalars().first()
+        if stats is None:
+            stats = UserStats(userid=userid)
+            db.add(stats)
+        if stats.last_matchid == match.matchid:
+            continue  # already counted
+        apply_result(stats, match, outcome_for(match, userid))
@@ -0,0 +1,77 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.checkers_rules import iter_states
+from app.core.zobrist import hash_position
+from app.db.models.match import Match
+from app.db.models.position_index import PositionIndex
+from app.db.move_archive import load_moves
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK = 5000
+
+
+def position_rows(matchid: int, moves: Iterable[Any]) -> List[Dict[str, int]]:
+    """
+    Index rows for a match: the position after every completed turn
+    (positions in the middle of a capture chain are skipped).
+    """
+    plies = ({"player": m.player, "move": m.move} for m in moves)
+    rows = []
+    for number, (board, next_role, forced_from) in enumerate(
+            iter_states(plies), start=1):
+        if forced_from is not None:
+            continue
+        rows.append({"poshash": hash_position(board, next_role),
+                     "matchid": matchid, "move_number": number})
+    return rows
+
+
+def insert_rows(db: Session, rows: List[Dict[str, int]]) -> None:
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.execute(insert(PositionIndex.__table__),
+                   rows[i:i + INSERT_CHUNK])
+
+
+def index_match(db: Session, match: Match) -> int:
+    """(Re)index one match, inside the caller's transaction."""
+    db.execute(delete(PositionIndex)
+               .where(PositionIndex.matchid == match.matchid))
+    try:
+        rows = position_rows(match.matchid, load_moves(db, match))
+    except ValueError as e:
+        logger.warning("Match %s not indexed: %s", match.matchid, e)
+        return 0
+    insert_rows(db, rows)
+    return len(rows)
+
+
+def search_position(db: Session, poshash: int, limit: int,
+                    after_matchid: Optional[int] = None):
+    """
+    Matches that reached the position, in matchid order, with the first
+    move number at which they did. The grouped scan only reads the
+    (poshash, matchid, move_number) primary key.
+    """
+    filters = [PositionIndex.poshash == poshash]
+    if after_matchid is not None:
+        filters.append(PositionIndex.matchid > after_matchid)
+
+    page = (
+        select(PositionIndex.matchid,
+               func.min(PositionIndex.move_number).label("move_number"))
+        .where(*filters)
+        .group_by(PositionIndex.matchid)
+        .order_by(PositionIndex.matchid.asc())
+        .limit(limit)
+        .subquery()
+    )
+    return db.execute(
+        select(Match, page.c.move_number)
+        .join(page, page.c.matchid == Match.matchid)
+        .order_by(Match.matchid.asc())
+    ).all()
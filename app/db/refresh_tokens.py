@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import create_refresh_token
+from app.db.models.authtoken import AuthToken
+from app.db.models.user import User
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def token_digest(token: str) -> str:
+    # only the hash is stored, a DB leak doesn't leak usable tokens
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def utcnow() -> datetime:
+    # authtoken.expiresat is a naive DATETIME holding UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RevocationSet:
+    """
+    In-process record of revoked refresh tokens, checked before any DB
+    access so replayed/revoked tokens are rejected cheaply. The authtoken
+    table stays authoritative (revocations from other workers are only
+    seen there), this just saves the round trip.
+    """
+
+    def __init__(self):
+        # digest -> (exp, userid if it was consumed by a rotation)
+        self._tokens: Dict[str, tuple] = {}
+        self._users: Dict[int, float] = {}
+        self._lock = Lock()
+
+    def revoke(self, digest: str, expires_at: float,
+               rotated_from_userid: int | None = None) -> None:
+        with self._lock:
+            self._tokens[digest] = (expires_at, rotated_from_userid)
+
+    def revoke_user(self, userid: int, before: float) -> None:
+        with self._lock:
+            self._users[userid] = before
+
+    # plain dict lookups, no lock needed for reads
+    def get(self, digest: str) -> tuple | None:
+        return self._tokens.get(digest)
+
+    def is_user_revoked(self, userid: int, iat: float) -> bool:
+        before = self._users.get(userid)
+        return before is not None and iat < before
+
+    def prune(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        max_age = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+        with self._lock:
+            self._tokens = {d: entry for d, entry in self._tokens.items()
+                            if entry[0] > now}
+            self._users = {u: ts for u, ts in self._users.items()
+                           if ts + max_age > now}
+
+
+revoked_refresh_tokens = RevocationSet()
+
+
+def issue_refresh_token(db: Session, user: User) -> str:
+    token = create_refresh_token(sub=user.email)
+    db.add(AuthToken(
+        userid=user.userid,
+        refreshtoken=token_digest(token),
+        expiresat=utcnow() + timedelta(
+            days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str, payload: dict) -> tuple:
+    """
+    Consume a refresh token and issue its replacement.
+    Returns (user, new_refresh_token).
+    """
+    digest = token_digest(token)
+    revoked = revoked_refresh_tokens.get(digest)
+    if revoked is not None:
+        _, rotated_userid = revoked
+        if rotated_userid is not None:
+            revoke_user_refresh_tokens(db, rotated_userid)
+            raise InvalidRefreshToken("Refresh token reused")
+        raise InvalidRefreshToken("Refresh token revoked")
+
+    user = db.execute(
+        select(User).where(User.email == payload.get("sub"))
+    ).scalars().first()
+    if not user:
+        raise InvalidRefreshToken("User not found")
+    if revoked_refresh_tokens.is_user_revoked(user.userid,
+                                              payload.get("iat", 0)):
+        raise InvalidRefreshToken("Refresh token revoked")
+
+    deleted = db.execute(
+        delete(AuthToken).where(
+            AuthToken.refreshtoken == digest,
+            AuthToken.userid == user.userid,
+            AuthToken.expiresat > utcnow(),
+        )
+    ).rowcount
+    if not deleted:
+        db.rollback()
+        if "jti" not in payload:
+            # issued before refresh tokens were stored: never had a row,
+            # so its absence says nothing about reuse
+            raise InvalidRefreshToken("Refresh token unknown")
+        # signed, stored and now gone: already rotated or revoked, so it
+        # was replayed. Treat as stolen and drop every session of the user.
+        revoke_user_refresh_tokens(db, user.userid)
+        raise InvalidRefreshToken("Refresh token reused")
+
+    new_token = issue_refresh_token(db, user)
+    # only once the rotation is committed
+    revoked_refresh_tokens.revoke(digest, payload.get("exp", 0),
+                                  rotated_from_userid=user.userid)
+    return user, new_token
+
+
+def revoke_refresh_token(db: Session, token: str, payload: dict) -> None:
+    digest = token_digest(token)
+    db.execute(delete(AuthToken).where(AuthToken.refreshtoken == digest))
+    db.commit()
+    revoked_refresh_tokens.revoke(digest, payload.get("exp", 0))
+
+
+def revoke_user_refresh_tokens(db: Session, userid: int) -> int:
+    deleted = db.execute(
+        delete(AuthToken).where(AuthToken.userid == userid)).rowcount
+    db.commit()
+    revoked_refresh_tokens.revoke_user(userid, int(time.time()))
+    return deleted
+
+
+def purge_expired_refresh_tokens(db: Session,
+                                 batch_size: int = 1000) -> int:
+    """Delete expired authtoken rows in small batches (short locks)."""
+    total = 0
+    while True:
+        ids = db.execute(
+            select(AuthToken.id)
+            .where(AuthToken.expiresat <= utcnow())
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(AuthToken).where(AuthToken.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+    revoked_refresh_tokens.prune()
+    return total
+
+
+async def purge_refresh_tokens_forever(interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(_purge_with_new_session)
+        except Exception:
+            logger.exception("Refresh token purge failed")
+
+
+def _purge_with_new_session() -> int:
+    db = SessionLocal()
+    try:
+        return purge_expired_refresh_tokens(db)
+    finally:
+        db.close()
@@ -1,15 +1,131 @@
-from sqlalchemy import create_engine
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import BigInteger, Integer, create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.core.config import settings
 
+_connect_args = {}
+_pool_args = {}
+if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+    _connect_args = {"check_same_thread": False}
+else:
+    _pool_args = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     pool_pre_ping=True,
     future=True,
+    connect_args=_connect_args,
+    **_pool_args,
 )
 SessionLocal = sessionmaker(bind=engine, autoflush=False,
                             autocommit=False, future=True)
 
+# SQLite only autoincrements INTEGER PRIMARY KEY columns
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
 
 class Base(DeclarativeBase):
     pass
+
+
+# Statement instrumentation, for every engine (tests build their own).
+# Each request / websocket message gets a QueryStats in a context
+# variable; statements running in that context are added to it.
+slow_query_log = logging.getLogger("app.db.slow_query")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|:\w+")
+_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+
+def normalize_sql(statement: str) -> str:
+    """Literals and placeholders as ?, IN lists collapsed, one line."""
+    sql = _LITERALS.sub("?", statement)
+    sql = _LISTS.sub("(...)", sql)
+    return " ".join(sql.split())
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[str]] = [] if keep_statements \
+            else None
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if self.statements is not None:
+            self.statements.append(statement)
+
+
+_current_queries: ContextVar[Optional[QueryStats]] = \
+    ContextVar("current_queries", default=None)
+
+
+@contextmanager
+def query_scope() -> Iterator[QueryStats]:
+    """Count the statements run in this context (and its threads/tasks)."""
+    stats = QueryStats()
+    token = _current_queries.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_queries.reset(token)
+
+
+@contextmanager
+def count_statements(bind: Engine) -> Iterator[QueryStats]:
+    """
+    Every statement run on `bind` inside the block, whatever the context
+    (the test client runs the app in another thread).
+    """
+    stats = QueryStats(keep_statements=True)
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        stats.add(statement, 0.0)
+
+    event.listen(bind, "after_cursor_execute", record)
+    try:
+        yield stats
+    finally:
+        event.remove(bind, "after_cursor_execute", record)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current_queries.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    if elapsed >= settings.DB_SLOW_QUERY_SECONDS:
+        slow_query_log.warning("%.1f ms: %s", elapsed * 1000,
+                               normalize_sql(statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # no after_cursor_execute for a failed statement
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
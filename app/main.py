@@ -1,11 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import auth
 from app.api.v1 import matchmaking
 from app.api.v1 import match_ws
 from app.api.v1 import match_history
+from app.core.ai_client import engine_client
+from app.core.ai_scheduler import ai_scheduler
+from app.core.config import settings
+from app.core.checkers_search import local_search
+from app.core.engine_cache import engine_reply_cache
+from app.core.metrics import (
+    Gauge,
+    HTTPMetricsMiddleware,
+    StatsGauges,
+    registry,
+)
+from app.core.password_pool import password_pool
+from app.core.principal_cache import principal_cache
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.core.response_cache import match_response_cache
+from app.core.ws_manager import connection_manager
+from app.db.analysis import run_analysis_jobs_forever
+from app.db.refresh_tokens import purge_refresh_tokens_forever
+from app.db.session import engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = [
+        asyncio.create_task(purge_refresh_tokens_forever(
+            settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS)),
+        asyncio.create_task(run_analysis_jobs_forever(
+            settings.AI_ANALYSIS_POLL_SECONDS)),
+    ]
+    yield
+    for task in background:
+        task.cancel()
+    await engine_client.aclose()
+    engine_reply_cache.close()
+    local_search.shutdown()
 
-app = FastAPI(title="Checkers API")
+
+app = FastAPI(title="Checkers API", lifespan=lifespan)
 
 # Only local for now
 origins = [
@@ -13,14 +52,24 @@ origins = [
     "http://127.0.0.1:4200"
 ]
 
+# Added before CORS so that 429 responses still get CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # keyset cursor of /match_history/history, read by the client to page
+    expose_headers=["X-Next-Before-Matchid"],
 )
 
+# Outermost, so that the latency includes the other middlewares
+if settings.METRICS_ENABLED:
+    app.add_middleware(HTTPMetricsMiddleware)
+
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(matchmaking.router, prefix="/api/v1")
 app.include_router(match_ws.router, prefix="/api/v1")
@@ -30,3 +79,33 @@ app.include_router(match_history.router, prefix="/api/v1")
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+registry.register(Gauge("ws_rooms", "Matches with an open websocket",
+                        lambda: len(connection_manager.rooms)))
+registry.register(Gauge("ws_sockets", "Open match websockets",
+                        connection_manager.socket_count))
+if hasattr(engine.pool, "checkedout"):
+    registry.register(Gauge("db_connections_in_use",
+                            "Pooled DB connections checked out",
+                            engine.pool.checkedout))
+for name, component in [
+    ("principal_cache", principal_cache),
+    ("password_pool", password_pool),
+    ("rate_limiter", rate_limiter),
+    ("match_response_cache", match_response_cache),
+    ("engine_client", engine_client),
+    ("engine_reply_cache", engine_reply_cache),
+    ("ai_scheduler", ai_scheduler),
+    ("local_search", local_search),
+]:
+    registry.register(StatsGauges(name, component.stats))
+
+
+@app.get("/metrics", response_class=PlainTextResponse,
+         include_in_schema=False)
+def metrics():
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("Metrics disabled\n", status_code=404)
+    return PlainTextResponse(registry.render(),
+                             media_type="text/plain; version=0.0.4")
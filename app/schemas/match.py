@@ -13,6 +13,7 @@ class MatchBase(BaseModel):
     reason: Literal["normal", "resign", "timeout", "agreement", "abandon",
                     "none"]
     status: Literal["waiting", "ongoing", "finished", "aborted"]
+    ai_level: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -23,3 +24,9 @@ class FindMatchResponse(BaseModel):
     match: MatchBase
     role: Literal["white", "black"]
     waiting: bool
+
+
+class AIMatchRequest(BaseModel):
+    level: int = 1
+    # None: random side
+    color: Optional[Literal["white", "black"]] = None
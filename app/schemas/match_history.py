@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Any, List
+from typing import Optional, Any, Dict, List, Literal
 from pydantic import BaseModel, ConfigDict
 
 
@@ -26,10 +26,11 @@ class MatchDetailOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     matchid: int
-    whiteuser: int
-    blackuser: int
+    # None on the engine's side of an AI match
+    whiteuser: Optional[int] = None
+    blackuser: Optional[int] = None
     status: str
-    winner: Optional[int]
+    winner: Optional[int] = None
     created_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     ended_at: Optional[datetime] = None
@@ -38,7 +39,8 @@ class MatchDetailOut(BaseModel):
 class MatchMoveOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
-    id: int
+    # None for moves read back from a compacted match
+    id: Optional[int] = None
     matchid: int
     move_number: int
     player: str
@@ -48,5 +50,86 @@ class MatchMoveOut(BaseModel):
 
 class MatchMovesPageOut(BaseModel):
     matchid: int
-    total: int
+    total: Optional[int] = None
+    next_after_move_number: Optional[int] = None
     items: List[MatchMoveOut]
+
+
+class PlayerStatsOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    userid: int
+    games: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    by_reason: Dict[str, Dict[str, int]] = {}
+    current_streak: int = 0
+    best_streak: int = 0
+    avg_moves: Optional[float] = None
+    avg_seconds: Optional[float] = None
+
+
+class PositionSearchIn(BaseModel):
+    # 8x8, row 0 on the BLACK side, same shape as the game board
+    board: List[List[Optional[Dict[str, Any]]]]
+    next_turn: Literal["white", "black"] = "white"
+
+
+class PositionMatchOut(BaseModel):
+    matchid: int
+    move_number: int
+    whiteuser: Optional[int] = None
+    blackuser: Optional[int] = None
+    result: str
+    finishedat: Optional[datetime] = None
+
+
+class PositionSearchOut(BaseModel):
+    poshash: int
+    items: List[PositionMatchOut]
+    next_after_matchid: Optional[int] = None
+
+
+class OpeningMoveOut(BaseModel):
+    move: str
+    games: int
+    white_wins: int
+    black_wins: int
+    draws: int
+
+
+class OpeningPositionOut(BaseModel):
+    line: List[str]
+    poshash: int
+    next_turn: str
+    moves: List[OpeningMoveOut]
+
+
+class MatchPositionOut(BaseModel):
+    matchid: int
+    move_number: int
+    # 8x8, row 0 on the BLACK side, pieces {"color", "king"}
+    board: List[List[Optional[Dict[str, Any]]]]
+    next_turn: str
+    forced_from: Optional[List[int]] = None
+    must_capture: bool
+
+
+class AnalysisPositionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    move_number: int
+    # white's point of view; None when there was a single legal move
+    score: Optional[int] = None
+    best_move: Optional[str] = None
+
+
+class MatchAnalysisOut(BaseModel):
+    matchid: int
+    status: Literal["queued", "running", "done", "failed"]
+    depth: int
+    positions_total: int
+    positions_done: int
+    error: Optional[str] = None
+    items: List[AnalysisPositionOut] = []
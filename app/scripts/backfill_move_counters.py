@@ -0,0 +1,78 @@
+"""
+One-off backfill of matches.moves_count / last_move_number / last_move_at
+from match_moves, for rows created before those columns existed.
+
+Safe to run with the app up: each batch locks its match rows (FOR UPDATE)
+before counting, so a move stored meanwhile either commits first and is
+counted, or waits for the batch and then numbers from the new counter.
+
+    python -m app.scripts.backfill_move_counters [--batch-size 1000]
+"""
+import argparse
+
+from sqlalchemy import func, select, update
+
+from app.db.session import SessionLocal
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+
+
+def backfill(db, batch_size: int = 1000) -> int:
+    done = 0
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(Match.matchid)
+            .where(Match.matchid > last_id,
+                   Match.archived_at.is_(None))
+            .order_by(Match.matchid.asc())
+            .limit(batch_size)
+            .with_for_update()
+        ).scalars().all()
+        if not ids:
+            break
+
+        stats = {
+            row.matchid: row for row in db.execute(
+                select(MatchMove.matchid,
+                       func.count(MatchMove.id).label("moves_count"),
+                       func.max(MatchMove.move_number).label("last_no"),
+                       func.max(MatchMove.createdat).label("last_at"))
+                .where(MatchMove.matchid.in_(ids))
+                .group_by(MatchMove.matchid)
+            )
+        }
+        db.execute(update(Match), [
+            {
+                "matchid": matchid,
+                "moves_count": stats[matchid].moves_count
+                if matchid in stats else 0,
+                "last_move_number": stats[matchid].last_no
+                if matchid in stats else 0,
+                "last_move_at": stats[matchid].last_at
+                if matchid in stats else None,
+            }
+            for matchid in ids
+        ])
+        db.commit()
+
+        done += len(ids)
+        last_id = ids[-1]
+        print(f"backfilled {done} matches (up to matchid {last_id})")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        backfill(db, args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
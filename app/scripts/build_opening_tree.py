@@ -0,0 +1,48 @@
+"""
+Rebuild the opening tree from all finished matches.
+
+    python -m app.scripts.build_opening_tree [--max-turns 20]
+
+Games are streamed one at a time through a single ordered read of
+matches/match_moves (archived matches included); partial counts are
+flushed to opening_tree as they grow, so memory stays bounded. New
+matches are added as they finish (app.db.match_events).
+"""
+import argparse
+
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.match_export import iter_match_archive
+from app.db.models.opening_tree import OpeningMove
+from app.db.opening_tree import rebuild_rows
+
+
+def build(db, max_turns: int, batch_size: int = 1000) -> int:
+    db.execute(delete(OpeningMove))
+    games = ((game["moves"], game["result"])
+             for game in iter_match_archive(db.get_bind(), None,
+                                            batch_size=batch_size))
+    seen = rebuild_rows(games, db, max_turns)
+    db.commit()
+    print(f"opening tree built from {seen} matches")
+    return seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-turns", type=int,
+                        default=settings.OPENING_TREE_MAX_TURNS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        build(db, args.max_turns, args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
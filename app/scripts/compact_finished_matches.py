@@ -0,0 +1,111 @@
+"""
+Pack the moves of finished matches into match_archives.
+
+    python -m app.scripts.compact_finished_matches [--batch-size 500]
+        [--min-age-hours 24]
+
+For each finished match older than --min-age-hours that is not archived
+yet, the moves are encoded (app.db.move_archive), checked
+by decoding them back, written as one archive row and deleted from
+match_moves, all in the same transaction as setting
+matches.archived_at. Matches whose moves cannot be encoded are left
+untouched and reported.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from app.db.session import SessionLocal
+from app.db.models.match import Match
+from app.db.models.match_archive import MatchArchive
+from app.db.models.match_move import MatchMove
+from app.db.move_archive import (
+    FORMAT,
+    ArchiveError,
+    decode_moves,
+    encode_moves,
+)
+
+
+def canonical(move: dict) -> dict:
+    return {"from": list(move["from"]), "to": list(move["to"]),
+            "was_capture": bool(move.get("was_capture"))}
+
+
+def compact(db, batch_size: int = 500, min_age_hours: float = 24) -> int:
+    cutoff = datetime.now() - timedelta(hours=min_age_hours)
+    done = 0
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(Match.matchid)
+            .where(Match.matchid > last_id,
+                   Match.status == "finished",
+                   Match.archived_at.is_(None),
+                   Match.finishedat < cutoff)
+            .order_by(Match.matchid.asc())
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        rows = db.execute(
+            select(MatchMove.matchid, MatchMove.player, MatchMove.move,
+                   MatchMove.createdat)
+            .where(MatchMove.matchid.in_(ids))
+            .order_by(MatchMove.matchid.asc(), MatchMove.move_number.asc())
+        ).all()
+
+        by_match = {matchid: [] for matchid in ids}
+        for row in rows:
+            by_match[row.matchid].append(row)
+
+        archives = []
+        for matchid, moves in by_match.items():
+            try:
+                data, first_at, count = encode_moves(
+                    (m.player, m.move, m.createdat) for m in moves)
+                decoded = decode_moves(matchid, data, first_at)
+                if [(d.player, d.move) for d in decoded] != \
+                        [(m.player, canonical(m.move)) for m in moves]:
+                    raise ArchiveError("round trip mismatch")
+            except (ArchiveError, KeyError, TypeError) as e:
+                print(f"match {matchid} left as is: {e}")
+                continue
+            archives.append({"matchid": matchid, "format": FORMAT,
+                             "moves_count": count, "first_move_at": first_at,
+                             "data": data})
+
+        if archives:
+            archived = [a["matchid"] for a in archives]
+            db.execute(insert(MatchArchive.__table__), archives)
+            db.execute(delete(MatchMove)
+                       .where(MatchMove.matchid.in_(archived)))
+            db.execute(update(Match)
+                       .where(Match.matchid.in_(archived))
+                       .values(archived_at=datetime.now()))
+            db.commit()
+            done += len(archives)
+        else:
+            db.rollback()
+        print(f"compacted {done} matches (up to matchid {last_id})")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--min-age-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        compact(db, args.batch_size, args.min_age_hours)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
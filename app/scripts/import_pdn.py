@@ -0,0 +1,152 @@
+"""
+Bulk import of PDN game collections into matches / match_moves.
+
+    python -m app.scripts.import_pdn games.pdn [more.pdn ...]
+        [--batch-size 500]
+
+Every game is replayed through the server rules; games that do not
+validate are reported and skipped. Players are matched to existing
+users by username (White/Black tags), unknown players are left NULL.
+Matches and moves are written with multi-row INSERTs, one transaction
+per batch. Afterwards run `python -m app.scripts.rebuild_player_stats`
+if imported games belong to known users.
+"""
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.pdn import PdnError, PdnGame, finish_reason, game_plies
+from app.core.pdn import iter_games
+from app.db.session import SessionLocal
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.db.models.user import User
+
+MOVE_CHUNK = 5000
+ID_RETRIES = 3
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value or "", "%Y.%m.%d")
+    except ValueError:
+        return None
+
+
+class UserLookup:
+    def __init__(self, db):
+        self.db = db
+        self.ids: Dict[str, Optional[int]] = {}
+
+    def __call__(self, name: Optional[str]) -> Optional[int]:
+        if not name or name == "?":
+            return None
+        if name not in self.ids:
+            self.ids[name] = self.db.execute(
+                select(User.userid).where(User.username == name)
+            ).scalar_one_or_none()
+        return self.ids[name]
+
+
+def game_rows(game: PdnGame, users: UserLookup, now: datetime):
+    plies, result, board, role = game_plies(game)
+    started = parse_date(game.tags.get("Date")) or now
+    match = {
+        "startedat": started,
+        "finishedat": started if result else None,
+        "whiteuser": users(game.tags.get("White")),
+        "blackuser": users(game.tags.get("Black")),
+        "result": result or "none",
+        "reason": finish_reason(result, board, role),
+        "status": "finished" if result else "aborted",
+        "moves_count": len(plies),
+        "last_move_number": len(plies),
+        "last_move_at": started if plies else None,
+    }
+    moves = [
+        {"move_number": n, "player": ply["player"], "move": ply["move"],
+         "createdat": started}
+        for n, ply in enumerate(plies, start=1)
+    ]
+    return match, moves
+
+
+def write_batch(db, batch: List[tuple]) -> None:
+    """
+    Insert a batch with explicitly allocated matchids, so the move rows
+    can reference them without a round trip per match. If a live insert
+    takes one of the ids meanwhile, the batch is retried on a new range.
+    """
+    for attempt in range(ID_RETRIES):
+        first = db.execute(
+            select(func.coalesce(func.max(Match.matchid), 0))
+        ).scalar_one() + 1
+
+        match_rows, move_rows = [], []
+        for offset, (match, moves) in enumerate(batch):
+            matchid = first + offset
+            match_rows.append({**match, "matchid": matchid})
+            move_rows.extend({**m, "matchid": matchid} for m in moves)
+
+        try:
+            db.execute(insert(Match.__table__), match_rows)
+            for i in range(0, len(move_rows), MOVE_CHUNK):
+                db.execute(insert(MatchMove.__table__),
+                           move_rows[i:i + MOVE_CHUNK])
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+            if attempt == ID_RETRIES - 1:
+                raise
+
+
+def import_games(db, games: Iterable[PdnGame],
+                 batch_size: int = 500) -> tuple[int, int]:
+    users = UserLookup(db)
+    now = datetime.now()
+    imported = skipped = 0
+    batch: List[tuple] = []
+
+    for index, game in enumerate(games, start=1):
+        try:
+            batch.append(game_rows(game, users, now))
+        except PdnError as e:
+            skipped += 1
+            print(f"game {index} skipped: {e}")
+            continue
+
+        if len(batch) >= batch_size:
+            write_batch(db, batch)
+            imported += len(batch)
+            batch = []
+            print(f"imported {imported} games")
+
+    if batch:
+        write_batch(db, batch)
+        imported += len(batch)
+    return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                imported, skipped = import_games(db, iter_games(f),
+                                                 args.batch_size)
+            print(f"{path}: {imported} imported, {skipped} skipped")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
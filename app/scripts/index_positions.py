@@ -0,0 +1,93 @@
+"""
+Build or refresh the position index and the replay checkpoints from
+finished matches.
+
+    python -m app.scripts.index_positions [--batch-size 500]
+        [--from-matchid 0]
+
+Matches finishing from now on are indexed as they finish
+(app.db.match_events); this covers the existing ones. Each batch
+replaces the index rows and checkpoints of its matches, so the job can
+be rerun or resumed with --from-matchid.
+"""
+import argparse
+
+from sqlalchemy import delete, insert, select
+
+from app.core.config import settings
+from app.db.checkpoints import checkpoint_rows
+from app.db.session import SessionLocal
+from app.db.models.match import Match
+from app.db.models.match_checkpoint import MatchCheckpoint
+from app.db.models.match_move import MatchMove
+from app.db.models.position_index import PositionIndex
+from app.db.move_archive import archived_moves
+from app.db.position_index import insert_rows, position_rows
+
+
+def build(db, batch_size: int = 500, from_matchid: int = 0) -> int:
+    done = 0
+    last_id = from_matchid
+    while True:
+        matches = db.execute(
+            select(Match)
+            .where(Match.matchid > last_id, Match.status == "finished")
+            .order_by(Match.matchid.asc())
+            .limit(batch_size)
+        ).scalars().all()
+        if not matches:
+            break
+        ids = [m.matchid for m in matches]
+        last_id = ids[-1]
+
+        moves = {matchid: [] for matchid in ids}
+        for row in db.execute(
+            select(MatchMove.matchid, MatchMove.player, MatchMove.move)
+            .where(MatchMove.matchid.in_(ids))
+            .order_by(MatchMove.matchid.asc(), MatchMove.move_number.asc())
+        ):
+            moves[row.matchid].append(row)
+
+        rows = []
+        checkpoints = []
+        for match in matches:
+            history = (archived_moves(db, match)
+                       if match.archived_at is not None
+                       else moves[match.matchid])
+            try:
+                rows.extend(position_rows(match.matchid, history))
+                checkpoints.extend(checkpoint_rows(
+                    match.matchid, history,
+                    settings.REPLAY_CHECKPOINT_INTERVAL))
+            except ValueError as e:
+                print(f"match {match.matchid} skipped: {e}")
+
+        db.execute(delete(PositionIndex)
+                   .where(PositionIndex.matchid.in_(ids)))
+        insert_rows(db, rows)
+        db.execute(delete(MatchCheckpoint)
+                   .where(MatchCheckpoint.matchid.in_(ids)))
+        if checkpoints:
+            db.execute(insert(MatchCheckpoint.__table__), checkpoints)
+        db.commit()
+
+        done += len(ids)
+        print(f"indexed {done} matches (up to matchid {last_id})")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--from-matchid", type=int, default=0)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        build(db, args.batch_size, args.from_matchid)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
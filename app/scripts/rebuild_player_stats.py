@@ -0,0 +1,65 @@
+"""
+Recompute user_stats from the finished matches.
+
+    python -m app.scripts.rebuild_player_stats [--batch-size 1000]
+
+Matches are streamed in finish order (the order the live updates
+happen in), so streaks come out the same as if they had been counted
+incrementally.
+"""
+import argparse
+
+from sqlalchemy import delete, select
+
+from app.db.session import SessionLocal
+from app.db.models.match import Match
+from app.db.models.user_stats import UserStats
+from app.db.player_stats import apply_result, outcome_for
+
+
+def rebuild(db, batch_size: int = 1000) -> int:
+    per_user: dict[int, UserStats] = {}
+    seen = 0
+
+    result = db.execute(
+        select(Match)
+        .where(Match.status == "finished")
+        .order_by(Match.finishedat.asc(), Match.matchid.asc())
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+    for batch in result.partitions():
+        for match in batch:
+            for userid in (match.whiteuser, match.blackuser):
+                if userid is None:
+                    continue
+                stats = per_user.get(userid)
+                if stats is None:
+                    stats = per_user[userid] = UserStats(userid=userid)
+                apply_result(stats, match, outcome_for(match, userid))
+        seen += len(batch)
+        print(f"read {seen} finished matches")
+
+    db.execute(delete(UserStats))
+    rows = list(per_user.values())
+    for i in range(0, len(rows), batch_size):
+        db.add_all(rows[i:i + batch_size])
+        db.flush()
+    db.commit()
+    print(f"wrote stats for {len(rows)} players")
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuild(db, args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
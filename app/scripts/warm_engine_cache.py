@@ -0,0 +1,81 @@
+"""
+Precompute engine replies for the most played opening positions.
+
+    python -m app.scripts.warm_engine_cache [--positions 500]
+        [--depth 6 ...] [--min-games 2] [--concurrency 4]
+
+Positions come from the opening tree (build it first with
+app.scripts.build_opening_tree), most played first. Replies are written
+to the persistent reply cache (AI_REPLY_CACHE_PATH), which the server
+reads on startup; positions already there cost nothing.
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.ai_client import EngineError, engine_client
+from app.core.checkers_rules import role_to_color
+from app.core.config import settings
+from app.core.engine_cache import engine_reply_cache
+from app.db.opening_tree import common_positions
+from app.db.session import SessionLocal
+
+
+async def warm(positions, depths, concurrency: int, timeout: float,
+               client=engine_client) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def ask(board, role, depth):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await client.best_move(board, role_to_color(role), depth,
+                                       deadline=time.monotonic() + timeout)
+            except EngineError as e:
+                failed += 1
+                print(f"depth {depth}: {e}")
+
+    await asyncio.gather(*(ask(board, role, depth)
+                           for board, role, _ in positions
+                           for depth in depths))
+    await client.aclose()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--positions", type=int, default=500)
+    parser.add_argument("--depth", type=int, action="append",
+                        help="default: every AI level's depth")
+    parser.add_argument("--min-games", type=int,
+                        default=settings.OPENING_TREE_MIN_GAMES)
+    parser.add_argument("--concurrency", type=int,
+                        default=settings.AI_ENGINE_MAX_CONNECTIONS)
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="seconds per position")
+    args = parser.parse_args()
+    if not settings.AI_REPLY_CACHE_PATH:
+        parser.error("AI_REPLY_CACHE_PATH is not set")
+
+    db = SessionLocal()
+    try:
+        positions = list(common_positions(db, args.positions,
+                                          args.min_games))
+    finally:
+        db.close()
+
+    depths = sorted(set(args.depth or settings.AI_LEVEL_DEPTHS))
+    started = time.monotonic()
+    failed = asyncio.run(warm(positions, depths, args.concurrency,
+                              args.timeout))
+    stats = engine_reply_cache.stats()
+    computed = stats["misses"] - failed
+    print(f"{len(positions)} positions x {len(depths)} depths in "
+          f"{time.monotonic() - started:.1f}s: {computed} computed, "
+          f"{stats['hits']} already cached, {failed} failed")
+    engine_reply_cache.close()
+
+
+if __name__ == "__main__":
+    main()
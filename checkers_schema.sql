@@ -9,6 +9,13 @@
    DEFAULT COLLATE utf8mb4_0900_ai_ci;
 USE checkers;
 
+DROP TABLE IF EXISTS `match_analysis`;
+DROP TABLE IF EXISTS `analysis_jobs`;
+DROP TABLE IF EXISTS `match_checkpoints`;
+DROP TABLE IF EXISTS `opening_tree`;
+DROP TABLE IF EXISTS `position_index`;
+DROP TABLE IF EXISTS `match_archives`;
+DROP TABLE IF EXISTS `user_stats`;
 DROP TABLE IF EXISTS `authtoken`;
 DROP TABLE IF EXISTS `movesmatch`;
 DROP TABLE IF EXISTS `matches`;
@@ -49,9 +56,16 @@ CREATE TABLE `matches` (
   `result`     ENUM('white','black','draw','none') NOT NULL DEFAULT 'none',
   `reason`     ENUM('normal','resign','timeout','agreement','abandon','none') NOT NULL DEFAULT 'none',
   `status`     ENUM('waiting','ongoing','finished','aborted') NOT NULL DEFAULT 'waiting',
+  `moves_count`      INT UNSIGNED NOT NULL DEFAULT 0,
+  `last_move_number` INT UNSIGNED NOT NULL DEFAULT 0,
+  `last_move_at`     DATETIME(6)  NULL,
+  `archived_at`      DATETIME     NULL,
+  `ai_level`         TINYINT UNSIGNED NULL,
   PRIMARY KEY (`matchid`),
   KEY `idx_matches_status` (`status`),
   KEY `idx_matches_players` (`whiteuser`,`blackuser`),
+  KEY `idx_matches_white_matchid` (`whiteuser`,`matchid`),
+  KEY `idx_matches_black_matchid` (`blackuser`,`matchid`),
   CONSTRAINT `fk_matches_whiteuser`
     FOREIGN KEY (`whiteuser`) REFERENCES `users`(`userid`) ON DELETE SET NULL ON UPDATE CASCADE,
   CONSTRAINT `fk_matches_blackuser`
@@ -93,3 +107,126 @@ CREATE TABLE `authtoken` (
   CONSTRAINT `fk_authtoken_user`
     FOREIGN KEY (`userid`) REFERENCES `users`(`userid`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- -----------------------------------
+-- user_stats
+-- Agregados por jugador, actualizados al terminar cada partida
+-- (rebuild: python -m app.scripts.rebuild_player_stats)
+-- -----------------------------------
+CREATE TABLE `user_stats` (
+  `userid`         BIGINT UNSIGNED NOT NULL,
+  `games`          INT UNSIGNED    NOT NULL DEFAULT 0,
+  `wins`           INT UNSIGNED    NOT NULL DEFAULT 0,
+  `losses`         INT UNSIGNED    NOT NULL DEFAULT 0,
+  `draws`          INT UNSIGNED    NOT NULL DEFAULT 0,
+  `by_reason`      JSON            NOT NULL,
+  `current_streak` INT             NOT NULL DEFAULT 0,
+  `best_streak`    INT             NOT NULL DEFAULT 0,
+  `total_moves`    BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  `total_seconds`  BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  `last_matchid`   BIGINT UNSIGNED NULL,
+  PRIMARY KEY (`userid`),
+  CONSTRAINT `fk_user_stats_user`
+    FOREIGN KEY (`userid`) REFERENCES `users`(`userid`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- -----------------------------------
+-- match_archives
+-- Jugadas de partidas terminadas compactadas en un blob
+-- (python -m app.scripts.compact_finished_matches; formato en
+-- app/db/move_archive.py). Sustituye a sus filas de match_moves.
+-- -----------------------------------
+CREATE TABLE `match_archives` (
+  `matchid`       BIGINT UNSIGNED   NOT NULL,
+  `format`        SMALLINT UNSIGNED NOT NULL DEFAULT 1,
+  `moves_count`   INT UNSIGNED      NOT NULL,
+  `first_move_at` DATETIME(6)       NULL,
+  `data`          BLOB              NOT NULL,
+  PRIMARY KEY (`matchid`),
+  CONSTRAINT `fk_match_archives_match`
+    FOREIGN KEY (`matchid`) REFERENCES `matches`(`matchid`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- -----------------------------------
+-- position_index
+-- Hash Zobrist (app/core/zobrist.py) de cada posición alcanzada al final
+-- de un turno en partidas terminadas. La PK cubre las búsquedas por
+-- posición (index-only). Se mantiene al terminar cada partida;
+-- reconstrucción: python -m app.scripts.index_positions
+-- -----------------------------------
+CREATE TABLE `position_index` (
+  `poshash`     BIGINT          NOT NULL,
+  `matchid`     BIGINT UNSIGNED NOT NULL,
+  `move_number` INT UNSIGNED    NOT NULL,
+  PRIMARY KEY (`poshash`, `matchid`, `move_number`),
+  KEY `idx_position_index_matchid` (`matchid`),
+  CONSTRAINT `fk_position_index_match`
+    FOREIGN KEY (`matchid`) REFERENCES `matches`(`matchid`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- -----------------------------------
+-- opening_tree
+-- Posición (hash Zobrist) -> jugada -> partidas y resultados, para los
+-- primeros OPENING_TREE_MAX_TURNS turnos de las partidas terminadas.
+-- Se incrementa al terminar cada partida;
+-- reconstrucción: python -m app.scripts.build_opening_tree
+-- -----------------------------------
+CREATE TABLE `opening_tree` (
+  `poshash`    BIGINT       NOT NULL,
+  `move`       VARCHAR(40)  NOT NULL,
+  `games`      INT UNSIGNED NOT NULL DEFAULT 0,
+  `white_wins` INT UNSIGNED NOT NULL DEFAULT 0,
+  `black_wins` INT UNSIGNED NOT NULL DEFAULT 0,
+  `draws`      INT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (`poshash`, `move`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- -----------------------------------
+-- match_checkpoints
+-- Estado de la partida cada REPLAY_CHECKPOINT_INTERVAL jugadas
+-- (formato en app/db/checkpoints.py), para /match_history/{id}/position
+-- -----------------------------------
+CREATE TABLE `match_checkpoints` (
+  `matchid`     BIGINT UNSIGNED NOT NULL,
+  `move_number` INT UNSIGNED    NOT NULL,
+  `state`       CHAR(35)        NOT NULL,
+  PRIMARY KEY (`matchid`, `move_number`),
+  CONSTRAINT `fk_match_checkpoints_match`
+    FOREIGN KEY (`matchid`) REFERENCES `matches`(`matchid`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=ascii;
+
+-- -----------------------------------
+-- analysis_jobs / match_analysis
+-- Análisis post-partida: una tarea por partida (cola deduplicada y
+-- reanudable, ver app/db/analysis.py) y la evaluación de cada posición
+-- desde el punto de vista de las blancas
+-- -----------------------------------
+CREATE TABLE `analysis_jobs` (
+  `matchid`         BIGINT UNSIGNED NOT NULL,
+  `status`          ENUM('queued','running','done','failed') NOT NULL DEFAULT 'queued',
+  `depth`           INT UNSIGNED    NOT NULL,
+  `positions_total` INT UNSIGNED    NOT NULL DEFAULT 0,
+  `positions_done`  INT UNSIGNED    NOT NULL DEFAULT 0,
+  `error`           VARCHAR(255)    NULL,
+  `created_at`      DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at`      DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`matchid`),
+  KEY `idx_analysis_jobs_status` (`status`, `updated_at`),
+  CONSTRAINT `fk_analysis_jobs_match`
+    FOREIGN KEY (`matchid`) REFERENCES `matches`(`matchid`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE `match_analysis` (
+  `matchid`     BIGINT UNSIGNED NOT NULL,
+  `move_number` INT UNSIGNED    NOT NULL,
+  `score`       INT             NULL,
+  `best_move`   VARCHAR(64)     NULL,
+  PRIMARY KEY (`matchid`, `move_number`),
+  CONSTRAINT `fk_match_analysis_match`
+    FOREIGN KEY (`matchid`) REFERENCES `matches`(`matchid`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=ascii;
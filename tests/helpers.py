@@ -0,0 +1,98 @@
+"""
+Shared test database, API client and game generator.
+
+One in-memory sqlite engine for every test module: StaticPool gives all
+sessions (and the TestClient's thread) the same connection, and
+reset_db() recreates the schema before each test.
+"""
+import random
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.deps import get_current_principal, get_db, get_session_factory
+from app.core.checkers_rules import (
+    all_captures_for_color,
+    all_steps_for_color,
+    compute_game_over,
+    compute_state_from_history,
+    piece_captures,
+    role_to_color,
+    validate_and_apply_move,
+)
+from app.core.security import Principal
+from app.db.models.user import User
+from app.db.session import Base
+
+engine = create_engine("sqlite://", poolclass=StaticPool,
+                       connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+# userid -> (email, username) of the seeded players
+USERS = {1: ("me@example.com", "me"), 2: ("op@example.com", "op")}
+
+
+def reset_db(users=tuple(USERS)) -> Session:
+    """Empty schema plus the given seeded users; returns a session."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    session.add_all(User(userid=userid, email=USERS[userid][0],
+                         username=USERS[userid][1], password_hash="x")
+                    for userid in users)
+    session.commit()
+    return session
+
+
+def principal(userid: int = 1) -> Principal:
+    email, username = USERS[userid]
+    return Principal(userid=userid, email=email, username=username)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def api_client(*routers: APIRouter, userid: int = 1) -> TestClient:
+    """The routers on the test database, authenticated as `userid`."""
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = \
+        lambda: TestingSessionLocal
+    app.dependency_overrides[get_current_principal] = \
+        lambda: principal(userid)
+    return TestClient(app)
+
+
+def random_game(seed, max_plies=300):
+    """Legal random plies (and the result, if the game ended)."""
+    rng = random.Random(seed)
+    plies = []
+    while len(plies) < max_plies:
+        board, role, forced_from, must_capture = \
+            compute_state_from_history(plies)
+        color = role_to_color(role)
+        if forced_from:
+            options = piece_captures(board, *forced_from)
+        elif must_capture:
+            options = all_captures_for_color(board, color)
+        else:
+            if compute_game_over(board, role)[0]:
+                return plies, compute_game_over(board, role)[1]
+            options = all_steps_for_color(board, color)
+        choice = rng.choice(options)
+        move = {"from": choice["from"], "to": choice["to"]}
+        _, was_cap, _, _ = validate_and_apply_move(
+            board, color, move, forced_from, must_capture or bool(forced_from))
+        plies.append({"player": role,
+                      "move": {**move, "was_capture": was_cap}})
+    return plies, None
@@ -0,0 +1,318 @@
+"""
+Load harness for matchmaking and match play.
+
+Starts the app with uvicorn against a local database, registers N synthetic
+users, drives concurrent /matchmaking/find calls and plays full games over
+/ws/match/{matchid}, then reports throughput and p50/p95/p99 latencies.
+
+Usage:
+    python -m tests.load_matchmaking --users 20 --rounds 2
+    python -m tests.load_matchmaking --db-url mysql+pymysql://u:p@host/db
+
+By default it uses a throwaway SQLite file. Set DATABASE_URL (or pass
+--db-url) to point it at a local MySQL that already has the schema.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+import websockets
+
+API = "/api/v1"
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name: str, seconds: float):
+        self.samples[name].append(seconds)
+
+    def error(self, name: str):
+        self.errors[name] += 1
+
+    def report(self, wall: float) -> str:
+        lines = [
+            f"{'metric':<14}{'count':>8}{'ops/s':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        ]
+        for name, values in sorted(self.samples.items()):
+            values = sorted(values)
+            lines.append(
+                f"{name:<14}{len(values):>8}{len(values) / wall:>10.1f}"
+                f"{percentile(values, 50) * 1000:>10.1f}"
+                f"{percentile(values, 95) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}"
+                f"{values[-1] * 1000:>10.1f}"
+            )
+        if self.errors:
+            lines.append("errors: " + ", ".join(
+                f"{k}={v}" for k, v in sorted(self.errors.items())))
+        return "\n".join(lines)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1,
+                   int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+def legal_moves(history: list[dict]) -> tuple[str, list[dict]]:
+    from app.core.checkers_rules import (
+        compute_state_from_history,
+        piece_captures,
+        all_captures_for_color,
+        all_steps_for_color,
+        role_to_color,
+    )
+
+    board, next_role, forced_from, must_capture = \
+        compute_state_from_history(history)
+    color = role_to_color(next_role)
+    if forced_from:
+        return next_role, piece_captures(board, *forced_from)
+    if must_capture:
+        return next_role, all_captures_for_color(board, color)
+    return next_role, all_steps_for_color(board, color)
+
+
+def start_server(host: str, port: int):
+    import uvicorn
+    from app.main import app
+    from app.db.session import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def timed(rec: Recorder, name: str, coro):
+    t0 = time.perf_counter()
+    try:
+        result = await coro
+    except Exception:
+        rec.error(name)
+        raise
+    rec.add(name, time.perf_counter() - t0)
+    return result
+
+
+async def register_and_login(client: httpx.AsyncClient, rec: Recorder,
+                             tag: str, i: int) -> httpx.Cookies:
+    email = f"load_{tag}_{i}@example.com"
+    password = "loadtest-pass"
+    resp = await timed(rec, "register", client.post(
+        f"{API}/auth/register",
+        json={"email": email, "username": f"load_{tag}_{i}",
+              "password": password},
+    ))
+    resp.raise_for_status()
+    resp = await timed(rec, "login", client.post(
+        f"{API}/auth/login", json={"email": email, "password": password}))
+    resp.raise_for_status()
+    return resp.cookies
+
+
+async def find_match(client: httpx.AsyncClient, rec: Recorder,
+                     cookies: httpx.Cookies, deadline: float) -> dict:
+    while time.monotonic() < deadline:
+        resp = await timed(rec, "find", client.post(
+            f"{API}/matchmaking/find", cookies=cookies))
+        if resp.status_code != 200:
+            rec.error("find_status")
+            await asyncio.sleep(0.1)
+            continue
+        data = resp.json()
+        if not data["waiting"]:
+            return data
+        await asyncio.sleep(0.05)
+    raise TimeoutError("no opponent found")
+
+
+async def play_game(client: httpx.AsyncClient, ws_base: str, rec: Recorder,
+                    cookies: httpx.Cookies, found: dict, args) -> str:
+    matchid = found["match"]["matchid"]
+    cookie_header = "; ".join(f"{k}={v}" for k, v in cookies.items())
+    history: list[dict] | None = None
+    pending_at: float | None = None
+    my_role = found["role"]
+
+    t0 = time.perf_counter()
+    async with websockets.connect(
+        f"{ws_base}{API}/ws/match/{matchid}",
+        additional_headers={"Cookie": cookie_header},
+    ) as ws:
+        while True:
+            if pending_at is None and history is not None:
+                next_role, options = legal_moves(history)
+                if next_role == my_role and options and \
+                        len(history) < args.max_plies:
+                    mv = random.choice(options)
+                    pending_at = time.perf_counter()
+                    await ws.send(json.dumps({
+                        "type": "move",
+                        "payload": {"move": {"from": mv["from"],
+                                             "to": mv["to"]}},
+                    }))
+                elif next_role == my_role and len(history) >= args.max_plies:
+                    await client.post(
+                        f"{API}/matchmaking/{matchid}/resign",
+                        cookies=cookies)
+                    return "resigned"
+
+            try:
+                raw = await asyncio.wait_for(ws.recv(), args.idle_timeout)
+            except asyncio.TimeoutError:
+                return "idle"
+            except websockets.ConnectionClosed:
+                return "closed"
+
+            msg = json.loads(raw)
+            kind = msg.get("type")
+            payload = msg.get("payload") or {}
+            if kind == "sync":
+                rec.add("connect_sync", time.perf_counter() - t0)
+                history = [{"player": m["player"], "move": m["move"]}
+                           for m in payload["moves"]]
+            elif kind == "move":
+                history.append({"player": payload["player"],
+                                "move": payload["move"]})
+                if payload["player"] == my_role and pending_at is not None:
+                    rec.add("move_rtt", time.perf_counter() - pending_at)
+                    pending_at = None
+            elif kind == "error":
+                rec.error("move_" + str(payload.get("detail"))[:24])
+                pending_at = None
+            elif kind == "match_finished":
+                return "finished"
+
+
+async def player(i: int, base_url: str, ws_base: str, rec: Recorder,
+                 outcomes: dict, args, tag: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        try:
+            cookies = await register_and_login(client, rec, tag, i)
+        except Exception as e:
+            outcomes["auth_" + type(e).__name__] += 1
+            return
+        for _ in range(args.rounds):
+            deadline = time.monotonic() + args.find_timeout
+            try:
+                found = await find_match(client, rec, cookies, deadline)
+                outcome = await play_game(client, ws_base, rec, cookies,
+                                          found, args)
+            except Exception as e:
+                outcome = type(e).__name__
+            outcomes[outcome] += 1
+
+
+async def login_storm(base_url: str, rec: Recorder, tag: str,
+                      stop: asyncio.Event, args):
+    """Repeated logins alongside the games, to see auth vs non-auth."""
+    email = f"storm_{tag}@example.com"
+    password = "loadtest-pass"
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await client.post(f"{API}/auth/register", json={
+            "email": email, "username": f"storm_{tag}",
+            "password": password})
+
+        async def worker():
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post(
+                        f"{API}/auth/login",
+                        json={"email": email, "password": password})
+                except httpx.HTTPError as e:
+                    rec.error("storm_" + type(e).__name__)
+                    continue
+                if resp.status_code == 503:
+                    rec.error("storm_503")
+                    await asyncio.sleep(
+                        float(resp.headers.get("Retry-After", 1)))
+                    continue
+                rec.add("login_storm", time.perf_counter() - t0)
+
+        await asyncio.gather(*(worker() for _ in range(args.login_storm)))
+
+
+async def run(args) -> None:
+    base_url = f"http://{args.host}:{args.port}"
+    ws_base = f"ws://{args.host}:{args.port}"
+    rec = Recorder()
+    outcomes: dict = defaultdict(int)
+    tag = uuid.uuid4().hex[:8]
+
+    stop = asyncio.Event()
+    storm = None
+    if args.login_storm:
+        storm = asyncio.create_task(
+            login_storm(base_url, rec, tag, stop, args))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        player(i, base_url, ws_base, rec, outcomes, args, tag)
+        for i in range(args.users)
+    ))
+    wall = time.perf_counter() - t0
+    stop.set()
+    if storm:
+        await storm
+
+    print(f"users={args.users} rounds={args.rounds} wall={wall:.2f}s")
+    print("games: " + ", ".join(
+        f"{k}={v}" for k, v in sorted(outcomes.items())))
+    print(rec.report(wall))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--find-timeout", type=float, default=30.0)
+    parser.add_argument("--idle-timeout", type=float, default=5.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db-url", default=os.environ.get(
+        "DATABASE_URL", "sqlite:///./loadtest.db"))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the rate limiter on (all clients share "
+                        "one IP, so auth endpoints will be throttled)")
+    parser.add_argument("--login-storm", type=int, default=0,
+                        help="concurrent login loops running during games")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # Settings are read at import time, so this must happen before app import
+    os.environ["DATABASE_URL"] = args.db_url
+    if not args.rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    server, thread = start_server(args.host, args.port)
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
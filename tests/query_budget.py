@@ -0,0 +1,22 @@
+"""Query budgets for endpoint tests: catch N+1 regressions in CI."""
+from contextlib import contextmanager
+
+from app.db.session import count_statements, normalize_sql
+
+
+@contextmanager
+def assert_max_queries(bind, limit: int):
+    """
+    Fail if the block runs more than `limit` statements on `bind`.
+
+        with assert_max_queries(engine, 3):
+            client.get("/match_history/history")
+    """
+    with count_statements(bind) as stats:
+        yield stats
+    if stats.count > limit:
+        listing = "\n".join(f"  {i}. {normalize_sql(s)}"
+                            for i, s in enumerate(stats.statements, 1))
+        raise AssertionError(
+            f"{stats.count} statements, expected at most {limit}:\n"
+            f"{listing}")
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.ai_client import (
+    EngineClient,
+    EngineError,
+    EngineMoveError,
+    EngineUnavailable,
+    encode_grid,
+)
+from app.core.checkers_rules import initial_board
+
+
+def make_client(handler, retries=2, timeout=2.0):
+    return EngineClient(base_url="http://engine", timeout=timeout,
+                        retries=retries, max_connections=2,
+                        transport=httpx.MockTransport(handler))
+
+
+def best_move(client, board, color, depth=4):
+    async def run():
+        try:
+            return await client.best_move(board, color, depth)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def empty_board():
+    return [[None for _ in range(8)] for _ in range(8)]
+
+
+def test_encode_grid_is_from_the_side_to_move():
+    board = initial_board()
+    black = encode_grid(board, "BLACK")
+    red = encode_grid(board, "RED")
+    # own men always start on the engine's rows 0-2
+    for grid in (black, red):
+        assert {v for row in grid[:3] for v in row} == {0, 1}
+        assert {v for row in grid[5:] for v in row} == {0, 3}
+    # RED is rotated by 180 degrees
+    assert red[2][7] == 1 and board[5][0]["color"] == "RED"
+
+    board[0][1]["king"] = True
+    assert encode_grid(board, "RED")[7][6] == 4
+    assert encode_grid(board, "BLACK")[0][1] == 2
+
+
+def test_red_path_is_rotated_back():
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        # (5, 0) -> (4, 1) on our board, as [col, row] engine points
+        return httpx.Response(200, json={"score": 12, "path": [[7, 2],
+                                                                 [6, 3]]})
+
+    reply = best_move(make_client(handler), initial_board(), "RED")
+    assert reply.score == 12
+    assert reply.moves == [{"from": [5, 0], "to": [4, 1]}]
+    assert seen[0]["depth"] == 4
+    assert seen[0]["grid"] == encode_grid(initial_board(), "RED")
+
+
+def test_capture_chain_stops_at_promotion():
+    board = empty_board()
+    board[5][2] = {"color": "BLACK", "king": False}
+    board[6][3] = {"color": "RED", "king": False}
+    board[6][5] = {"color": "RED", "king": False}
+
+    def handler(request):
+        # the engine keeps capturing with the new king
+        return httpx.Response(200, json={"score": 0,
+                                         "path": [[2, 5], [4, 7], [6, 5]]})
+
+    reply = best_move(make_client(handler), board, "BLACK")
+    assert reply.moves == [{"from": [5, 2], "to": [7, 4]}]
+
+
+def test_illegal_or_incomplete_paths_are_rejected():
+    board = empty_board()
+    board[2][1] = {"color": "BLACK", "king": False}
+    board[3][2] = {"color": "RED", "king": False}
+    board[5][4] = {"color": "RED", "king": False}
+
+    def reply_with(path):
+        return lambda request: httpx.Response(200, json={"score": 0,
+                                                         "path": path})
+
+    for path in ([], [[1, 2], [0, 3]],     # step while a capture exists
+                 [[1, 2], [3, 4]],         # stops half way through the chain
+                 [[1, 2], [3, 4], [5, 6], [7, 5]]):
+        with pytest.raises(EngineMoveError):
+            best_move(make_client(reply_with(path)), board, "BLACK")
+
+    reply = best_move(make_client(reply_with([[1, 2], [3, 4], [5, 6]])),
+                      board, "BLACK")
+    assert reply.moves == [{"from": [2, 1], "to": [4, 3]},
+                           {"from": [4, 3], "to": [6, 5]}]
+
+
+def test_server_errors_are_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"score": 0, "path": [[7, 2],
+                                                                [6, 3]]})
+
+    client = make_client(handler, retries=2)
+    reply = best_move(client, initial_board(), "RED")
+    assert reply.moves and len(calls) == 3
+    assert client.stats() == {"requests": 3, "failures": 0,
+                              "fallbacks": 0}
+
+
+def test_bad_request_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(400, json={"error": "bad grid"})
+
+    with pytest.raises(EngineError, match="400"):
+        best_move(make_client(handler), initial_board(), "RED")
+    assert len(calls) == 1
+
+
+def test_unreachable_engine():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client(handler, retries=1)
+    with pytest.raises(EngineUnavailable):
+        best_move(client, initial_board(), "RED")
+    assert client.stats() == {"requests": 2, "failures": 1,
+                              "fallbacks": 0}
+
+
+def test_deadline_bounds_the_retries():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={"score": 0, "path": []})
+
+    client = make_client(handler, retries=5, timeout=0.2)
+    with pytest.raises(EngineUnavailable):
+        best_move(client, initial_board(), "RED")
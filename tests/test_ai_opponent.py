@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.api import ai_opponent
+from app.api.ai_opponent import level_budget, play_ai_turn
+from app.api.v1.matchmaking import router
+from app.core.ai_client import EngineClient
+from app.core.checkers_rules import (
+    all_captures_for_color,
+    all_steps_for_color,
+    compute_state_from_history,
+    piece_captures,
+    validate_and_apply_move,
+)
+from app.core.ws_manager import connection_manager
+from app.db.match_moves import append_move
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from tests.helpers import TestingSessionLocal, api_client, reset_db
+
+client = api_client(router)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    yield session
+    session.close()
+    connection_manager.rooms.clear()
+
+
+def first_legal_turn(board, color):
+    """A complete legal turn for color, as (row, col) squares."""
+    caps = all_captures_for_color(board, color)
+    if not caps:
+        step = all_steps_for_color(board, color)[0]
+        return [tuple(step["from"]), tuple(step["to"])]
+    path = [tuple(caps[0]["from"])]
+    move = caps[0]
+    while True:
+        board, _, pos, _ = validate_and_apply_move(board, color, move,
+                                                   None, True)
+        path.append(pos)
+        if board[pos[0]][pos[1]].pop("_kinged_now", False):
+            return path
+        more = piece_captures(board, *pos)
+        if not more:
+            return path
+        move = more[0]
+
+
+def stub_engine(calls):
+    """Plays the first legal move for "my" (grid codes 1/2) side."""
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append(body)
+        board = [[None if v == 0 else
+                  {"color": "BLACK" if v in (1, 2) else "RED",
+                   "king": v in (2, 4)} for v in row]
+                 for row in body["grid"]]
+        path = first_legal_turn(board, "BLACK")
+        return httpx.Response(200, json={"score": 0,
+                                         "path": [[c, r] for r, c in path]})
+    return handler
+
+
+def engine_client(handler):
+    return EngineClient(base_url="http://engine", timeout=2.0, retries=0,
+                        max_connections=1,
+                        transport=httpx.MockTransport(handler))
+
+
+def ai_turn(matchid, handler):
+    async def run():
+        client = engine_client(handler)
+        try:
+            await play_ai_turn(matchid, client, TestingSessionLocal)
+        finally:
+            await client.aclose()
+    asyncio.run(run())
+
+
+def history(db, matchid):
+    db.expire_all()
+    return [{"player": m.player, "move": m.move} for m in
+            db.query(MatchMove).filter_by(matchid=matchid)
+            .order_by(MatchMove.move_number)]
+
+
+def test_create_ai_match(db):
+    resp = client.post("/matchmaking/ai", json={"level": 2,
+                                                "color": "black"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["role"] == "black" and data["waiting"] is False
+    assert data["match"]["status"] == "ongoing"
+    assert data["match"]["ai_level"] == 2
+    assert data["match"]["whiteuser"] is None
+
+    assert client.post("/matchmaking/ai", json={}).status_code == 409
+    assert client.post("/matchmaking/ai",
+                       json={"level": 99}).status_code == 400
+
+
+def test_level_budget_is_clamped():
+    assert level_budget(1)[0] == ai_opponent.settings.AI_LEVEL_DEPTHS[0]
+    assert level_budget(99)[0] == ai_opponent.settings.AI_LEVEL_DEPTHS[-1]
+
+
+def test_engine_opens_as_white(db):
+    db.add(Match(matchid=7, blackuser=1, status="ongoing", ai_level=3))
+    db.commit()
+    socket = FakeSocket()
+    connection_manager.rooms[7] = {1: socket}
+    calls = []
+
+    ai_turn(7, stub_engine(calls))
+
+    assert calls[0]["depth"] == level_budget(3)[0]
+    moves = history(db, 7)
+    assert [m["player"] for m in moves] == ["white"]
+    assert socket.sent[0]["type"] == "move"
+    assert socket.sent[0]["payload"]["next_turn"] == "black"
+
+    # not its turn any more: nothing happens
+    ai_turn(7, stub_engine(calls))
+    assert len(calls) == 1 and len(history(db, 7)) == 1
+
+
+def test_full_game_against_the_engine(db):
+    db.add(Match(matchid=8, whiteuser=1, status="ongoing", ai_level=2))
+    db.commit()
+    socket = FakeSocket()
+    connection_manager.rooms[8] = {1: socket}
+    handler = stub_engine([])
+
+    for _ in range(200):
+        db.expire_all()
+        if db.get(Match, 8).status != "ongoing":
+            break
+        board, next_role, _, _ = \
+            compute_state_from_history(history(db, 8))
+        assert next_role == "white"
+        path = first_legal_turn(board, "RED")
+        for frm, to in zip(path, path[1:]):
+            was_cap = abs(to[0] - frm[0]) == 2
+            append_move(db, 8, "white", {"from": list(frm), "to": list(to),
+                                         "was_capture": was_cap})
+        board, next_role, _, _ = \
+            compute_state_from_history(history(db, 8))
+        if next_role == "black":
+            ai_turn(8, handler)
+
+    match = db.get(Match, 8)
+    assert match.status == "finished" and match.result in ("white", "black")
+    assert socket.sent[-1]["type"] == "match_finished"
+    assert socket.closed
+    # the whole stored game replays under the server rules
+    compute_state_from_history(history(db, 8))
+
+
+def test_engine_failure_is_reported(db):
+    db.add(Match(matchid=9, blackuser=1, status="ongoing", ai_level=2))
+    db.commit()
+    socket = FakeSocket()
+    connection_manager.rooms[9] = {1: socket}
+
+    ai_turn(9, lambda request: httpx.Response(503))
+
+    assert history(db, 9) == []
+    assert socket.sent[0]["type"] == "error"
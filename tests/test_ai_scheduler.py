@@ -0,0 +1,217 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.core.ai_client import EngineClient, EngineReply, EngineUnavailable
+from app.core.ai_scheduler import AIScheduler
+from app.core.checkers_rules import initial_board
+from app.core.checkers_search import LocalSearch
+
+
+class FakeEngine:
+    """
+    Answers after `delay` seconds; depths in `too_slow` never answer.
+    Local searches answer at once, with score "local".
+    """
+
+    timeout = 5.0
+    fallback = None
+
+    def __init__(self, delay=0.02, too_slow=()):
+        self.delay = delay
+        self.too_slow = set(too_slow)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def best_move(self, board, color, depth, deadline=None,
+                        local=False, use_fallback=True):
+        if local:
+            self.calls.append("local")
+            return EngineReply(score="local", moves=[])
+        self.calls.append(depth)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if depth in self.too_slow:
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+                raise EngineUnavailable("deadline exceeded")
+            await asyncio.sleep(self.delay)
+            return EngineReply(score=depth, moves=[])
+        finally:
+            self.running -= 1
+
+
+def scheduler(engine, concurrency=2):
+    return AIScheduler(engine, concurrency=concurrency, fallback_depth=2,
+                       fallback_share=0.3)
+
+
+def test_concurrency_is_bounded():
+    engine = FakeEngine()
+    sched = scheduler(engine, concurrency=2)
+
+    async def run():
+        # distinct depths: nothing is coalesced
+        return await asyncio.gather(*(
+            sched.best_move(initial_board(), "RED", depth)
+            for depth in range(4, 10)))
+
+    replies = asyncio.run(run())
+    assert [r.score for r in replies] == [4, 5, 6, 7, 8, 9]
+    assert engine.max_running == 2
+    stats = sched.stats()
+    assert (stats["active"], stats["queued"], stats["requests"]) == (0, 0, 6)
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_queue_is_served_earliest_deadline_first():
+    engine = FakeEngine()
+    sched = scheduler(engine, concurrency=1)
+    order = []
+
+    async def ask(depth, seconds):
+        reply = await sched.best_move(initial_board(), "RED", depth,
+                                      deadline=time.monotonic() + seconds)
+        order.append(reply.score)
+
+    async def run():
+        first = asyncio.ensure_future(ask(1, 5))
+        await asyncio.sleep(0)  # takes the only slot
+        await asyncio.gather(first, ask(2, 9), ask(3, 3), ask(4, 6))
+
+    asyncio.run(run())
+    assert order == [1, 3, 4, 2]
+
+
+def test_identical_requests_share_one_call():
+    engine = FakeEngine()
+    sched = scheduler(engine)
+
+    async def run():
+        return await asyncio.gather(
+            sched.best_move(initial_board(), "RED", 4),
+            sched.best_move(initial_board(), "RED", 4),
+            sched.best_move(initial_board(), "BLACK", 4))
+
+    a, b, c = asyncio.run(run())
+    assert a is b and c is not a
+    assert len(engine.calls) == 2
+    assert sched.stats()["coalesced"] == 1
+
+
+def test_slow_search_falls_back_to_cheaper_depth():
+    engine = FakeEngine(too_slow={6})
+    sched = scheduler(engine)
+
+    async def run():
+        return await sched.best_move(initial_board(), "RED", 6,
+                                     deadline=time.monotonic() + 0.3)
+
+    assert asyncio.run(run()).score == 2
+    assert engine.calls == [6, 2]
+    assert sched.stats()["fallbacks"] == 1
+
+
+def test_deadline_passes_while_queued():
+    engine = FakeEngine(delay=0.3)
+    sched = scheduler(engine, concurrency=1)
+
+    async def run():
+        slow = asyncio.ensure_future(
+            sched.best_move(initial_board(), "BLACK", 2))
+        await asyncio.sleep(0)
+        with pytest.raises(EngineUnavailable):
+            await sched.best_move(initial_board(), "RED", 2,
+                                  deadline=time.monotonic() + 0.05)
+        await slow
+        # the slot is still usable
+        return await sched.best_move(initial_board(), "RED", 2)
+
+    assert asyncio.run(run()).score == 2
+    stats = sched.stats()
+    assert stats["expired"] == 1 and stats["active"] == 0
+
+
+def test_queued_too_long_falls_back_to_local():
+    engine = FakeEngine(delay=0.3)
+    engine.fallback = "local search"
+    sched = scheduler(engine, concurrency=1)
+
+    async def run():
+        slow = asyncio.ensure_future(
+            sched.best_move(initial_board(), "BLACK", 2))
+        await asyncio.sleep(0)
+        reply = await sched.best_move(initial_board(), "RED", 2,
+                                      deadline=time.monotonic() + 0.05)
+        await slow
+        return reply
+
+    assert asyncio.run(run()).score == "local"
+    stats = sched.stats()
+    assert stats["expired"] == 1 and stats["local_fallbacks"] == 1
+
+
+def test_local_searches_take_no_engine_slot():
+    engine = FakeEngine()
+    sched = scheduler(engine, concurrency=1)
+
+    async def run():
+        engine_turn = asyncio.ensure_future(
+            sched.best_move(initial_board(), "BLACK", 2))
+        await asyncio.sleep(0)  # takes the only slot
+        local = await sched.best_move(initial_board(), "RED", 2,
+                                      local=True)
+        assert not engine_turn.done()
+        return local, await engine_turn
+
+    local, reply = asyncio.run(run())
+    assert (local.score, reply.score) == ("local", 2)
+    assert sched.stats()["expired"] == 0
+
+
+def test_engine_timeout_with_real_client():
+    depths = []
+
+    async def handler(request):
+        depths.append(json.loads(request.content)["depth"])
+        await asyncio.sleep(10)  # never answers in time
+
+    local = LocalSearch(workers=1)
+    local_seconds = []
+    local_run = local.run
+
+    async def timed_run(board, color, depth, seconds):
+        local_seconds.append(seconds)
+        return await local_run(board, color, depth, seconds)
+
+    local.run = timed_run
+    client = EngineClient(base_url="http://engine", timeout=1.0, retries=0,
+                          max_connections=2, fallback=local,
+                          transport=httpx.MockTransport(handler))
+    sched = scheduler(client)
+
+    async def run():
+        deadline = time.monotonic() + 0.4
+        reply = await sched.best_move(initial_board(), "RED", 6,
+                                      deadline=deadline)
+        late = time.monotonic() - deadline
+        await client.aclose()
+        return reply, late
+
+    try:
+        reply, late = asyncio.run(run())
+    finally:
+        local.shutdown()
+    # full depth, then fallback_depth, then the local search
+    assert depths == [6, 2]
+    assert reply.moves and reply.moves[0]["from"][0] == 5
+    assert late < 0.2
+    # the local search still had its fallback_share (0.3) of the 0.4 s
+    assert local_seconds[0] > 0.1
+    stats = sched.stats()
+    assert stats["fallbacks"] == 1 and stats["local_fallbacks"] == 1
+    assert client.stats()["fallbacks"] == 0
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.match_history import router
+from app.core.ai_client import EngineMoveError, EngineReply, EngineUnavailable
+from app.core.checkers_rules import all_captures_for_color, all_steps_for_color
+from app.db.analysis import analysis_positions, move_text, run_next_job
+from app.db.models.analysis_job import AnalysisJob
+from app.db.models.match import Match
+from app.db.models.match_analysis import MatchAnalysis
+from app.db.models.match_move import MatchMove
+from tests.helpers import (
+    TestingSessionLocal,
+    api_client,
+    random_game,
+    reset_db,
+)
+
+client = api_client(router)
+
+
+class FakeEngine:
+    """Plays the first legal hop, scoring +10 for RED; can fail on demand."""
+
+    def __init__(self, fail_after=None, error=EngineUnavailable):
+        self.calls = []
+        self.fail_after = fail_after
+        self.error = error
+
+    async def best_move(self, board, color, depth, deadline=None,
+                        priority=None, local=False):
+        if self.fail_after is not None and \
+                len(self.calls) >= self.fail_after:
+            raise self.error("engine down")
+        self.calls.append((color, depth, priority))
+        options = all_captures_for_color(board, color) or \
+            all_steps_for_color(board, color)
+        move = {"from": options[0]["from"], "to": options[0]["to"]}
+        return EngineReply(score=10 if color == "RED" else -10,
+                           moves=[move])
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    plies, result = random_game(3, max_plies=60)
+    session.add(Match(matchid=5, whiteuser=1, blackuser=2,
+                      status="finished", result=result or "draw",
+                      last_move_number=len(plies)))
+    session.add(Match(matchid=6, whiteuser=1, blackuser=2,
+                      status="ongoing"))
+    session.add_all(MatchMove(matchid=5, move_number=n, player=p["player"],
+                              move=p["move"])
+                    for n, p in enumerate(plies, 1))
+    session.commit()
+    session.plies = plies
+    yield session
+    session.close()
+
+
+def run(fake):
+    return asyncio.run(run_next_job(fake, TestingSessionLocal))
+
+
+def test_positions_are_turn_starts(db):
+    positions = analysis_positions(db.plies)
+    assert positions[0][0] == 0 and positions[0][2] == "white"
+    turns = sum(1 for n, p in enumerate(db.plies)
+                if n == 0 or p["player"] != db.plies[n - 1]["player"])
+    assert len(positions) in (turns, turns + 1)  # + the final position
+    assert move_text([{"from": [5, 0], "to": [4, 1]}]) == "21-17"
+    assert move_text([{"from": [5, 0], "to": [3, 2]},
+                      {"from": [3, 2], "to": [1, 4]}]) == "21x14x7"
+
+
+def test_request_is_deduplicated(db):
+    first = client.post("/match_history/5/analysis")
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    assert client.post("/match_history/5/analysis").status_code == 202
+    assert db.query(AnalysisJob).count() == 1
+
+    assert client.post("/match_history/6/analysis").status_code == 409
+    assert client.post("/match_history/99/analysis").status_code == 404
+    assert client.get("/match_history/6/analysis").status_code == 404
+
+
+def test_job_runs_to_completion(db):
+    client.post("/match_history/5/analysis")
+    fake = FakeEngine()
+    assert run(fake) is True
+    assert run(fake) is False  # nothing left to claim
+
+    data = client.get("/match_history/5/analysis").json()
+    total = len(analysis_positions(db.plies))
+    assert data["status"] == "done"
+    assert data["positions_total"] == data["positions_done"] == total
+    assert [i["move_number"] for i in data["items"]] == \
+        [p[0] for p in analysis_positions(db.plies)]
+    # scores are from white's side whoever is to move
+    assert {i["score"] for i in data["items"]} == {10}
+    assert len(fake.calls) == total
+    # behind any game's move in the scheduler
+    assert all(priority > 3000 for _, _, priority in fake.calls)
+
+
+def test_unavailable_engine_requeues_and_resumes(db):
+    client.post("/match_history/5/analysis")
+    total = len(analysis_positions(db.plies))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.db.analysis.settings.AI_ANALYSIS_BATCH_SIZE", 4)
+        assert run(FakeEngine(fail_after=5)) is False
+
+        db.expire_all()
+        job = db.get(AnalysisJob, 5)
+        assert job.status == "queued" and job.error == "engine down"
+        assert job.positions_done == 4  # the first batch was kept
+
+        fake = FakeEngine()
+        assert run(fake) is True
+    assert len(fake.calls) == total - 4
+    assert db.query(MatchAnalysis).count() == total
+
+
+def test_bad_engine_reply_fails_the_job(db):
+    client.post("/match_history/5/analysis")
+    assert run(FakeEngine(fail_after=0, error=EngineMoveError)) is True
+    assert client.get("/match_history/5/analysis").json()["status"] == \
+        "failed"
+
+    # asking again retries it
+    assert client.post("/match_history/5/analysis").json()["status"] == \
+        "queued"
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import httpx
+
+from app.core.ai_client import EngineClient, path_to_moves
+from app.core.checkers_rules import (
+    all_captures_for_color,
+    all_steps_for_color,
+    initial_board,
+    iter_states,
+    piece_captures,
+    role_to_color,
+    validate_and_apply_move,
+)
+from app.core.checkers_search import LocalSearch, legal_turns, pack, search
+from app.core.pdn import coords_of
+from tests.helpers import random_game
+
+
+def rules_turns(board, color, frm=None):
+    """Complete turns per checkers_rules, as tuples of (row, col)."""
+    if frm is None:
+        caps = all_captures_for_color(board, color)
+        if not caps:
+            return {(tuple(s["from"]), tuple(s["to"]))
+                    for s in all_steps_for_color(board, color)}
+    else:
+        caps = piece_captures(board, *frm)
+    turns = set()
+    for cap in caps:
+        after, _, pos, _ = validate_and_apply_move(
+            board, color, {"from": cap["from"], "to": cap["to"]}, frm, True)
+        kinged = after[pos[0]][pos[1]].pop("_kinged_now", False)
+        rest = set() if kinged else rules_turns(after, color, pos)
+        start = tuple(cap["from"])
+        turns |= {(start,) + t for t in rest} or {(start, pos)}
+    return turns
+
+
+def empty_board():
+    return [[None for _ in range(8)] for _ in range(8)]
+
+
+def test_turns_match_the_server_rules():
+    checked = 0
+    for seed in range(15):
+        plies, _ = random_game(seed, max_plies=120)
+        for board, role, forced_from in iter_states(plies):
+            if forced_from is not None:
+                continue
+            side = 1 if role == "white" else -1
+            mine = {tuple(coords_of(s + 1) for s in path)
+                    for path, _ in legal_turns(pack(board), side)}
+            assert mine == rules_turns(board, role_to_color(role))
+            checked += 1
+    assert checked > 500
+
+
+def test_takes_the_bigger_capture():
+    board = empty_board()
+    board[5][2] = {"color": "RED", "king": False}
+    board[4][1] = {"color": "BLACK", "king": False}
+    board[4][3] = {"color": "BLACK", "king": False}
+    board[2][5] = {"color": "BLACK", "king": False}
+    board[0][1] = {"color": "BLACK", "king": False}
+
+    _, path, reached = search(pack(board), 1, max_depth=4, seconds=2)
+    # (5,2)x(3,4)x(1,6) takes two men; (5,2)x(3,0) only one
+    assert path == [(5, 2), (3, 4), (1, 6)]
+    assert reached == 4
+    path_to_moves(board, "RED", path)
+
+
+def test_time_budget_is_respected():
+    started = time.monotonic()
+    _, path, reached = search(pack(initial_board()), 1, max_depth=40,
+                              seconds=0.3)
+    assert time.monotonic() - started < 1.0
+    assert 1 <= reached < 40
+    path_to_moves(initial_board(), "RED", path)
+
+
+def test_no_move_means_empty_path():
+    board = empty_board()
+    board[6][1] = {"color": "BLACK", "king": False}  # blocked
+    board[7][0] = {"color": "RED", "king": False}
+    board[7][2] = {"color": "RED", "king": False}
+    assert search(pack(board), -1, 4, 1) == (None, [], 0)
+
+
+def test_client_falls_back_to_local_search():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    local = LocalSearch(workers=1)
+    client = EngineClient(base_url="http://engine", timeout=1.0, retries=0,
+                          max_connections=1, fallback=local,
+                          transport=httpx.MockTransport(handler))
+
+    async def run():
+        down = await client.best_move(initial_board(), "BLACK", 3)
+        direct = await client.best_move(initial_board(), "RED", 3,
+                                        local=True)
+        await client.aclose()
+        return down, direct
+
+    try:
+        down, direct = asyncio.run(run())
+    finally:
+        local.shutdown()
+    assert down.moves[0]["from"][0] == 2 and direct.moves[0]["from"][0] == 5
+    assert client.stats()["fallbacks"] == 1
+    assert client.stats()["requests"] == 1
+    assert local.stats()["searches"] == 2
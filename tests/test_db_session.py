@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import session
+from app.db.session import normalize_sql, query_scope
+from tests.query_budget import assert_max_queries
+
+engine = create_engine("sqlite://")
+
+
+def test_normalize_sql():
+    assert normalize_sql(
+        "SELECT a FROM t1\n  WHERE b = %(b_1)s AND c IN (?, ?, ?)\n"
+        "  AND d = 'it''s' LIMIT 20") == \
+        "SELECT a FROM t1 WHERE b = ? AND c IN (...) AND d = ? LIMIT ?"
+
+
+def test_statements_counted_per_scope():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # no scope: not counted anywhere
+        with query_scope() as outer:
+            conn.execute(text("SELECT 1"))
+            with query_scope() as inner:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+            conn.execute(text("SELECT 3"))
+    assert inner.count == 2 and outer.count == 2
+    assert inner.seconds > 0
+
+
+def test_slow_queries_are_logged(monkeypatch, caplog):
+    monkeypatch.setattr(session.settings, "DB_SLOW_QUERY_SECONDS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.db.slow_query"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 42 WHERE 'x' = :p"), {"p": "x"})
+    assert caplog.records[-1].getMessage().endswith(
+        "SELECT ? WHERE ? = ?")
+
+
+def test_failed_statement_does_not_break_timing():
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.info.get("query_started") == []
+        conn.execute(text("SELECT 1"))
+
+
+def test_assert_max_queries_lists_the_statements():
+    with assert_max_queries(engine, 2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    with pytest.raises(AssertionError, match="2 statements") as e:
+        with assert_max_queries(engine, 1):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 'a'"))
+    assert "2. SELECT ?" in str(e.value)
@@ -0,0 +1,22 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import principal_from_token
+from app.core.security import create_access_token
+
+
+def test_principal_comes_from_claims_without_db():
+    token = create_access_token(sub="p@example.com", userid=7,
+                                username="pp")
+
+    principal = principal_from_token(None, token)
+
+    assert principal.userid == 7
+    assert principal.email == "p@example.com"
+    assert principal.username == "pp"
+
+
+def test_invalid_token_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        principal_from_token(None, "not-a-jwt")
+    assert exc.value.status_code == 401
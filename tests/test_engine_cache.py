@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+
+from app.core.ai_client import EngineClient
+from app.core.checkers_rules import initial_board
+from app.core.engine_cache import CachedReply, EngineReplyCache
+from app.core.zobrist import hash_position
+
+REPLY = CachedReply(score=5, path=((5, 0), (4, 1)), seconds=0.5)
+
+
+def test_lru_and_stats():
+    cache = EngineReplyCache(max_entries=2)
+    cache.put((1, "white", 4), REPLY)
+    cache.put((2, "white", 4), REPLY)
+    assert cache.get((1, "white", 4)) == REPLY
+    cache.put((3, "white", 4), REPLY)  # evicts 2, the least recently used
+
+    assert cache.get((2, "white", 4)) is None
+    assert cache.get((1, "white", 6)) is None  # depth is part of the key
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"],
+            stats["evictions"]) == (2, 1, 2, 1)
+    assert stats["hit_ratio"] == 1 / 3
+    assert stats["saved_seconds"] == 0.5
+
+
+def test_file_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "replies.db")
+    cache = EngineReplyCache(max_entries=10, path=path)
+    cache.put((1, "black", 6), REPLY)
+    cache.close()
+
+    cache = EngineReplyCache(max_entries=10, path=path)
+    assert cache.get((1, "black", 6)) == REPLY
+    assert cache.get((1, "black", 6)) == REPLY
+    assert cache.stats()["disk_hits"] == 1
+
+    cache.discard((1, "black", 6))
+    cache.clear()
+    assert cache.get((1, "black", 6)) is None
+    cache.close()
+
+
+def test_client_answers_repeated_positions_from_the_cache():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(200, json={"score": 3,
+                                         "path": [[7, 2], [6, 3]]})
+
+    cache = EngineReplyCache(max_entries=10)
+    client = EngineClient(base_url="http://engine", timeout=2.0, retries=0,
+                          max_connections=1, cache=cache,
+                          transport=httpx.MockTransport(handler))
+
+    async def run():
+        first = await client.best_move(initial_board(), "RED", 4)
+        second = await client.best_move(initial_board(), "RED", 4)
+        await client.best_move(initial_board(), "RED", 6)
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert second.moves == [{"from": [5, 0], "to": [4, 1]}]
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_entry_that_does_not_fit_the_board_is_dropped():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(200, json={"score": 0,
+                                         "path": [[7, 2], [6, 3]]})
+
+    cache = EngineReplyCache(max_entries=10)
+    key = (hash_position(initial_board(), "white"), "white", 4)
+    cache.put(key, CachedReply(0, ((5, 0), (3, 2)), 1.0))
+    client = EngineClient(base_url="http://engine", timeout=2.0, retries=0,
+                          max_connections=1, cache=cache,
+                          transport=httpx.MockTransport(handler))
+
+    async def run():
+        reply = await client.best_move(initial_board(), "RED", 4)
+        await client.aclose()
+        return reply
+
+    assert asyncio.run(run()).moves == [{"from": [5, 0], "to": [4, 1]}]
+    assert len(calls) == 1
+    assert cache.get(key).path == ((5, 0), (4, 1))
+
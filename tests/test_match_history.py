@@ -0,0 +1,219 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.match_history import router
+from app.core.response_cache import match_response_cache
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.db.models.user_stats import UserStats
+from app.scripts.compact_finished_matches import compact
+from tests.helpers import TestingSessionLocal, api_client, engine, reset_db
+from tests.query_budget import assert_max_queries
+
+client = api_client(router)
+opponent = api_client(router, userid=2)
+
+
+@pytest.fixture(autouse=True)
+def seeded_db():
+    db = reset_db()
+    for i in range(1, 8):
+        white, black = (1, 2) if i % 2 else (2, 1)
+        db.add(Match(matchid=i, whiteuser=white, blackuser=black,
+                     status="finished", result="white", reason="normal",
+                     finishedat=datetime(2024, 1, i),
+                     moves_count=5 if i == 1 else 0,
+                     last_move_number=5 if i == 1 else 0))
+    db.add(Match(matchid=8, whiteuser=2, blackuser=None, status="waiting"))
+    db.add(UserStats(userid=1, games=4, wins=3, losses=1, draws=0,
+                     by_reason={"normal": {"win": 3, "loss": 1, "draw": 0}},
+                     current_streak=2, best_streak=2,
+                     total_moves=200, total_seconds=1200))
+    for n in range(1, 6):
+        db.add(MatchMove(matchid=1, move_number=n,
+                         player="white" if n % 2 else "black",
+                         move={"from": [5, 0], "to": [4, 1]}))
+    db.commit()
+    db.close()
+    match_response_cache.clear()
+    yield
+
+
+def test_history_keyset_pages_cover_all_matches():
+    first = client.get("/match_history/history", params={"limit": 3})
+    assert first.status_code == 200
+    assert [m["matchid"] for m in first.json()] == [7, 6, 5]
+    cursor = first.headers["X-Next-Before-Matchid"]
+
+    second = client.get("/match_history/history",
+                        params={"limit": 3, "before_matchid": cursor})
+    assert [m["matchid"] for m in second.json()] == [4, 3, 2]
+
+    last = client.get("/match_history/history",
+                      params={"limit": 3, "before_matchid": 2})
+    assert [m["matchid"] for m in last.json()] == [1]
+    assert last.json()[0]["moves_count"] == 5
+    assert "X-Next-Before-Matchid" not in last.headers
+
+
+def test_history_offset_still_supported():
+    resp = client.get("/match_history/history",
+                      params={"limit": 2, "offset": 2})
+    assert [m["matchid"] for m in resp.json()] == [5, 4]
+
+
+def test_moves_keyset_without_total():
+    resp = client.get("/match_history/1/moves",
+                      params={"limit": 2, "include_total": False})
+    data = resp.json()
+    assert data["total"] is None
+    assert [m["move_number"] for m in data["items"]] == [1, 2]
+
+    resp = client.get("/match_history/1/moves", params={
+        "limit": 2,
+        "after_move_number": data["next_after_move_number"],
+    })
+    data = resp.json()
+    assert data["total"] == 5
+    assert [m["move_number"] for m in data["items"]] == [3, 4]
+
+
+def test_stats_served_from_aggregate():
+    resp = client.get("/match_history/stats")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["wins"] == 3
+    assert data["avg_moves"] == 50
+    assert data["avg_seconds"] == 300
+
+    resp = client.get("/match_history/stats", params={"userid": 2})
+    assert resp.json()["games"] == 0
+
+
+def test_export_streams_one_game_per_line():
+    resp = client.get("/match_history/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    games = [json.loads(line) for line in resp.text.splitlines()]
+    assert [g["matchid"] for g in games] == list(range(1, 8))
+    assert [m["move_number"] for m in games[0]["moves"]] == [1, 2, 3, 4, 5]
+    assert games[1]["moves"] == []
+
+
+def test_export_since_filters_on_finish_time():
+    resp = client.get("/match_history/export",
+                      params={"since": "2024-01-06T00:00:00"})
+    games = [json.loads(line) for line in resp.text.splitlines()]
+    assert [g["matchid"] for g in games] == [6, 7]
+
+
+def test_match_pdn_export():
+    resp = client.get("/match_history/1/pdn")
+    assert resp.status_code == 200
+    assert '[White "me"]' in resp.text
+    assert '[Result "1-0"]' in resp.text
+    assert "1. 21-17" in resp.text
+
+
+def test_finished_match_revalidates_with_etag():
+    first = client.get("/match_history/1/moves")
+    assert first.status_code == 200
+    assert "immutable" in first.headers["cache-control"]
+    etag = first.headers["etag"]
+
+    again = client.get("/match_history/1/moves",
+                       headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+    other_page = client.get("/match_history/1/moves", params={"limit": 2},
+                            headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+    assert other_page.headers["etag"] != etag
+
+
+def test_finished_match_served_from_response_cache():
+    assert client.get("/match_history/1").status_code == 200
+    hits = match_response_cache.stats()["hits"]
+
+    resp = client.get("/match_history/1")
+    assert resp.status_code == 200
+    assert resp.json()["matchid"] == 1
+    assert match_response_cache.stats()["hits"] == hits + 1
+
+
+def test_unfinished_match_not_cached():
+    resp = opponent.get("/match_history/8/moves")
+    assert resp.status_code == 200
+    assert "etag" not in resp.headers
+
+
+def test_compacted_match_reads_the_same():
+    before = client.get("/match_history/1/moves").json()
+    export_before = client.get("/match_history/export").text.splitlines()[0]
+
+    db = TestingSessionLocal()
+    assert compact(db, batch_size=3, min_age_hours=0) == 7
+    assert db.query(MatchMove).count() == 0
+    db.close()
+    match_response_cache.clear()
+
+    after = client.get("/match_history/1/moves").json()
+    assert after["total"] == before["total"] == 5
+    assert [(m["move_number"], m["player"], m["move"])
+            for m in after["items"]] == \
+        [(m["move_number"], m["player"], {**m["move"], "was_capture": False})
+         for m in before["items"]]
+
+    page = client.get("/match_history/1/moves", params={
+        "limit": 2, "after_move_number": 2, "include_total": False}).json()
+    assert [m["move_number"] for m in page["items"]] == [3, 4]
+
+    export_after = json.loads(
+        client.get("/match_history/export").text.splitlines()[0])
+    assert len(export_after["moves"]) == \
+        len(json.loads(export_before)["moves"])
+
+
+@pytest.mark.parametrize("url,budget", [
+    ("/match_history/history?limit=7", 1),
+    ("/match_history/1", 1),
+    ("/match_history/1/moves", 3),
+    ("/match_history/1/pdn", 2),  # players joined, not lazy loaded
+    ("/match_history/stats", 1),
+])
+def test_query_budgets(url, budget):
+    with assert_max_queries(engine, budget):
+        assert client.get(url).status_code == 200
+
+
+def test_ai_match_detail():
+    db = TestingSessionLocal()
+    db.add_all([
+        Match(matchid=20, whiteuser=1, status="ongoing", ai_level=2),
+        Match(matchid=21, blackuser=1, status="finished", result="white",
+              reason="normal", finishedat=datetime(2024, 2, 1),
+              ai_level=3),
+    ])
+    db.commit()
+    db.close()
+
+    ongoing = client.get("/match_history/20")
+    assert ongoing.status_code == 200
+    assert ongoing.json()["blackuser"] is None
+
+    finished = client.get("/match_history/21")
+    assert finished.status_code == 200
+    assert finished.json()["whiteuser"] is None
+
+
+def test_history_cursor_is_exposed_to_the_web_client():
+    from app.main import app
+
+    resp = TestClient(app).get("/health",
+                               headers={"Origin": "http://localhost:4200"})
+    assert "X-Next-Before-Matchid" in \
+        resp.headers["access-control-expose-headers"]
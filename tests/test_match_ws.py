@@ -0,0 +1,144 @@
+import pytest
+from sqlalchemy import event
+
+from app.api.deps import get_current_principal_ws
+from app.api.v1 import match_ws
+from app.api.v1.match_ws import router
+from app.core.metrics import PhaseTimer, ws_move_errors
+from app.core.ws_manager import connection_manager
+from app.db.match_moves import append_move
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.db.models.user import User
+from tests.helpers import (
+    TestingSessionLocal,
+    api_client,
+    engine,
+    principal,
+    reset_db,
+)
+from tests.query_budget import assert_max_queries
+
+# connections checked out of the pool, counted from each test's start
+in_use = [0]
+event.listen(engine, "checkout", lambda *a: in_use.__setitem__(
+    0, in_use[0] + 1))
+event.listen(engine, "checkin", lambda *a: in_use.__setitem__(
+    0, in_use[0] - 1))
+
+client = api_client(router)
+
+
+def as_user(userid):
+    client.app.dependency_overrides[get_current_principal_ws] = \
+        lambda: principal(userid)
+
+
+@pytest.fixture(autouse=True)
+def db():
+    session = reset_db()
+    session.add(Match(matchid=1, whiteuser=1, blackuser=2, status="ongoing"))
+    session.commit()
+    in_use[0] = 0
+    yield session
+    session.close()
+    connection_manager.rooms.clear()
+
+
+def test_idle_sockets_hold_no_connection(db, monkeypatch):
+    # connections checked out whenever a message is broadcast
+    during_broadcast = []
+    broadcast = connection_manager.broadcast
+
+    async def counting_broadcast(matchid, message):
+        during_broadcast.append(in_use[0])
+        await broadcast(matchid, message)
+
+    monkeypatch.setattr(connection_manager, "broadcast", counting_broadcast)
+    as_user(1)
+    with client.websocket_connect("/ws/match/1") as white:
+        sync = white.receive_json()
+        assert sync["type"] == "sync" and sync["payload"]["your_role"] == \
+            "white"
+        assert in_use[0] == 0
+
+        white.send_json({"type": "move", "payload": {
+            "move": {"from": [5, 0], "to": [4, 1]}}})
+        move = white.receive_json()
+        assert move["type"] == "move"
+        assert move["payload"]["next_turn"] == "black"
+        assert during_broadcast == [0]
+
+        # the pong comes after the move's session was closed
+        white.send_json({"type": "ping", "payload": {}})
+        assert white.receive_json()["type"] == "pong"
+        assert in_use[0] == 0
+
+        white.send_json({"type": "move", "payload": {
+            "move": {"from": [5, 2], "to": [4, 3]}}})
+        assert white.receive_json()["payload"]["detail"] == "Not your turn"
+        white.send_json({"type": "ping", "payload": {}})
+        white.receive_json()
+        assert in_use[0] == 0
+
+    db.expire_all()
+    assert db.query(MatchMove).filter_by(matchid=1).count() == 1
+
+
+def test_outsider_is_rejected(db):
+    db.add(User(userid=3, email="u3@example.com", username="u3",
+                password_hash="x"))
+    db.commit()
+    as_user(3)
+    with pytest.raises(Exception):
+        with client.websocket_connect("/ws/match/1") as ws:
+            ws.receive_json()
+    assert in_use[0] == 0
+
+
+def test_move_query_budget(db):
+    as_user(1)
+    with client.websocket_connect("/ws/match/1") as white:
+        white.receive_json()
+        # match, history, the locked append (savepoint, select, update,
+        # insert, release) and the stored move read back after commit
+        with assert_max_queries(engine, 8):
+            white.send_json({"type": "move", "payload": {
+                "move": {"from": [5, 0], "to": [4, 1]}}})
+            assert white.receive_json()["type"] == "move"
+
+
+def test_append_move_reads_the_counter_under_the_lock(db):
+    match = db.get(Match, 1)
+    assert match.last_move_number == 0
+    # another mover stored move 1 since this session loaded the match
+    other = TestingSessionLocal()
+    other.add(MatchMove(matchid=1, move_number=1, player="white",
+                        move={"from": [5, 0], "to": [4, 1]}))
+    other.get(Match, 1).last_move_number = 1
+    other.commit()
+    other.close()
+
+    new_move = append_move(db, 1, "black",
+                           {"from": [2, 1], "to": [3, 0]})
+    assert new_move.move_number == 2
+
+
+@pytest.mark.parametrize("error,detail,counted", [
+    (ValueError("Match not ongoing"), "Match not ongoing",
+     "match_not_ongoing"),
+    (RuntimeError("password=hunter2"), "DB error while saving move",
+     "db_error"),
+])
+def test_save_errors_are_not_echoed(db, monkeypatch, error, detail,
+                                    counted):
+    def failing_append(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(match_ws, "append_move", failing_append)
+    before = ws_move_errors._values.get((counted,), 0)
+    outcome = match_ws.play_move(db, 1, "white", {"move": {
+        "from": [5, 0], "to": [4, 1]}}, PhaseTimer())
+    assert outcome.reply["payload"] == {"detail": detail}
+    assert not outcome.broadcast
+    assert ws_move_errors._values[(counted,)] == before + 1
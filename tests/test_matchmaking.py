@@ -1,54 +1,34 @@
 import pytest
-from unittest.mock import MagicMock
-from fastapi import FastAPI
-from fastapi.testclient import TestClient
+
 from app.api.v1.matchmaking import router
-from app.api.deps import get_db, get_current_user
-from app.db.models.user import User
 from app.db.models.match import Match
+from tests.helpers import api_client, engine, reset_db
+from tests.query_budget import assert_max_queries
 
-app = FastAPI()
-app.include_router(router)
-
-mock_user = MagicMock(spec=User)
-mock_user.userid = 1
-
-mock_db = MagicMock()
+client = api_client(router)
 
-def override_get_db():
-    try:
-        yield mock_db
-    finally:
-        pass
 
-def override_get_current_user():
-    return mock_user
+@pytest.fixture(autouse=True)
+def db():
+    session = reset_db()
+    yield session
+    session.close()
 
-app.dependency_overrides[get_db] = override_get_db
-app.dependency_overrides[get_current_user] = override_get_current_user
-
-client = TestClient(app)
-
-def test_create_new_match_if_none_available():
-    mock_db.execute.return_value.scalars.return_value.first.return_value = None
 
+def test_create_new_match_if_none_available(db):
     response = client.post("/matchmaking/find")
 
     assert response.status_code == 200
     data = response.json()
-    
+
     assert data["waiting"] is True
-    mock_db.add.assert_called()
-    mock_db.commit.assert_called()
+    db.expire_all()
+    assert db.query(Match).filter_by(status="waiting").count() == 1
 
-def test_join_existing_match():
-    existing_match = MagicMock(spec=Match)
-    existing_match.status = "waiting"
-    existing_match.whiteuser = 999 
-    existing_match.blackuser = None
-    existing_match.startedat = "2023-01-01"
 
-    mock_db.execute.return_value.scalars.return_value.first.side_effect = [existing_match, None]
+def test_join_existing_match(db):
+    db.add(Match(matchid=5, whiteuser=2, status="waiting"))
+    db.commit()
 
     response = client.post("/matchmaking/find")
 
@@ -57,16 +37,13 @@ def test_join_existing_match():
 
     assert data["waiting"] is False
     assert data["role"] == "black"
-    assert existing_match.status == "ongoing"
-    mock_db.commit.assert_called()
+    db.expire_all()
+    assert db.get(Match, 5).status == "ongoing"
 
-def test_return_own_waiting_match():
-    my_match = MagicMock(spec=Match)
-    my_match.status = "waiting"
-    my_match.whiteuser = 1
-    my_match.blackuser = None
 
-    mock_db.execute.return_value.scalars.return_value.first.side_effect = [None, my_match]
+def test_return_own_waiting_match(db):
+    db.add(Match(matchid=5, whiteuser=1, status="waiting"))
+    db.commit()
 
     response = client.post("/matchmaking/find")
 
@@ -75,4 +52,18 @@ def test_return_own_waiting_match():
 
     assert data["waiting"] is True
     assert data["role"] == "white"
-    mock_db.add.assert_not_called()
\ No newline at end of file
+    db.expire_all()
+    assert db.query(Match).count() == 1
+
+
+def test_find_query_budgets():
+    opponent = api_client(router, userid=2)
+    # (client, budget, waiting) in order: create, own waiting match,
+    # join it, already playing
+    steps = [(client, 6, True), (client, 4, True), (opponent, 5, False),
+             (client, 1, False)]
+    for step_client, budget, waiting in steps:
+        with assert_max_queries(engine, budget):
+            response = step_client.post("/matchmaking/find")
+        assert response.status_code == 200
+        assert response.json()["waiting"] is waiting
@@ -0,0 +1,99 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import (
+    Counter,
+    HTTPMetricsMiddleware,
+    Histogram,
+    PhaseTimer,
+    StatsGauges,
+    http_request_seconds,
+    ws_move_seconds,
+)
+
+
+def samples(lines):
+    return dict(line.rsplit(" ", 1) for line in lines
+                if not line.startswith("#"))
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("test_seconds", "test", ("phase",), (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, "db")
+    out = samples(h.render())
+    assert out['checkers_test_seconds_bucket{phase="db",le="0.1"}'] == "1"
+    assert out['checkers_test_seconds_bucket{phase="db",le="1.0"}'] == "3"
+    assert out['checkers_test_seconds_bucket{phase="db",le="+Inf"}'] == "4"
+    assert out['checkers_test_seconds_count{phase="db"}'] == "4"
+    assert float(out['checkers_test_seconds_sum{phase="db"}']) == 4.05
+
+
+def test_counter_and_stats_gauges():
+    c = Counter("test_errors_total", "test", ("type",))
+    c.inc("illegal_move")
+    c.inc("illegal_move")
+    c.inc('with "quotes"')
+    out = samples(c.render())
+    assert out['checkers_test_errors_total{type="illegal_move"}'] == "2"
+    assert out['checkers_test_errors_total{type="with \\"quotes\\""}'] == "1"
+
+    stats = StatsGauges("cache", lambda: {
+        "hits": 3, "hit_ratio": 0.75, "backend": "memory",
+        "rejected": {"login": 2}})
+    out = samples(stats.render())
+    assert out == {"checkers_cache_hits": "3",
+                   "checkers_cache_hit_ratio": "0.75",
+                   'checkers_cache_rejected{key="login"}': "2"}
+
+
+def test_http_latency_is_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(HTTPMetricsMiddleware)
+
+    @app.get("/things/{thing_id}")
+    def get_thing(thing_id: int):
+        return {"id": thing_id}
+
+    client = TestClient(app)
+    # the histogram is process-wide: compare against the counts before
+    before = samples(http_request_seconds.render())
+    for thing_id in (1, 2, 3):
+        assert client.get(f"/things/{thing_id}").status_code == 200
+    assert client.get("/nowhere").status_code == 404
+
+    out = samples(http_request_seconds.render())
+
+    def added(key):
+        return int(out[key]) - int(before.get(key, 0))
+
+    assert added('checkers_http_request_seconds_count{method="GET",'
+                 'route="/things/{thing_id}",status="200"}') == 3
+    assert added('checkers_http_request_seconds_count{method="GET",'
+                 'route="unmatched",status="404"}') == 1
+
+
+def test_phase_timer():
+    engine = create_engine("sqlite://")
+
+    def select_one():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    async def move():
+        timer = PhaseTimer()
+        with timer.count_queries():
+            select_one()
+        # e.g. the AI turn scheduled after the move
+        await asyncio.create_task(asyncio.to_thread(select_one))
+        timer.mark("replay")
+        timer.total()
+        return timer
+
+    assert asyncio.run(move()).queries.count == 1
+    out = samples(ws_move_seconds.render())
+    assert int(out['checkers_ws_move_seconds_count{phase="replay"}']) >= 1
+    assert int(out['checkers_ws_move_seconds_count{phase="total"}']) >= 1
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.move_archive import ArchiveError, decode_moves, encode_moves
+
+
+def test_encode_decode_roundtrip_with_time_deltas():
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    moves = [
+        ("white", {"from": [5, 0], "to": [4, 1], "was_capture": False},
+         t0),
+        ("black", {"from": [2, 3], "to": [3, 2], "was_capture": False},
+         t0 + timedelta(seconds=3, milliseconds=250)),
+        ("white", {"from": [4, 1], "to": [2, 3], "was_capture": True},
+         t0 + timedelta(minutes=10)),
+    ]
+
+    data, first_at, count = encode_moves(moves)
+    assert count == 3
+    assert len(data) <= 1 + 3 * 5
+
+    decoded = decode_moves(7, data, first_at)
+    assert [(m.player, m.move, m.createdat) for m in decoded] == moves
+    assert [m.move_number for m in decoded] == [1, 2, 3]
+    assert decoded[0].id is None
+
+
+def test_unencodable_move_rejected():
+    with pytest.raises(ArchiveError):
+        encode_moves([("white", {"to": [4, 1]}, None)])
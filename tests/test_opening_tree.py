@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.match_history import router
+from app.core.pdn import START_FEN, PdnGame, game_plies
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.db.models.opening_tree import OpeningMove
+from app.core.checkers_rules import compute_state_from_history
+from app.db.opening_tree import (
+    common_positions,
+    opening_tree,
+    record_match_opening,
+)
+from app.scripts.build_opening_tree import build
+from tests.helpers import api_client, reset_db
+
+client = api_client(router)
+
+# (line in server numbering, result)
+GAMES = [
+    ("22-18 11-15 18x11 8x15", "white"),
+    ("22-18 11-15 18x11 7x16", "black"),
+    ("22-18 10-14", "draw"),
+    ("21-17 9-13", "white"),
+]
+
+
+def plies_of(line):
+    return game_plies(PdnGame(tags={"FEN": START_FEN}, movetext=line))[0]
+
+
+def add_match(db, matchid, line, result):
+    db.add(Match(matchid=matchid, status="finished", result=result,
+                 finishedat=datetime(2024, 1, 1)))
+    for n, ply in enumerate(plies_of(line), start=1):
+        db.add(MatchMove(matchid=matchid, move_number=n, **ply))
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    for matchid, (line, result) in enumerate(GAMES, start=1):
+        add_match(session, matchid, line, result)
+    session.commit()
+    opening_tree.clear()
+    yield session
+    session.close()
+
+
+def moves_after(line=""):
+    resp = client.get("/match_history/openings", params={"line": line})
+    assert resp.status_code == 200
+    return {m["move"]: m for m in resp.json()["moves"]}
+
+
+def test_build_and_serve_tree(db):
+    assert build(db, max_turns=20) == 4
+
+    root = moves_after()
+    assert root["22-18"]["games"] == 3
+    assert (root["22-18"]["white_wins"], root["22-18"]["black_wins"],
+            root["22-18"]["draws"]) == (1, 1, 1)
+    # played once: persisted but not kept in memory
+    assert "21-17" not in root
+    assert db.query(OpeningMove).filter_by(move="21-17").one().games == 1
+
+    assert set(moves_after("22-18,11-15")) == {"18x11"}
+
+
+def test_finished_match_updates_tree(db):
+    build(db, max_turns=20)
+    assert moves_after()["22-18"]["games"] == 3
+
+    add_match(db, 5, "22-18 10-14", "black")
+    db.flush()
+    record_match_opening(db, db.get(Match, 5))
+    db.commit()
+
+    assert moves_after()["22-18"]["games"] == 4
+    assert db.query(OpeningMove).filter_by(move="10-14").one().games == 2
+
+
+def test_rolled_back_game_is_not_counted(db):
+    build(db, max_turns=20)
+    assert moves_after()["22-18"]["games"] == 3
+
+    add_match(db, 5, "22-18 10-14", "black")
+    db.flush()
+    record_match_opening(db, db.get(Match, 5))
+    # not visible before the commit, and never after a rollback
+    assert moves_after()["22-18"]["games"] == 3
+    db.rollback()
+    assert moves_after()["22-18"]["games"] == 3
+
+    db.commit()  # nothing pending any more
+    assert moves_after()["22-18"]["games"] == 3
+
+
+def test_illegal_line_rejected(db):
+    resp = client.get("/match_history/openings", params={"line": "22-15"})
+    assert resp.status_code == 422
+
+
+def test_common_positions_most_played_first(db):
+    build(db, max_turns=20)
+    positions = list(common_positions(db, limit=10, min_games=2))
+
+    # 22-18 11-15 18x11 is shared by two games, then they diverge
+    assert [(role, games) for _, role, games in positions] == \
+        [("white", 0), ("black", 3), ("white", 2), ("black", 2)]
+    board, role, _, _ = compute_state_from_history(plies_of("22-18 11-15"))
+    assert positions[2][:2] == (board, role)
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.api.v1 import auth
+from app.core import security
+from app.core.password_pool import PasswordHashPool, PasswordPoolSaturated
+from app.db.models.user import User
+from tests.helpers import api_client, reset_db
+
+client = api_client(auth.router)
+
+
+@pytest.fixture
+def db():
+    session = reset_db(users=())
+    session.add(User(userid=1, email="me@example.com", username="me",
+                     password_hash=CryptContext(
+                         schemes=["bcrypt"], bcrypt__rounds=4).hash("pw")))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_saturated_pool_fails_fast():
+    pool = PasswordHashPool(workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def run():
+        # one running, one queued: the pool is full
+        busy = [asyncio.ensure_future(pool.run(release.wait))
+                for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*busy)
+        # slots are given back once the work is done
+        return await pool.run(lambda: "ok")
+
+    assert asyncio.run(run()) == "ok"
+    stats = pool.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 3
+
+
+def test_login_returns_503_when_saturated(db, monkeypatch):
+    pool = PasswordHashPool(workers=1, queue_limit=0)
+    monkeypatch.setattr(auth, "password_pool", pool)
+    pool._slots.acquire()  # as if a hash were running
+
+    resp = client.post("/auth/login", json={"email": "me@example.com",
+                                            "password": "pw"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+
+def test_login_upgrades_a_weaker_hash(db, monkeypatch):
+    monkeypatch.setattr(security, "pwd", CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    resp = client.post("/auth/login", json={"email": "me@example.com",
+                                            "password": "pw"})
+    assert resp.status_code == 200
+
+    db.expire_all()
+    stored = db.get(User, 1).password_hash
+    assert stored.startswith("$2b$05$")
+    assert security.verify_password("pw", stored)
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.core.pdn import (
+    PdnError,
+    coords_of,
+    format_game,
+    game_plies,
+    iter_games,
+    square_of,
+)
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.scripts.import_pdn import import_games
+from tests.helpers import random_game, reset_db
+
+
+def test_square_numbering_roundtrip():
+    assert square_of(0, 1) == 1
+    assert square_of(7, 6) == 32
+    for s in range(1, 33):
+        assert square_of(*coords_of(s)) == s
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_export_import_roundtrip(seed):
+    plies, result = random_game(seed)
+    text = format_game({"White": "a", "Black": "b"}, plies, result)
+
+    [game] = list(iter_games(text.splitlines(keepends=True)))
+    parsed, parsed_result, _, _ = game_plies(game)
+
+    assert parsed == plies
+    assert parsed_result == result
+
+
+def test_standard_game_with_black_first_is_rotated():
+    text = '[Event "x"]\n[Result "*"]\n\n1. 11-15 23-19 2. 8-11 22-17 *\n'
+    [game] = list(iter_games(text.splitlines(keepends=True)))
+    plies, result, _, _ = game_plies(game)
+
+    assert result is None
+    assert plies[0] == {"player": "white", "move": {
+        "from": list(coords_of(22)), "to": list(coords_of(18)),
+        "was_capture": False}}
+    assert [p["player"] for p in plies] == ["white", "black"] * 2
+
+
+def test_short_capture_notation_and_illegal_moves():
+    text = "1. 11-15 22-18 2. 15x22 *"
+    [game] = list(iter_games([text]))
+    plies, _, _, _ = game_plies(game)
+    assert plies[-1]["move"]["was_capture"] is True
+
+    [bad] = list(iter_games(["1. 11-20 *"]))
+    with pytest.raises(PdnError):
+        game_plies(bad)
+
+
+def test_bulk_import_writes_batches():
+    db = reset_db(users=())
+
+    texts = [format_game({}, *random_game(seed)) for seed in range(7)]
+    texts.append("1. 11-20 *\n")
+    games = iter_games("\n".join(texts).splitlines(keepends=True))
+
+    imported, skipped = import_games(db, games, batch_size=3)
+
+    assert (imported, skipped) == (7, 1)
+    assert db.execute(select(func.count(Match.matchid))).scalar_one() == 7
+    counts = dict(db.execute(
+        select(MatchMove.matchid, func.count(MatchMove.id))
+        .group_by(MatchMove.matchid)).all())
+    for match in db.execute(select(Match)).scalars():
+        assert counts[match.matchid] == match.moves_count
+    db.close()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.models.match import Match
+from app.db.models.user_stats import UserStats
+from app.db.match_events import on_match_finished
+from app.scripts.rebuild_player_stats import rebuild
+from tests.helpers import reset_db
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    yield session
+    session.close()
+
+
+def finish(db, matchid, result, reason="normal", moves=10):
+    start = datetime(2024, 1, 1) + timedelta(hours=matchid)
+    match = Match(matchid=matchid, whiteuser=1, blackuser=2,
+                  status="ongoing", startedat=start, moves_count=moves)
+    db.add(match)
+    db.commit()
+
+    match.status = "finished"
+    match.result = result
+    match.reason = reason
+    match.finishedat = start + timedelta(minutes=5)
+    on_match_finished(db, match)
+    db.commit()
+
+
+def test_stats_updated_when_match_finishes(db):
+    finish(db, 1, "white")
+    finish(db, 2, "white", reason="resign")
+    finish(db, 3, "draw", reason="agreement")
+
+    white = db.get(UserStats, 1)
+    black = db.get(UserStats, 2)
+    assert (white.games, white.wins, white.losses, white.draws) == \
+        (3, 2, 0, 1)
+    assert (black.wins, black.losses) == (0, 2)
+    assert white.best_streak == 2
+    assert white.current_streak == 0
+    assert black.by_reason["resign"] == {"win": 0, "loss": 1, "draw": 0}
+    assert white.total_seconds == 3 * 300
+    assert white.total_moves == 30
+
+
+def test_rebuild_matches_incremental_stats(db):
+    finish(db, 1, "black")
+    finish(db, 2, "white")
+    finish(db, 3, "white")
+    before = {s.userid: (s.games, s.wins, s.losses, s.current_streak,
+                         s.best_streak, s.by_reason)
+              for s in db.query(UserStats)}
+
+    rebuild(db, batch_size=2)
+
+    after = {s.userid: (s.games, s.wins, s.losses, s.current_streak,
+                        s.best_streak, s.by_reason)
+             for s in db.query(UserStats)}
+    assert after == before
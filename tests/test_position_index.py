@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.match_history import router
+from app.core.checkers_rules import compute_state_from_history
+from app.core.pdn import game_plies, iter_games
+from app.db.models.match import Match
+from app.db.models.match_move import MatchMove
+from app.db.models.position_index import PositionIndex
+from app.db.position_index import index_match
+from app.scripts.index_positions import build
+from tests.helpers import api_client, reset_db
+
+client = api_client(router)
+
+# 1. 11-15 22-18 2. 15x22 25x18 in standard notation (read rotated)
+OPENING = "1. 11-15 22-18 2. 15x22 25x18 *"
+
+
+def plies_of(text):
+    [game] = list(iter_games([text]))
+    return game_plies(game)[0]
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    plies = plies_of(OPENING)
+    for matchid in (1, 2, 3):
+        session.add(Match(matchid=matchid, whiteuser=None, blackuser=None,
+                          status="finished", result="draw",
+                          finishedat=datetime(2024, 1, matchid)))
+        # match 3 diverges after the first turn
+        history = plies if matchid < 3 else plies[:1]
+        for n, ply in enumerate(history, start=1):
+            session.add(MatchMove(matchid=matchid, move_number=n, **ply))
+    session.commit()
+    yield session
+    session.close()
+
+
+def board_after(n):
+    board, next_role, _, _ = compute_state_from_history(
+        plies_of(OPENING)[:n])
+    return {"board": board, "next_turn": next_role}
+
+
+def test_build_and_search_with_keyset(db):
+    assert build(db, batch_size=2) == 3
+
+    resp = client.post("/match_history/positions/search",
+                       params={"limit": 1}, json=board_after(2))
+    data = resp.json()
+    assert [(m["matchid"], m["move_number"]) for m in data["items"]] == \
+        [(1, 2)]
+
+    resp = client.post("/match_history/positions/search", json=board_after(2),
+                       params={"limit": 1,
+                               "after_matchid": data["next_after_matchid"]})
+    assert [m["matchid"] for m in resp.json()["items"]] == [2]
+
+    resp = client.post("/match_history/positions/search", json=board_after(1))
+    assert [m["matchid"] for m in resp.json()["items"]] == [1, 2, 3]
+
+
+def test_index_match_is_idempotent(db):
+    match = db.get(Match, 1)
+    first = index_match(db, match)
+    assert index_match(db, match) == first
+    db.commit()
+    assert db.query(PositionIndex).filter_by(matchid=1).count() == first
+
+
+def test_invalid_board_rejected(db):
+    resp = client.post("/match_history/positions/search",
+                       json={"board": [[None] * 8] * 7})
+    assert resp.status_code == 422
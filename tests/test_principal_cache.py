@@ -0,0 +1,64 @@
+from app.core.principal_cache import PrincipalCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(max_entries=2, ttl=60):
+    clock = FakeClock()
+    return PrincipalCache(max_entries, ttl, clock=clock), clock
+
+
+def test_hit_and_miss_counters():
+    cache, _ = make_cache()
+    assert cache.get("tok") is None
+    cache.put("tok", {"userid": 1, "email": "a@example.com"})
+    assert cache.get("tok")["email"] == "a@example.com"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_entry_expires_with_ttl_and_token_exp():
+    cache, clock = make_cache(ttl=60)
+    cache.put("a", {"userid": 1})
+    cache.put("b", {"userid": 2}, token_exp=clock.now + 10)
+
+    clock.now += 11
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    clock.now += 60
+    assert cache.get("a") is None
+
+
+def test_lru_eviction():
+    cache, _ = make_cache(max_entries=2)
+    cache.put("a", {"userid": 1})
+    cache.put("b", {"userid": 2})
+    cache.get("a")
+    cache.put("c", {"userid": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_user_drops_all_tokens():
+    cache, _ = make_cache(max_entries=10)
+    cache.put("a1", {"userid": 1})
+    cache.put("a2", {"userid": 1})
+    cache.put("b", {"userid": 2})
+
+    cache.invalidate_user(1)
+
+    assert cache.get("a1") is None
+    assert cache.get("a2") is None
+    assert cache.get("b") is not None
@@ -0,0 +1,86 @@
+import asyncio
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.rate_limit import (
+    MemoryBackend,
+    RateLimiter,
+    RateLimitMiddleware,
+    RateLimitPolicy,
+    RedisBackend,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def hit(backend, key, policy):
+    return asyncio.run(backend.hit(key, policy))
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    policy = RateLimitPolicy(rate=1, burst=2)
+
+    assert hit(backend, "k", policy)[0]
+    assert hit(backend, "k", policy)[0]
+    ok, retry_after = hit(backend, "k", policy)
+    assert not ok
+    assert retry_after == 1
+
+    clock.now += 1
+    assert hit(backend, "k", policy)[0]
+
+
+def test_idle_buckets_are_swept():
+    clock = FakeClock()
+    backend = MemoryBackend(sweep_interval=10, clock=clock)
+    policy = RateLimitPolicy(rate=1, burst=2)
+    hit(backend, "a", policy)
+
+    clock.now += 11
+    hit(backend, "b", policy)
+
+    assert "a" not in backend.buckets
+    assert "b" in backend.buckets
+
+
+def test_middleware_rejects_with_429():
+    app = FastAPI()
+
+    @app.post("/limited")
+    def limited():
+        return {"ok": True}
+
+    @app.get("/free")
+    def free():
+        return {"ok": True}
+
+    limiter = RateLimiter({"/limited": RateLimitPolicy(rate=0.001,
+                                                        burst=1)},
+                          backend=MemoryBackend())
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    client = TestClient(app)
+
+    assert client.post("/limited").status_code == 200
+    resp = client.post("/limited")
+    assert resp.status_code == 429
+    assert "retry-after" in resp.headers
+    assert client.get("/free").status_code == 200
+    assert limiter.stats()["rejected"]["/limited"] == 1
+
+
+def test_redis_backend_without_redis_installed(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", None)
+    with pytest.raises(RuntimeError, match="pip install redis"):
+        RedisBackend("redis://127.0.0.1:6379/0")
@@ -0,0 +1,119 @@
+import pytest
+from jose import jwt
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.security import ALGO
+from app.db.models.authtoken import AuthToken
+from app.db.models.user import User
+from app.db import refresh_tokens
+from app.db.refresh_tokens import (
+    InvalidRefreshToken,
+    RevocationSet,
+    issue_refresh_token,
+    revoked_refresh_tokens,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    token_digest,
+)
+from tests.helpers import reset_db
+
+
+@pytest.fixture
+def db():
+    session = reset_db(users=())
+    user = User(email="rt@example.com", username="rtuser",
+                password_hash="x")
+    session.add(user)
+    session.commit()
+    yield session
+    session.close()
+
+
+def payload_of(token):
+    return jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGO])
+
+
+def count_tokens(db):
+    return db.execute(select(func.count(AuthToken.id))).scalar_one()
+
+
+def test_refresh_token_is_stored_hashed(db):
+    user = db.query(User).first()
+    token = issue_refresh_token(db, user)
+
+    row = db.query(AuthToken).one()
+    assert row.refreshtoken != token
+    assert len(row.refreshtoken) == 64
+
+
+def test_rotation_replaces_token(db):
+    user = db.query(User).first()
+    token = issue_refresh_token(db, user)
+
+    _, new_token = rotate_refresh_token(db, token, payload_of(token))
+
+    assert new_token != token
+    assert count_tokens(db) == 1
+
+
+def test_reusing_rotated_token_revokes_all_sessions(db):
+    user = db.query(User).first()
+    token = issue_refresh_token(db, user)
+    issue_refresh_token(db, user)  # another device
+    rotate_refresh_token(db, token, payload_of(token))
+
+    with pytest.raises(InvalidRefreshToken):
+        rotate_refresh_token(db, token, payload_of(token))
+    assert count_tokens(db) == 0
+
+
+def test_token_from_before_storage_does_not_revoke_sessions(db):
+    user = db.query(User).first()
+    issue_refresh_token(db, user)
+    # as issued before refresh tokens had a jti and an authtoken row
+    legacy = payload_of(issue_refresh_token(db, user))
+    del legacy["jti"]
+    token = jwt.encode(legacy, settings.JWT_SECRET, algorithm=ALGO)
+
+    with pytest.raises(InvalidRefreshToken, match="unknown"):
+        rotate_refresh_token(db, token, legacy)
+    assert count_tokens(db) == 2
+
+
+def test_failed_rotation_does_not_revoke_the_token(db, monkeypatch):
+    user = db.query(User).first()
+    token = issue_refresh_token(db, user)
+
+    def failing_issue(db, user):
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(refresh_tokens, "issue_refresh_token", failing_issue)
+    with pytest.raises(RuntimeError):
+        rotate_refresh_token(db, token, payload_of(token))
+    db.rollback()
+    assert revoked_refresh_tokens.get(token_digest(token)) is None
+
+    monkeypatch.undo()
+    _, new_token = rotate_refresh_token(db, token, payload_of(token))
+    assert new_token != token
+
+
+def test_revoked_token_rejected(db):
+    user = db.query(User).first()
+    token = issue_refresh_token(db, user)
+    revoke_refresh_token(db, token, payload_of(token))
+
+    with pytest.raises(InvalidRefreshToken):
+        rotate_refresh_token(db, token, payload_of(token))
+
+
+def test_revocation_set_prunes_expired_entries():
+    revoked = RevocationSet()
+    revoked.revoke("a", expires_at=100)
+    revoked.revoke("b", expires_at=300)
+
+    revoked.prune(now=200)
+
+    assert revoked.get("a") is None
+    assert revoked.get("b") is not None
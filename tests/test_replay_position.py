@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.match_history import router
+from app.core.checkers_rules import compute_state_from_history
+from app.core.response_cache import match_response_cache
+from app.db.checkpoints import decode_state, encode_state
+from app.db.models.match import Match
+from app.db.models.match_checkpoint import MatchCheckpoint
+from app.db.models.match_move import MatchMove
+from app.scripts.index_positions import build
+from tests.helpers import api_client, random_game, reset_db
+
+client = api_client(router)
+
+PLIES, RESULT = random_game(seed=11, max_plies=70)
+
+
+@pytest.fixture
+def db():
+    session = reset_db()
+    session.add(Match(matchid=1, whiteuser=1, status="finished",
+                      result=RESULT or "draw", finishedat=datetime(2024, 1, 1),
+                      moves_count=len(PLIES), last_move_number=len(PLIES)))
+    for n, ply in enumerate(PLIES, start=1):
+        session.add(MatchMove(matchid=1, move_number=n, **ply))
+    session.commit()
+    match_response_cache.clear()
+    yield session
+    session.close()
+
+
+def expected(k):
+    board, next_role, forced_from, must_capture = \
+        compute_state_from_history(PLIES[:k])
+    return {"board": board, "next_turn": next_role,
+            "forced_from": list(forced_from) if forced_from else None,
+            "must_capture": must_capture}
+
+
+def test_state_encoding_roundtrip():
+    board, role, forced, _ = compute_state_from_history(PLIES[:33])
+    assert decode_state(encode_state(board, role, forced)) == \
+        (board, role, forced)
+
+
+def check_positions():
+    for k in [0, 1, 19, 20, 21, 45, len(PLIES)]:
+        resp = client.get("/match_history/1/position",
+                          params={"move_number": k})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert {key: data[key] for key in expected(k)} == expected(k)
+
+
+def test_position_matches_full_replay_at_every_move(db):
+    # no checkpoints yet: full replay, and reads write nothing
+    check_positions()
+    assert db.query(MatchCheckpoint).count() == 0
+
+    # the index script writes them, every 20 moves
+    build(db)
+    assert db.query(MatchCheckpoint).count() == len(PLIES) // 20
+    match_response_cache.clear()
+    check_positions()
+
+
+def test_position_out_of_range(db):
+    resp = client.get("/match_history/1/position",
+                      params={"move_number": len(PLIES) + 1})
+    assert resp.status_code == 404